@@ -0,0 +1,78 @@
+import sys
+import os
+import random
+import timeit
+# use PYTHONPATH to setup path
+sys.path.append(os.path.dirname(os.path.realpath(__file__)) + "/../core")
+from webhdfs import WhdfsSearchKeys as keys
+from webhdfs import WhdfsSearchExpression, WhdfsSearchExpressionList
+
+
+def make_statuses(count, seed=0):
+    """ Returns count synthetic FileStatus dictionaries """
+    rand = random.Random(seed)
+    return [{"pathSuffix": "part-%06d.%s" % (i, rand.choice(["orc", "csv", "tmp", "gz"])),
+             "length": rand.randint(0, 1 << 30),
+             "modificationTime": rand.randint(1400000000000, 1500000000000),
+             "owner": rand.choice(["hdfs", "hive", "spark"]),
+             "replication": 3,
+             "type": "FILE"}
+            for i in range(count)]
+
+
+def make_expressions():
+    """ Returns a dictionary of benchmark name to search expression list """
+    numeric = WhdfsSearchExpressionList(WhdfsSearchExpression(keys.SIZE_KEY, ">", 1 << 29))
+
+    glob = WhdfsSearchExpressionList(WhdfsSearchExpression(keys.PATH_KEY, "glob", "*.orc"))
+
+    regex = WhdfsSearchExpressionList(WhdfsSearchExpression(keys.PATH_KEY, "regex", r"\.(csv|gz)$"))
+
+    combined = WhdfsSearchExpressionList(WhdfsSearchExpression(keys.SIZE_KEY, ">", 1 << 29))
+    combined.add(WhdfsSearchExpression(keys.PATH_KEY, "glob", "*.orc"))
+    combined.add("and")
+    combined.add(WhdfsSearchExpression(keys.OWNER_KEY, "=", "hive"))
+    combined.add(WhdfsSearchExpression(keys.PATH_KEY, "regex", r"^part-0"))
+    combined.add("and")
+    combined.add("or")
+    return {"numeric": numeric, "glob": glob, "regex": regex, "and_or": combined}
+
+
+def run(count=100000, repeat=3):
+    """
+    Times the postfix interpreter against the compiled expression list.
+    Returns:
+        dictionary of benchmark name to
+        {"count": N, "interpreted": secs, "compiled": secs, "filter": secs,
+         "speedup": F}
+        where secs is the best of repeat runs over count statuses.
+    """
+    statuses = make_statuses(count)
+    results = {}
+    for name, exp_list in sorted(make_expressions().items()):
+        exp_list.compiled()
+        interpreted = min(timeit.repeat(lambda: [x for x in statuses if exp_list.match_postfix(x)],
+                                        number=1, repeat=repeat))
+        compiled = min(timeit.repeat(lambda: [x for x in statuses if exp_list.match(x)],
+                                     number=1, repeat=repeat))
+        filtered = min(timeit.repeat(lambda: list(exp_list.filter(statuses)),
+                                     number=1, repeat=repeat))
+        results[name] = {"count": count,
+                         "interpreted": interpreted,
+                         "compiled": compiled,
+                         "filter": filtered,
+                         "speedup": interpreted / filtered if filtered else 0.0}
+    return results
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    print("{0:<10}{1:>14}{2:>12}{3:>12}{4:>10}".format("search", "interpreted", "compiled", "filter", "speedup"))
+    for name, result in sorted(run(count).items()):
+        print("{0:<10}{1:>14.4f}{2:>12.4f}{3:>12.4f}{4:>9.1f}x"
+              .format(name, result["interpreted"], result["compiled"],
+                      result["filter"], result["speedup"]))
+
+
+if __name__ == "__main__":
+    main()
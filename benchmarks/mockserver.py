@@ -0,0 +1,513 @@
+"""
+    Local fake WebHDFS, WebHCat and YARN ResourceManager rest server for
+    benchmarks. The hdfs namespace is held in memory and can be filled
+    with a synthetic tree of directories and files. Every request can be
+    delayed to emulate the latency of a remote cluster.
+
+    Example:
+        server = MockServer(latency=0.002).start()
+        generate(server.ns, "/data", dirs=10, files=100, depth=2)
+        whdfs = Webhdfs(host="127.0.0.1", port=server.port)
+        ...
+        server.shutdown()
+"""
+from __future__ import print_function
+import json
+import posixpath
+import random
+import threading
+import time
+from six.moves import BaseHTTPServer, socketserver
+from six.moves.urllib.parse import urlparse, parse_qs
+
+
+class Namespace(object):
+    """
+    Thread safe in memory hdfs namespace of FileStatus dictionaries.
+    File contents are kept only for files written through the server,
+    generated files are read as a repeated pattern of their length.
+    """
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.nodes = {}
+        self.children = {}
+        self.data = {}
+        self._file_id = 16384
+        self.mkdir("/")
+
+    def _status(self, name, otype, length=0, owner="hdfs", mtime=None,
+                replication=0, block_size=0):
+        self._file_id += 1
+        mtime = int(mtime or time.time() * 1000)
+        return {"pathSuffix": name, "type": otype, "length": length,
+                "owner": owner, "group": "hdfs",
+                "permission": "755" if otype == "DIRECTORY" else "644",
+                "accessTime": 0 if otype == "DIRECTORY" else mtime,
+                "modificationTime": mtime, "blockSize": block_size,
+                "replication": replication, "childrenNum": 0,
+                "fileId": self._file_id, "storagePolicy": 0}
+
+    def _touch_parent(self, path):
+        parent = posixpath.dirname(path)
+        if parent in self.nodes:
+            self.nodes[parent]["modificationTime"] = int(time.time() * 1000)
+            self.nodes[parent]["childrenNum"] = len(self.children[parent])
+
+    def mkdir(self, path, owner="hdfs", mtime=None):
+        """ Creates the directory path and its missing parents """
+        path = posixpath.normpath(path) if path != "/" else path
+        with self.lock:
+            if path in self.nodes:
+                return
+            if path != "/":
+                self.mkdir(posixpath.dirname(path), owner, mtime)
+            self.nodes[path] = self._status(posixpath.basename(path), "DIRECTORY",
+                                            owner=owner, mtime=mtime)
+            self.children[path] = {}
+            if path != "/":
+                self.children[posixpath.dirname(path)][posixpath.basename(path)] = path
+                self._touch_parent(path)
+
+    def put_file(self, path, data=b"", length=None, owner="hdfs", mtime=None,
+                 replication=3, block_size=134217728):
+        """
+        Creates or replaces the file path holding data, or length bytes
+        of generated content if length is given.
+        """
+        with self.lock:
+            self.mkdir(posixpath.dirname(path))
+            self.nodes[path] = self._status(posixpath.basename(path), "FILE",
+                                            length=len(data) if length is None else length,
+                                            owner=owner, mtime=mtime,
+                                            replication=replication,
+                                            block_size=block_size)
+            if length is None:
+                self.data[path] = data
+            else:
+                self.data.pop(path, None)
+            self.children[posixpath.dirname(path)][posixpath.basename(path)] = path
+            self._touch_parent(path)
+
+    def read(self, path):
+        """ Returns the content of the file path """
+        data = self.data.get(path)
+        if data is None:
+            length = self.nodes[path]["length"]
+            data = (b"0123456789abcdef" * (length // 16 + 1))[:length]
+        return data
+
+    def _subtree(self, path):
+        prefix = path.rstrip("/") + "/"
+        return [x for x in self.nodes if x == path or x.startswith(prefix)]
+
+    def delete(self, path, recursive=False):
+        """ Deletes path. Returns False if it does not exist """
+        with self.lock:
+            if path not in self.nodes:
+                return False
+            if self.children.get(path) and not recursive:
+                raise IOError("{0} is non empty': Directory is not empty".format(path))
+            for node in self._subtree(path):
+                self.nodes.pop(node, None)
+                self.children.pop(node, None)
+                self.data.pop(node, None)
+            self.children[posixpath.dirname(path)].pop(posixpath.basename(path), None)
+            self._touch_parent(path)
+            return True
+
+    def rename(self, src, dst):
+        """ Moves src to dst. Returns False if src is missing or dst exists """
+        with self.lock:
+            if src not in self.nodes or dst in self.nodes:
+                return False
+            for node in self._subtree(src):
+                moved = dst + node[len(src):]
+                self.nodes[moved] = self.nodes.pop(node)
+                if node in self.children:
+                    self.children[moved] = dict((name, dst + child[len(src):])
+                                                for name, child in self.children.pop(node).items())
+                if node in self.data:
+                    self.data[moved] = self.data.pop(node)
+            self.nodes[dst]["pathSuffix"] = posixpath.basename(dst)
+            self.children[posixpath.dirname(src)].pop(posixpath.basename(src), None)
+            self._touch_parent(src)
+            self.children[posixpath.dirname(dst)][posixpath.basename(dst)] = dst
+            self._touch_parent(dst)
+            return True
+
+    def summary(self, path):
+        """ Returns the ContentSummary of path """
+        dirs = files = length = consumed = 0
+        with self.lock:
+            for node in self._subtree(path):
+                status = self.nodes[node]
+                if status["type"] == "DIRECTORY":
+                    dirs += 1
+                else:
+                    files += 1
+                    length += status["length"]
+                    consumed += status["length"] * status["replication"]
+        return {"directoryCount": dirs, "fileCount": files, "length": length,
+                "quota": -1, "spaceConsumed": consumed, "spaceQuota": -1}
+
+
+def generate(ns, root="/data", dirs=10, files=10, depth=2, size=1024,
+             owners=("hdfs", "hive", "spark"), extensions=("orc", "csv", "gz")):
+    """
+    Fills ns with a synthetic tree under root of depth levels. Every
+    directory holds files files and, above the last level, dirs sub
+    directories. File i is size * (i + 1) bytes long and its owner and
+    extension cycle through owners and extensions.
+    Returns:
+        Dictionary {"dirs": N, "files": N, "bytes": N} of what was created
+    """
+    counts = {"dirs": 0, "files": 0, "bytes": 0}
+
+    def fill(path, level):
+        ns.mkdir(path)
+        counts["dirs"] += 1
+        for i in range(files):
+            ns.put_file("{0}/part-{1:05d}.{2}".format(path, i, extensions[i % len(extensions)]),
+                        length=size * (i + 1), owner=owners[i % len(owners)])
+            counts["files"] += 1
+            counts["bytes"] += size * (i + 1)
+        if level < depth:
+            for i in range(dirs):
+                fill("{0}/d{1}".format(path, i), level + 1)
+    fill(root, 1)
+    return counts
+
+
+def generate_apps(count, seed=0):
+    """ Returns count synthetic yarn application dictionaries """
+    rand = random.Random(seed)
+    now = int(time.time() * 1000)
+    apps = []
+    for i in range(count):
+        state = rand.choice(["RUNNING", "RUNNING", "FINISHED", "FAILED", "ACCEPTED"])
+        started = now - rand.randint(0, 86400000)
+        apps.append({"id": "application_{0}_{1:04d}".format(now // 1000, i + 1),
+                     "user": rand.choice(["hdfs", "hive", "spark"]),
+                     "name": "job-{0}".format(i),
+                     "queue": rand.choice(["default", "etl", "adhoc"]),
+                     "state": state,
+                     "finalStatus": {"FINISHED": "SUCCEEDED", "FAILED": "FAILED"}
+                     .get(state, "UNDEFINED"),
+                     "progress": 100.0 if state in ("FINISHED", "FAILED") else rand.random() * 100,
+                     "applicationType": rand.choice(["MAPREDUCE", "TEZ", "SPARK"]),
+                     "startedTime": started,
+                     "finishedTime": started + 60000 if state in ("FINISHED", "FAILED") else 0,
+                     "allocatedMB": rand.randint(1, 64) * 1024,
+                     "allocatedVCores": rand.randint(1, 32)})
+    return apps
+
+
+class Handler(BaseHTTPServer.BaseHTTPRequestHandler):
+    """ Serves the webhdfs, webhcat and resource manager rest apis of a MockServer """
+
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        self.dispatch("GET")
+
+    def do_PUT(self):
+        self.dispatch("PUT")
+
+    def do_POST(self):
+        self.dispatch("POST")
+
+    def do_DELETE(self):
+        self.dispatch("DELETE")
+
+    def _body(self):
+        if self.headers.get("Transfer-Encoding", "").lower() == "chunked":
+            chunks = []
+            while True:
+                size = int(self.rfile.readline().strip() or b"0", 16)
+                if not size:
+                    self.rfile.readline()
+                    return b"".join(chunks)
+                chunks.append(self.rfile.read(size))
+                self.rfile.readline()
+        length = int(self.headers.get("Content-Length") or 0)
+        return self.rfile.read(length) if length else b""
+
+    def _send(self, code, body=b"", content_type="application/json", headers=None):
+        if not isinstance(body, bytes):
+            body = json.dumps(body).encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _remote_exception(self, code, exception, message):
+        self._send(code, {"RemoteException": {"exception": exception,
+                                              "javaClassName": "java.io." + exception,
+                                              "message": message}})
+
+    def dispatch(self, method):
+        server = self.server
+        if server.latency or server.jitter:
+            time.sleep(server.latency + random.random() * server.jitter)
+        url = urlparse(self.path)
+        query = dict((key, values[-1]) for key, values in parse_qs(url.query).items())
+        body = self._body() if method in ("PUT", "POST") else b""
+        if url.path.startswith("/webhdfs/v1"):
+            op = query.get("op", "").upper()
+            server.count(op)
+            if server.standby:
+                return self._remote_exception(403, "StandbyException",
+                                              "Operation category READ is not supported "
+                                              "in state standby")
+            path = url.path[len("/webhdfs/v1"):] or "/"
+            if path != "/":
+                path = path.rstrip("/")
+            try:
+                return self.webhdfs(method, op, path, query, body)
+            except IOError as e:
+                return self._remote_exception(403, "IOException", str(e))
+        if url.path.startswith("/ws/v1/"):
+            server.count(url.path)
+            return self.yarn(url.path[len("/ws/v1/"):].strip("/").split("/"), query)
+        if url.path.startswith("/templeton/v1/"):
+            server.count(url.path)
+            return self.webhcat(url.path[len("/templeton/v1/"):].strip("/").split("/"), query)
+        return self._send(404, {"error": "Not found " + url.path})
+
+    def _redirect(self, path, query):
+        """ Redirects a CREATE, APPEND or OPEN to the data step served by this server """
+        host, port = self.server.server_address[:2]
+        location = "http://{0}:{1}/webhdfs/v1{2}?{3}&datanode=true".format(
+            host, port, path, "&".join("{0}={1}".format(*x) for x in query.items()))
+        return self._send(307, headers={"Location": location})
+
+    def webhdfs(self, method, op, path, query, body):
+        ns = self.server.ns
+        if op not in ("MKDIRS", "CREATE") and path not in ns.nodes:
+            return self._remote_exception(404, "FileNotFoundException",
+                                          "File {0} does not exist.".format(path))
+        if op == "GETFILESTATUS":
+            return self._send(200, {"FileStatus": dict(ns.nodes[path], pathSuffix="")})
+        if op in ("LISTSTATUS", "LISTSTATUS_BATCH"):
+            with ns.lock:
+                if ns.nodes[path]["type"] != "DIRECTORY":
+                    statuses = [dict(ns.nodes[path], pathSuffix="")]
+                else:
+                    statuses = [ns.nodes[x] for name, x in sorted(ns.children[path].items())]
+            if op == "LISTSTATUS":
+                return self._send(200, {"FileStatuses": {"FileStatus": statuses}})
+            if not self.server.batch:
+                return self._remote_exception(
+                    400, "IllegalArgumentException",
+                    "Invalid value for webhdfs parameter \"op\": No enum constant "
+                    "org.apache.hadoop.hdfs.web.resources.GetOpParam.Op.LISTSTATUS_BATCH")
+            if query.get("startAfter"):
+                statuses = [x for x in statuses if x["pathSuffix"] > query["startAfter"]]
+            page = statuses[:self.server.batch]
+            return self._send(200, {"DirectoryListing": {
+                "partialListing": {"FileStatuses": {"FileStatus": page}},
+                "remainingEntries": len(statuses) - len(page)}})
+        if op == "GETCONTENTSUMMARY":
+            return self._send(200, {"ContentSummary": ns.summary(path)})
+        if op == "MKDIRS":
+            ns.mkdir(path)
+            return self._send(200, {"boolean": True})
+        if op == "DELETE":
+            return self._send(200, {"boolean": ns.delete(path, query.get("recursive") == "true")})
+        if op == "RENAME":
+            return self._send(200, {"boolean": ns.rename(path, query["destination"])})
+        if op in ("SETOWNER", "SETPERMISSION", "SETTIMES", "SETREPLICATION"):
+            with ns.lock:
+                if "owner" in query:
+                    ns.nodes[path]["owner"] = query["owner"]
+                if "permission" in query:
+                    ns.nodes[path]["permission"] = query["permission"]
+            return self._send(200, content_type="application/octet-stream")
+        if op == "CONCAT":
+            sources = query["sources"].split(",")
+            with ns.lock:
+                missing = [x for x in sources if x not in ns.nodes]
+                if missing:
+                    return self._remote_exception(404, "FileNotFoundException",
+                                                  "File {0} does not exist.".format(missing[0]))
+                data = ns.read(path) + b"".join(ns.read(x) for x in sources)
+                for source in sources:
+                    ns.delete(source)
+                status = ns.nodes[path]
+                ns.put_file(path, data, replication=status["replication"],
+                            block_size=status["blockSize"])
+            return self._send(200, content_type="application/octet-stream")
+        if op in ("CREATE", "APPEND"):
+            if "datanode" not in query:
+                if op == "CREATE" and path in ns.nodes and query.get("overwrite") == "false":
+                    return self._remote_exception(403, "FileAlreadyExistsException",
+                                                  "{0} already exists".format(path))
+                return self._redirect(path, query)
+            if op == "APPEND":
+                with ns.lock:
+                    status = ns.nodes[path]
+                    ns.put_file(path, ns.read(path) + body, replication=status["replication"],
+                                block_size=status["blockSize"])
+                return self._send(200)
+            ns.put_file(path, body, replication=int(query.get("replication", 3)),
+                        block_size=int(query.get("blocksize", 134217728)))
+            return self._send(201, headers={"Location": "hdfs://" + path})
+        if op == "OPEN":
+            if "datanode" not in query:
+                return self._redirect(path, query)
+            data = ns.read(path)
+            offset = int(query.get("offset", 0))
+            length = query.get("length")
+            data = data[offset:offset + int(length)] if length else data[offset:]
+            return self._send(200, data, content_type="application/octet-stream")
+        return self._remote_exception(400, "IllegalArgumentException",
+                                      "Invalid value for webhdfs parameter \"op\": "
+                                      "No enum constant " + op)
+
+    def yarn(self, parts, query):
+        apps = self.server.apps
+        if parts[:1] != ["cluster"]:
+            return self._send(404, {"error": "Not found"})
+        if parts == ["cluster"] or parts == ["cluster", "info"]:
+            return self._send(200, {"clusterInfo": {"id": 1, "state": "STARTED",
+                                                    "haState": "ACTIVE"}})
+        if parts == ["cluster", "metrics"]:
+            return self._send(200, {"clusterMetrics": {
+                "appsRunning": sum(1 for x in apps if x["state"] == "RUNNING"),
+                "appsCompleted": sum(1 for x in apps if x["state"] == "FINISHED"),
+                "appsFailed": sum(1 for x in apps if x["state"] == "FAILED")}})
+        if parts[1:2] != ["apps"]:
+            return self._send(404, {"error": "Not found"})
+        if len(parts) == 2:
+            selected = apps
+            if query.get("states"):
+                states = set(query["states"].upper().split(","))
+                selected = [x for x in selected if x["state"] in states]
+            if query.get("user"):
+                selected = [x for x in selected if x["user"] == query["user"]]
+            if query.get("limit"):
+                selected = selected[:int(query["limit"])]
+            return self._send(200, {"apps": {"app": selected} if selected else None})
+        app = self.server.app_index.get(parts[2])
+        if app is None:
+            return self._send(404, {"RemoteException": {
+                "exception": "NotFoundException",
+                "message": "app with id: {0} not found".format(parts[2])}})
+        if len(parts) == 3:
+            return self._send(200, {"app": app})
+        if parts[3] == "state":
+            return self._send(200, {"state": app["state"]})
+        if parts[3] == "queue":
+            return self._send(200, {"queue": app["queue"]})
+        return self._send(404, {"error": "Not found"})
+
+    def webhcat(self, parts, query):
+        databases = self.server.databases
+        if parts == ["status"]:
+            return self._send(200, {"status": "ok", "version": "v1"})
+        if parts == ["version"]:
+            return self._send(200, {"supportedVersions": ["v1"], "version": "v1"})
+        if parts[:2] != ["ddl", "database"]:
+            return self._send(404, {"error": "Not found"})
+        if len(parts) == 2:
+            return self._send(200, {"databases": sorted(databases)})
+        tables = databases.get(parts[2])
+        if tables is None:
+            return self._send(404, {"error": "No such database " + parts[2]})
+        if len(parts) == 3:
+            return self._send(200, {"database": parts[2], "comment": "",
+                                    "location": "hdfs:///apps/hive/warehouse/{0}.db".format(parts[2]),
+                                    "params": "{}"})
+        if parts[3:] == ["table"]:
+            return self._send(200, {"database": parts[2], "tables": tables})
+        return self._send(404, {"error": "Not found"})
+
+
+class MockServer(socketserver.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    """
+    Threaded fake rest server answering for a namenode and its
+    datanodes, a webhcat server and a yarn resource manager on one port.
+
+    Attributes:
+        ns(Namespace)       : The hdfs namespace.
+        latency(float)      : Seconds every request is delayed.
+        jitter(float)       : Extra random delay of up to jitter seconds.
+        batch(int)          : Entries per LISTSTATUS_BATCH page. 0 rejects
+                              LISTSTATUS_BATCH like hadoop 2.
+        standby(bool)       : Answer webhdfs requests as a standby namenode.
+        apps(list)          : Yarn application dictionaries.
+        databases(dict)     : Hive database name to its list of tables.
+        ops(dict)           : Requests served by webhdfs op or rest api path.
+    """
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, port=0, latency=0.0, jitter=0.0, batch=0, host="127.0.0.1"):
+        BaseHTTPServer.HTTPServer.__init__(self, (host, port), Handler)
+        self.ns = Namespace()
+        self.latency = latency
+        self.jitter = jitter
+        self.batch = batch
+        self.standby = False
+        self.databases = {"default": ["events", "users"]}
+        self.ops = {}
+        self._lock = threading.Lock()
+        self.set_apps([])
+
+    def set_apps(self, apps):
+        """ Replaces the yarn applications """
+        self.apps = list(apps)
+        self.app_index = dict((x["id"], x) for x in self.apps)
+
+    def count(self, op):
+        with self._lock:
+            self.ops[op] = self.ops.get(op, 0) + 1
+
+    def requests(self):
+        """ Returns the number of requests served """
+        with self._lock:
+            return sum(self.ops.values())
+
+    def start(self):
+        """ Serves requests on a daemon thread and returns self """
+        thread = threading.Thread(target=self.serve_forever)
+        thread.daemon = True
+        thread.start()
+        return self
+
+    @property
+    def port(self):
+        return self.server_address[1]
+
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description="Serves a fake webhdfs, webhcat and yarn rest api")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=50070)
+    parser.add_argument("--dirs", type=int, default=10, help="sub directories per directory")
+    parser.add_argument("--files", type=int, default=10, help="files per directory")
+    parser.add_argument("--depth", type=int, default=3, help="levels of directories")
+    parser.add_argument("--apps", type=int, default=100, help="yarn applications")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every request")
+    parser.add_argument("--jitter", type=float, default=0.0, help="random extra seconds")
+    args = parser.parse_args()
+    server = MockServer(args.port, args.latency, args.jitter, host=args.host)
+    counts = generate(server.ns, "/data", args.dirs, args.files, args.depth)
+    server.set_apps(generate_apps(args.apps))
+    print("Serving {0} directories and {1} files under /data on http://{2}:{3}"
+          .format(counts["dirs"], counts["files"], args.host, server.port))
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
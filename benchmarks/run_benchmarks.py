@@ -0,0 +1,251 @@
+"""
+    Benchmarks of the groot clients against a local MockServer.
+    Times directory scans, listings, searches, transfers and resource
+    manager polling over a synthetic namespace and writes the results to
+    a JSON file. With --baseline the results are compared with an earlier
+    run and the exit status is 1 if a benchmark got slower than the
+    tolerance allows.
+
+    Example:
+        python benchmarks/run_benchmarks.py --latency 0.001 --output bench.json
+        python benchmarks/run_benchmarks.py --baseline bench.json
+"""
+from __future__ import print_function
+import argparse
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+# use PYTHONPATH to setup path
+sys.path.append(os.path.dirname(os.path.realpath(__file__)) + "/../core")
+sys.path.append(os.path.dirname(os.path.realpath(__file__)))
+from webhdfs import Webhdfs
+from webhdfs import WhdfsSearchKeys as keys
+from webhdfs import WhdfsSearchExpression, WhdfsSearchExpressionList
+from webhcat import Webhcat
+from resourcemanager import ResourceManager
+from request import Request
+from mockserver import MockServer, generate, generate_apps
+import bench_search
+
+
+class Benchmarks(object):
+    """
+    Benchmarks run against one MockServer. Each benchmark method returns
+    the number of items it processed and is timed over repeat runs.
+    """
+
+    def __init__(self, args):
+        self.args = args
+        self.server = MockServer(latency=args.latency, jitter=args.jitter).start()
+        self.tree = generate(self.server.ns, "/data", args.dirs, args.files, args.depth)
+        generate(self.server.ns, "/flat", 0, args.flat_files, 1)
+        self.server.set_apps(generate_apps(args.apps))
+        self.whdfs = Webhdfs(host="127.0.0.1", port=self.server.port)
+        self.webhcat = Webhcat(host="127.0.0.1", port=self.server.port)
+        self.rm = ResourceManager(host="127.0.0.1", port=self.server.port)
+        self.tmpdir = tempfile.mkdtemp(prefix="groot_bench")
+        self.srcfile = os.path.join(self.tmpdir, "upload.bin")
+        with open(self.srcfile, "wb") as f:
+            block = os.urandom(1048576)
+            for i in range(args.transfer_mb):
+                f.write(block)
+        self.server.ns.put_file("/transfer/download.bin", length=args.transfer_mb * 1048576)
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+    def _scan(self, **kwargs):
+        return sum(len(dirs) + len(files)
+                   for root, dirs, files in self.whdfs.scan_dir("/data", **kwargs))
+
+    def scan_dir_serial(self):
+        return self._scan()
+
+    def scan_dir_parallel(self):
+        return self._scan(workers=self.args.workers)
+
+    def scan_dir_unordered(self):
+        return self._scan(workers=self.args.workers, ordered=False)
+
+    def scan_dir_aggregate(self):
+        return self._scan(workers=self.args.workers, summary="aggregate")
+
+    def long_list_dir(self):
+        return len(self.whdfs.long_list_dir("/flat"))
+
+    def long_list_dir_stream(self):
+        return sum(1 for x in self.whdfs.long_list_dir("/flat", stream=True))
+
+    def search(self):
+        exp_list = WhdfsSearchExpressionList(WhdfsSearchExpression(keys.PATH_KEY, "glob", "*.orc"))
+        exp_list.add(WhdfsSearchExpression(keys.SIZE_KEY, ">", 2048))
+        exp_list.add("and")
+        return self._scan(workers=self.args.workers, search_exp_list=exp_list, otype="file")
+
+    def upload(self):
+        # An existing target keeps upload_file off its missing file checks
+        self.server.ns.put_file("/transfer/upload.bin")
+        self.whdfs.upload_file(self.srcfile, "/transfer/upload.bin")
+        return os.path.getsize(self.srcfile)
+
+    def _download(self, workers, split_size=None):
+        target = os.path.join(self.tmpdir, "download.bin")
+        self.whdfs.download_file("/transfer/download.bin", target, workers=workers,
+                                 split_size=split_size)
+        size = os.path.getsize(target)
+        os.remove(target)
+        return size
+
+    def download(self):
+        return self._download(1)
+
+    def download_ranges(self):
+        return self._download(self.args.workers, 1048576)
+
+    def rm_poll(self):
+        polls = 0
+        for i in range(self.args.polls):
+            apps = self.rm.cluster_applications(states="RUNNING")
+            for app in (apps.get("apps") or {}).get("app", [])[:5]:
+                self.rm.cluster_appstate(app["id"])
+                polls += 1
+            polls += 1
+        return polls
+
+    def rm_iter_apps(self):
+        return sum(1 for x in self.rm.iter_cluster_applications())
+
+    def webhcat_poll(self):
+        for i in range(self.args.polls):
+            self.webhcat.get_databases()
+        return self.args.polls
+
+    TRANSFERS = ("upload", "download", "download_ranges")
+    NAMES = ("scan_dir_serial", "scan_dir_parallel", "scan_dir_unordered",
+             "scan_dir_aggregate", "long_list_dir", "long_list_dir_stream",
+             "search", "upload", "download", "download_ranges", "rm_poll",
+             "rm_iter_apps", "webhcat_poll")
+
+    def run(self, name):
+        """
+        Returns the results of the benchmark name as a dictionary
+            {
+                "seconds": best F, "mean": F, "items": N,
+                "items_per_sec": F, "requests": N,
+                "ops": {op: {"count": N, "p50": F, "p99": F}}
+            }
+        where items are bytes for the transfers and requests and ops are
+        counted over one run.
+        """
+        func = getattr(self, name)
+        func()
+        times = []
+        for i in range(self.args.repeat):
+            Request.reset_metrics()
+            served = self.server.requests()
+            start = time.time()
+            items = func()
+            times.append(time.time() - start)
+            served = self.server.requests() - served
+        best = min(times)
+        ops = dict((x["op"], {"count": x["count"],
+                              "p50": x["latency"]["p50"],
+                              "p99": x["latency"]["p99"]})
+                   for x in Request.metric_stats(group_by=("op",)))
+        return {"seconds": best,
+                "mean": sum(times) / len(times),
+                "items": items,
+                "items_per_sec": items / best if best else 0.0,
+                "requests": served,
+                "ops": ops}
+
+
+def compare(results, baseline, tolerance):
+    """
+    Prints the change of every benchmark against a baseline run.
+    Returns:
+        The names of the benchmarks slower than the baseline by more than
+        tolerance, a fraction of the baseline time.
+    """
+    regressions = []
+    print("{0:<22}{1:>12}{2:>12}{3:>10}".format("benchmark", "baseline", "current", "change"))
+    for name, result in sorted(results.items()):
+        before = baseline.get(name, {}).get("seconds")
+        if not before or "seconds" not in result:
+            continue
+        change = result["seconds"] / before - 1
+        flag = ""
+        if change > tolerance:
+            regressions.append(name)
+            flag = "  slower"
+        print("{0:<22}{1:>12.4f}{2:>12.4f}{3:>9.1f}%{4}"
+              .format(name, before, result["seconds"], change * 100, flag))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks groot against a local mock server")
+    parser.add_argument("--dirs", type=int, default=8, help="sub directories per directory")
+    parser.add_argument("--files", type=int, default=20, help="files per directory")
+    parser.add_argument("--depth", type=int, default=3, help="levels of directories")
+    parser.add_argument("--flat-files", type=int, default=5000,
+                        help="files of the directory listed by the long_list_dir benchmarks")
+    parser.add_argument("--apps", type=int, default=500, help="yarn applications")
+    parser.add_argument("--polls", type=int, default=50, help="polls per polling benchmark")
+    parser.add_argument("--transfer-mb", type=int, default=16, help="size of the transfers")
+    parser.add_argument("--latency", type=float, default=0.001,
+                        help="seconds the server delays every request")
+    parser.add_argument("--jitter", type=float, default=0.0,
+                        help="random extra delay of up to jitter seconds")
+    parser.add_argument("--workers", type=int, default=8, help="workers of the parallel benchmarks")
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs of each benchmark")
+    parser.add_argument("--search-count", type=int, default=100000,
+                        help="statuses filtered by the in process search benchmark")
+    parser.add_argument("--only", nargs="*", help="benchmarks to run")
+    parser.add_argument("--output", default="bench_results.json", help="json results file")
+    parser.add_argument("--baseline", help="json results file of an earlier run to compare with")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="slowdown over the baseline reported as a regression")
+    args = parser.parse_args()
+
+    benchmarks = Benchmarks(args)
+    results = {}
+    try:
+        for name in [x for x in args.only or Benchmarks.NAMES if x in Benchmarks.NAMES]:
+            results[name] = benchmarks.run(name)
+            unit = "bytes" if name in Benchmarks.TRANSFERS else "items"
+            print("{0:<22}{1:>10.4f}s {2:>14.1f} {3}/s {4:>7} requests"
+                  .format(name, results[name]["seconds"], results[name]["items_per_sec"],
+                          unit, results[name]["requests"]))
+    finally:
+        benchmarks.close()
+    if not args.only or "search_filter" in args.only:
+        results["search_filter"] = bench_search.run(args.search_count, args.repeat)
+
+    report = {"timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+              "python": platform.python_version(),
+              "platform": platform.platform(),
+              "config": vars(args),
+              "tree": benchmarks.tree,
+              "results": results}
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+    print("Results written to {0}".format(args.output))
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print("Slower than the baseline: {0}".format(", ".join(regressions)))
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,536 @@
+"""
+    Provides an asyncio client for webhdfs.
+    Requires python 3.6+ and the aiohttp package.
+"""
+
+import asyncio
+import getpass
+import json
+import time
+from request import url_join
+from errors import HTTPError, RequestError, MissingArgumentError, IllegalArgumentError
+from webhdfs import WhdfsSearchKeys, WhdfsSearchExpression, WhdfsSearchExpressionList
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+
+class AsyncWebhdfs(object):
+    """ Represent class for asyncio webhdfs connectivity.
+        Mirrors the read, scan and streaming upload methods of Webhdfs
+        as coroutines. At most max_concurrency requests to the namenode
+        and datanodes are in flight at any time.
+
+        Example:
+            async with AsyncWebhdfs(host="nn1.host.com,nn2.host.com") as whdfs:
+                print(await whdfs.list_dir("/tmp"))
+                async for root, dirs, files in whdfs.scan_dir("/apps"):
+                    print(root)
+    """
+
+    def __init__(self, host=None, port=50070, url=None, protocol="http",
+                 url_ext="webhdfs/v1", user=None, max_concurrency=100):
+        """ Initialization for class object.
+            The connection is established by connect() or when the object
+            is used as an async context manager.
+            Args:
+                host(str)       : The host where webhdfs service is running.
+                  or list)        This can be a single host, a string containing
+                                  hosts in a HA separated by comma(,) or a list
+                                  of hosts in a HA setup.
+                port            : The port on which webhdfs is listening.
+                url             : Url which is a combination of protocol, host and port
+                protocol(str)   : The  protocol to be used to connect to webhdfs.
+                user(str)       : Defaults to the client os user.
+                max_concurrency : Maximum number of requests in flight. Default 100.
+        """
+        if aiohttp is None:
+            raise ImportError("AsyncWebhdfs requires the aiohttp package")
+
+        if (not host or not port) and not url:
+            raise MissingArgumentError("Either url or a combination of host and port " +
+                                       "need to be provided")
+
+        if not protocol:
+            raise MissingArgumentError("protocol argument should have a value")
+
+        if not url_ext:
+            raise MissingArgumentError("database_ext argument needs to have a value")
+
+        self.url_ext = url_ext
+        self.user = user or getpass.getuser()
+        self.response_timeout = 20
+        self.max_concurrency = max_concurrency
+        self.session = None
+        self._semaphore = None
+
+        if url:
+            self._base_urls = [url]
+        else:
+            hosts = host
+            if isinstance(hosts, str):
+                hosts = [x.strip() for x in hosts.split(",")]
+            self._base_urls = [protocol + "://" + x + ":" + str(port) for x in hosts]
+        self.base_url = self._base_urls[0]
+
+    async def connect(self):
+        """ Opens the http session and selects the first responding host """
+        if self.session is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            connector = aiohttp.TCPConnector(limit=self.max_concurrency)
+            self.session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=None,
+                                              sock_connect=self.response_timeout,
+                                              sock_read=self.response_timeout))
+        for base_url in self._base_urls:
+            self.base_url = base_url
+            try:
+                await self.list_dir(path="/")
+                return self
+            except Exception:
+                pass
+        await self.close()
+        raise RequestError("Cannot connect to webhdfs service at {0}"
+                           .format(self._get_path_url(path="/")))
+
+    async def close(self):
+        """ Closes the http session """
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    async def __aenter__(self):
+        return await self.connect()
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    def _get_path_url(self, path):
+        """
+        Helper method
+        Returns the path access url
+        """
+        if not path.startswith("/"):
+            path = "/" + path
+        return url_join(self.base_url, self.url_ext) + path
+
+    def _get_op_url(self, url, operation):
+        """
+        Helper method
+        Returns the operation restapi call string
+        """
+        return url + "?user.name=" + self.user + "&op=" + operation
+
+    def _list_attribute(self, path_status, key):
+        """
+        Helper method
+        Returns path_status attribute if key is provided or path_status
+        itself is key is None or has the value "all"
+        """
+        return path_status if (key is None or key.lower() == "all") else \
+            path_status[WhdfsSearchKeys.get_value(key)]
+
+    @staticmethod
+    def _remote_error(text):
+        """
+        Helper method
+        Returns the RemoteException message of a webhdfs error response
+        """
+        try:
+            json_response = json.loads(text)
+            if "RemoteException" in json_response:
+                return json_response['RemoteException']['message']
+        except ValueError:
+            pass
+        return text
+
+    async def url_json_request(self, url, method="GET", data=None,
+                               ignore_error=False):
+        """
+        Submit a url request to webhdfs which returns a json response.
+        Args:
+            url          : Entire url
+            method       : PUT, POST, DELETE or GET
+            data         : Any payload that needs to be passed
+            ignore_error : Ignores webhdfs remote exceptions and return empty json
+        Returns:
+            Response in json format
+        """
+        if not url:
+            raise MissingArgumentError("URL not provided")
+
+        text = ""
+        try:
+            async with self._semaphore:
+                async with self.session.request(method, url, data=data,
+                                                allow_redirects=False) as response:
+                    text = await response.text()
+            json_response = json.loads(text)
+            if "RemoteException" in json_response:
+                err_msg = json_response['RemoteException']['message']
+                if 'Invalid value for webhdfs parameter \"op\": No enum constant' in err_msg:
+                    err_msg = "Operation not supported by webhdfs service. You may trying to" + \
+                              " access an earlier version of hadoop."
+                raise HTTPError(err_msg)
+            return json_response
+        except HTTPError as e:
+            if not ignore_error:
+                raise IOError("Error Reported in url request call \n{0}\n"
+                              .format(e))
+            return {}
+        except ValueError:
+            if not ignore_error:
+                raise IOError("Error Reported in url request call \n{0}\n"
+                              .format(text))
+            return {}
+
+    async def get_path_status(self, path, ignore_error=False):
+        """
+        Get path information
+        Args:
+            path                 : Path
+            ignore_error(bool)   : ignore error
+        Returns:
+            File status dictionary as returned by Webhdfs.get_path_status
+        """
+        if not path:
+            raise MissingArgumentError("Path not provided")
+
+        url = self._get_op_url(self._get_path_url(path), "GETFILESTATUS")
+        json_fileinfo = await self.url_json_request(url, ignore_error=ignore_error)
+        if "FileStatus" in json_fileinfo:
+            json_fileinfo = json_fileinfo["FileStatus"]
+        return json_fileinfo
+
+    async def get_content_summary(self, path, ignore_error=False):
+        """
+        Get content summary of a path
+        Args:
+            path                 : Path
+            ignore_error(bool)   : ignore error if set to True. Default False.
+        Returns:
+            Content Summary of the path as a dictionary
+        """
+        if not path:
+            raise MissingArgumentError("Path not provided")
+
+        url = self._get_op_url(self._get_path_url(path), "GETCONTENTSUMMARY")
+        json_fileinfo = await self.url_json_request(url, ignore_error=ignore_error)
+        return json_fileinfo.get("ContentSummary", {})
+
+    async def _extended_status(self, path, x, ignore_error):
+        """
+        Helper method
+        Returns file status x under path merged with its content summary
+        """
+        type_key = WhdfsSearchKeys.get_value(WhdfsSearchKeys.TYPE_KEY)
+        ext_x = dict(x)
+        if x[type_key] == "DIRECTORY":
+            fullpath = _child_path(path, x)
+            ext_x.update(await self.get_content_summary(fullpath, ignore_error=ignore_error) or
+                         _extended_info())
+        elif x[type_key] in ("FILE", "SYMLINK"):
+            size = x[WhdfsSearchKeys.get_value(WhdfsSearchKeys.SIZE_KEY)]
+            replication = x[WhdfsSearchKeys.get_value(WhdfsSearchKeys.REPL_KEY)]
+            ext_x.update(_extended_info(0, 1, raw_size=size * replication))
+        else:
+            ext_x.update(_extended_info())
+        return ext_x
+
+    async def _list_dir_info(self, path=None, otype="all", key=None,
+                             ignore_error=False, search_exp_list=None,
+                             ext_status=False):
+        """ Helper function to list directory information.
+        Content summaries of the sub directories are requested concurrently.
+        """
+        url = self._get_op_url(self._get_path_url(path), "LISTSTATUS")
+        tmap = {"file": "FILE", "dir": "DIRECTORY", "symlink": "SYMLINK"}
+        type_key = WhdfsSearchKeys.get_value(WhdfsSearchKeys.TYPE_KEY)
+
+        json_dirlist = await self.url_json_request(url, ignore_error=ignore_error)
+        if not json_dirlist:
+            if not ignore_error:
+                raise IOError("{0} does not exist or ".format(path) +
+                              "or {0} does not have ".format(self.user) +
+                              "permissions to access it.")
+            return None
+
+        statuses = [x for x in json_dirlist['FileStatuses']['FileStatus']
+                    if (otype == "all" or x[type_key] == tmap[otype]) and
+                    (not search_exp_list or search_exp_list.match(x))]
+        if ext_status:
+            statuses = await asyncio.gather(*[self._extended_status(path, x, ignore_error)
+                                              for x in statuses])
+        return [self._list_attribute(x, key) for x in statuses]
+
+    async def list_dir(self, path=None, otype="all", pattern=None,
+                       pattern_type="glob", ignore_error=False):
+        """ List contents of directory
+            Args:
+            path(str)         : Full path to list
+            otype(str)        : "all", "file" or "dir"
+            pattern(str)      : Search for files/dirs of specific pattern
+                                based on pattern_type .
+            pattern_type(str) : "glob" or "regex". Default glob.
+            Returns:
+                List of files/directories names under path.
+        """
+        if not path:
+            raise MissingArgumentError("Path not provided")
+        search_exp_list = None
+        if pattern:
+            search_exp_list = \
+                WhdfsSearchExpressionList(WhdfsSearchExpression
+                                          (WhdfsSearchKeys.PATH_KEY,
+                                           pattern_type,
+                                           pattern))
+        return await self._list_dir_info(path=path, otype=otype,
+                                         key=WhdfsSearchKeys.PATH_KEY,
+                                         ignore_error=ignore_error,
+                                         search_exp_list=search_exp_list)
+
+    async def long_list_dir(self, path=None, otype="all", pattern=None,
+                            pattern_type="glob", ignore_error=False,
+                            ext_status=False):
+        """ Long list contents of directory.
+            Arguments are the same as Webhdfs.long_list_dir.
+            Returns:
+                List of file status dictionaries.
+        """
+        search_exp_list = None
+        if pattern:
+            search_exp_list = \
+                WhdfsSearchExpressionList(WhdfsSearchExpression
+                                          (WhdfsSearchKeys.PATH_KEY,
+                                           pattern_type,
+                                           pattern))
+        return await self._list_dir_info(path=path, otype=otype, key="all",
+                                         ignore_error=ignore_error,
+                                         search_exp_list=search_exp_list,
+                                         ext_status=ext_status)
+
+    async def scan_dir(self, path, level=None, pattern=None, pattern_type="glob",
+                       otype="all", ignore_error=True, skip_dirs=[],
+                       search_exp_list=None):
+        """
+        Async generator that walks through the filesystem starting from path
+        with long listing for each filesystem object.
+        Arguments are the same as Webhdfs.scan_dir.
+        Output is in depth first order. The listings of the next
+        max_concurrency directories in that order run ahead concurrently.
+
+        Yields:
+            root, dirlist, filelist where dirlist and filelist contains
+            status of directories and files under root respectively.
+        """
+        tmap = {"file": "FILE", "dir": "DIRECTORY"}
+        type_key = WhdfsSearchKeys.get_value(WhdfsSearchKeys.TYPE_KEY)
+        if level is None or level < 1:
+            level = 500
+        if not path:
+            raise MissingArgumentError("Path not provided")
+        pathinfo = await self.get_path_status(path)
+
+        if skip_dirs:
+            if isinstance(skip_dirs, str):
+                skip_dirs = set([skip_dirs.rstrip("/")])
+            elif isinstance(skip_dirs, list):
+                skip_dirs = set([x.rstrip("/") for x in skip_dirs])
+            else:
+                raise IllegalArgumentError("Skip dir list is not valid")
+
+        if pattern and not search_exp_list:
+            search_exp_list = WhdfsSearchExpressionList(
+                WhdfsSearchExpression(WhdfsSearchKeys.PATH_KEY, pattern_type, pattern))
+
+        if path in skip_dirs or pathinfo[type_key] != tmap["dir"]:
+            return
+
+        def listing(fullpath):
+            return asyncio.ensure_future(
+                self.long_list_dir(path=fullpath, otype="all",
+                                   ignore_error=ignore_error, ext_status=True))
+
+        # Entries are [path, level, listing task]. Only the max_concurrency
+        # entries next in order have a listing started, the others wait
+        # with None so that wide trees do not schedule every directory.
+        stack = [[path, 1, None]]
+        started = 0
+        try:
+            while stack:
+                for entry in reversed(stack):
+                    if started >= self.max_concurrency:
+                        break
+                    if entry[2] is None:
+                        entry[2] = listing(entry[0])
+                        started += 1
+                fullpath, currlev, task = stack.pop()
+                started -= 1
+                olist = await task or []
+                dlist = [x for x in olist if x[type_key] == tmap["dir"]]
+                outflist = [x for x in olist
+                            if otype in ("all", "file") and x[type_key] == tmap["file"] and
+                            (not search_exp_list or search_exp_list.match(x))]
+                outdlist = [x for x in dlist
+                            if otype in ("all", "dir") and
+                            (not search_exp_list or search_exp_list.match(x))]
+                if currlev + 1 <= level:
+                    children = [_child_path(fullpath, x) for x in dlist]
+                    stack.extend(reversed([[x, currlev + 1, None]
+                                           for x in children if x not in skip_dirs]))
+                yield fullpath, outdlist, outflist
+        finally:
+            for _, _, task in stack:
+                if task is not None:
+                    task.cancel()
+
+    async def iter_file(self, srcfile, offset=None, length=None, buffer_size=None,
+                        chunk_size=1048576):
+        """ Async generator over the bytes of a hdfs file
+        Args:
+            srcfile(str)       : hdfs file to be read
+            offset(int)        : starting byte position
+            length(int)        : length to read
+            buffer_size        : buffer size used by the datanode
+            chunk_size(int)    : size of each chunk yielded. Default 1 MB.
+        """
+        if not srcfile:
+            raise MissingArgumentError("Source file not provided")
+        open_op = "OPEN"
+        if offset:
+            open_op += "&offset=" + str(offset)
+        if length:
+            open_op += "&length=" + str(length)
+        if buffer_size:
+            open_op += "&buffersize=" + str(buffer_size)
+        url = self._get_op_url(self._get_path_url(srcfile), open_op)
+        async with self._semaphore:
+            async with self.session.get(url, allow_redirects=True) as response:
+                if response.status != 200:
+                    raise IOError("File read failed \n{0}\n"
+                                  .format(self._remote_error(await response.text())))
+                async for block in response.content.iter_chunked(chunk_size):
+                    yield block
+
+    async def _redirect_upload(self, url, method, data_iter):
+        """
+        Helper method
+        Sends the namenode request, follows the datanode redirect and
+        streams data_iter to it.
+        """
+        async with self._semaphore:
+            async with self.session.request(method, url, allow_redirects=False) as response:
+                if "location" not in response.headers:
+                    raise HTTPError(self._remote_error(await response.text()))
+                new_url = response.headers["location"]
+            async with self.session.request(method, new_url,
+                                            data=_async_body(data_iter)) as response:
+                if response.status not in (200, 201):
+                    raise HTTPError(self._remote_error(await response.text()))
+
+    async def upload_data_iter(self, data_iter, tgtfile, block_size=None, replication=None,
+                               permission=None, buffer_size=None, create_parent=False,
+                               overwrite=True, ignore_error=False):
+        """ Uploads data from an iterator or async iterator to a hdfs file.
+        Arguments are the same as Webhdfs.upload_data_iter.
+        Returns:
+            True on success, False if the upload failed and ignore_error is set
+            and None if the target exists and overwrite is False.
+        """
+        if data_iter is None:
+            raise MissingArgumentError("Iterator not provided")
+        if not tgtfile:
+            raise MissingArgumentError("Target Path not provided")
+
+        if overwrite is False:
+            status = await self.get_path_status(tgtfile, ignore_error=True)
+            if status.get("type") == "FILE":
+                print("Target file {0} present ".format(tgtfile) +
+                      "and overwrite set to False. Skipping upload.")
+                return None
+
+        url = self._get_op_url(self._get_path_url(tgtfile), "CREATE")
+        url += "&createparent=" + str(create_parent is True).lower()
+        if block_size:
+            url += "&blocksize=" + str(block_size)
+        if replication:
+            url += "&replication=" + str(replication)
+        if permission:
+            url += "&permission=" + str(permission)
+        if buffer_size:
+            url += "&buffersize=" + str(buffer_size)
+        url += "&overwrite=" + str(overwrite is True).lower()
+
+        try:
+            start = time.time()
+            await self._redirect_upload(url, "PUT", data_iter)
+        except HTTPError as e:
+            raise IOError("File upload failed \n{0}\n".format(e))
+        except Exception:
+            if not ignore_error:
+                raise
+            print("Upload failed")
+            return False
+        print("Total time taken to upload to {0} ".format(tgtfile) +
+              "is {0} seconds ".format(str(time.time() - start).strip()))
+        return True
+
+    async def append_data_iter(self, data_iter, tgtfile, buffer_size=None, ignore_error=False):
+        """ Appends data from an iterator or async iterator to a hdfs file
+        Arguments are the same as Webhdfs.append_data_iter.
+        """
+        if data_iter is None:
+            raise MissingArgumentError("Iterator not provided")
+        if not tgtfile:
+            raise MissingArgumentError("Target Path not provided")
+        status = await self.get_path_status(tgtfile, ignore_error=True)
+        if status.get("type") != "FILE":
+            raise IOError("Target file {0} does not exist or is not a file".format(tgtfile))
+
+        url = self._get_op_url(self._get_path_url(tgtfile), "APPEND")
+        if buffer_size:
+            url += "&buffersize=" + str(buffer_size)
+        try:
+            start = time.time()
+            await self._redirect_upload(url, "POST", data_iter)
+        except HTTPError as e:
+            raise IOError("File append failed \n{0}\n".format(e))
+        except Exception:
+            if not ignore_error:
+                raise
+            print("Upload failed")
+            return False
+        print("Total time taken to append " +
+              "is {0} seconds ".format(str(time.time() - start).strip()))
+        return True
+
+
+def _child_path(path, x):
+    """ Returns the full path of child status x under path """
+    path_key = WhdfsSearchKeys.get_value(WhdfsSearchKeys.PATH_KEY)
+    return ("" if path == "/" else path) + "/" + x[path_key]
+
+
+def _extended_info(dir_count=0, file_count=0, count_quota=-1,
+                   space_quota=-1, raw_size=0):
+    """ Returns content summary fields for a non directory status """
+    return {WhdfsSearchKeys.get_value(WhdfsSearchKeys.DIR_COUNT_KEY): dir_count,
+            WhdfsSearchKeys.get_value(WhdfsSearchKeys.FILE_COUNT_KEY): file_count,
+            WhdfsSearchKeys.get_value(WhdfsSearchKeys.COUNT_QUOTA_KEY): count_quota,
+            WhdfsSearchKeys.get_value(WhdfsSearchKeys.SPACE_QUOTA_KEY): space_quota,
+            WhdfsSearchKeys.get_value(WhdfsSearchKeys.RAW_SIZE_KEY): raw_size}
+
+
+async def _async_body(data_iter):
+    """ Adapts bytes, an iterable or an async iterable to an async generator """
+    if isinstance(data_iter, (bytes, bytearray)):
+        yield bytes(data_iter)
+    elif hasattr(data_iter, "__aiter__"):
+        async for block in data_iter:
+            yield block
+    else:
+        for block in data_iter:
+            yield block
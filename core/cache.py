@@ -0,0 +1,118 @@
+import posixpath
+import threading
+import time
+from collections import OrderedDict
+
+
+class StatusCache(object):
+    """
+    Thread safe, size bounded cache of hdfs FileStatus dictionaries keyed
+    by path. Entries expire ttl seconds after they were stored and the
+    least recently used entry is evicted once max_size entries are held.
+
+    Attributes:
+        max_size(int)   : Maximum number of statuses kept.
+        ttl(float)      : Seconds a status is served from the cache.
+                          None keeps statuses until they are evicted
+                          or invalidated.
+    """
+
+    def __init__(self, max_size=10000, ttl=30):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._expirations = 0
+        self._invalidations = 0
+
+    @staticmethod
+    def key(path):
+        """ Returns the normalized cache key of an hdfs path """
+        return posixpath.normpath("/" + path.lstrip("/"))
+
+    def get(self, path):
+        """ Returns the cached status of path or None """
+        key = self.key(path)
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is None:
+                self._misses += 1
+                return None
+            expires, status = entry
+            if expires is not None and expires < time.time():
+                self._expirations += 1
+                self._misses += 1
+                return None
+            # Re-insert as the most recently used entry
+            self._entries[key] = entry
+            self._hits += 1
+            return status
+
+    def put(self, path, status):
+        """ Stores the status of path """
+        key = self.key(path)
+        expires = time.time() + self.ttl if self.ttl is not None else None
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = (expires, status)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+
+    def put_listing(self, path, statuses, path_key="pathSuffix"):
+        """
+        Generator that stores the statuses of a directory listing of path
+        as they are yielded. The cached copies have an empty path_key like
+        the statuses returned by GETFILESTATUS.
+        """
+        parent = self.key(path)
+        if parent == "/":
+            parent = ""
+        for status in statuses:
+            if status.get(path_key):
+                cached = dict(status)
+                cached[path_key] = ""
+                self.put(parent + "/" + status[path_key], cached)
+            yield status
+
+    def invalidate(self, path, recursive=False):
+        """
+        Removes the status of path and, with recursive, the statuses of
+        everything under path.
+        """
+        key = self.key(path)
+        with self._lock:
+            if self._entries.pop(key, None) is not None:
+                self._invalidations += 1
+            if recursive:
+                prefix = key.rstrip("/") + "/"
+                for child in [x for x in self._entries if x.startswith(prefix)]:
+                    del self._entries[child]
+                    self._invalidations += 1
+
+    def clear(self):
+        """ Removes all statuses """
+        with self._lock:
+            self._invalidations += len(self._entries)
+            self._entries.clear()
+
+    def stats(self):
+        """
+        Returns cache statistics as a dictionary
+            {
+                "size": N, "hits": N, "misses": N, "hit_rate": F,
+                "evictions": N, "expirations": N, "invalidations": N
+            }
+        """
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {"size": len(self._entries),
+                    "hits": self._hits,
+                    "misses": self._misses,
+                    "hit_rate": float(self._hits) / lookups if lookups else 0.0,
+                    "evictions": self._evictions,
+                    "expirations": self._expirations,
+                    "invalidations": self._invalidations}
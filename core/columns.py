@@ -0,0 +1,212 @@
+"""
+    Columnar accumulation of hdfs FileStatus dictionaries.
+    Numeric fields are kept in typed arrays and string fields are
+    dictionary encoded. Columns are returned as numpy arrays when numpy
+    is installed and as array.array otherwise.
+"""
+
+import array
+import time
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+try:
+    array.array("q")
+    INT64_TYPECODE = "q"
+except ValueError:
+    # python 2 has no 64 bit typecode, doubles hold sizes exactly to 2**53
+    INT64_TYPECODE = "d"
+
+# Column name and kind. The "root" column holds the directory a status was
+# listed from instead of a FileStatus field.
+DEFAULT_COLUMNS = (("root", "str"),
+                   ("length", "int"),
+                   ("replication", "int"),
+                   ("modificationTime", "int"),
+                   ("accessTime", "int"),
+                   ("owner", "str"),
+                   ("type", "str"))
+
+_TYPECODES = {"int": INT64_TYPECODE, "float": "d"}
+
+
+class DictColumn(object):
+    """
+    Dictionary encoded string column. Every distinct value is stored once
+    in values and rows hold its index in codes.
+
+    Attributes:
+        codes(array)  : Index into values of each row.
+        values(list)  : Distinct values in the order they were first seen.
+    """
+
+    def __init__(self):
+        self.codes = array.array("i")
+        self.values = []
+        self._index = {}
+
+    def append(self, value):
+        code = self._index.get(value)
+        if code is None:
+            code = self._index[value] = len(self.values)
+            self.values.append(value)
+        self.codes.append(code)
+
+    def code(self, value):
+        """ Returns the code of value or -1 if no row has it """
+        return self._index.get(value, -1)
+
+    def __len__(self):
+        return len(self.codes)
+
+    def __getitem__(self, i):
+        return self.values[self.codes[i]]
+
+
+class StatusColumns(object):
+    """
+    Accumulates FileStatus dictionaries column by column.
+
+    Attributes:
+        columns(tuple) : (name, kind) of each column where kind is "int",
+                         "float" or "str". Default DEFAULT_COLUMNS.
+        use_numpy(bool): Return numpy arrays. Default True if numpy is
+                         installed.
+
+    Example:
+        cols = whdfs.scan_to_columns("/apps")
+        print(cols.total("length"))
+        print(cols.group_sum("owner", "length"))
+    """
+
+    def __init__(self, columns=None, use_numpy=None):
+        self.columns = tuple(columns or DEFAULT_COLUMNS)
+        if use_numpy and numpy is None:
+            raise ImportError("numpy is not installed")
+        self.use_numpy = numpy is not None if use_numpy is None else use_numpy
+        self._data = {}
+        for name, kind in self.columns:
+            if kind == "str":
+                self._data[name] = DictColumn()
+            elif kind in _TYPECODES:
+                self._data[name] = array.array(_TYPECODES[kind])
+            else:
+                raise ValueError("Invalid column kind {0} for {1}".format(kind, name))
+        self._rows = 0
+
+    def append(self, status, root=None):
+        """ Appends a FileStatus dictionary listed from the directory root """
+        for name, kind in self.columns:
+            if name == "root":
+                value = root
+            elif kind == "str":
+                value = status.get(name)
+            else:
+                value = status.get(name) or 0
+            self._data[name].append(value)
+        self._rows += 1
+
+    def extend(self, statuses, root=None):
+        """ Appends FileStatus dictionaries listed from the directory root """
+        for status in statuses:
+            self.append(status, root)
+        return self
+
+    def __len__(self):
+        return self._rows
+
+    def __contains__(self, name):
+        return name in self._data
+
+    def __getitem__(self, name):
+        """
+        Returns a numeric column as a numpy array or array.array and a
+        string column as a DictColumn whose codes are a numpy array or
+        array.array.
+        """
+        column = self._data[name]
+        if isinstance(column, DictColumn):
+            if self.use_numpy:
+                encoded = DictColumn()
+                encoded.codes = self._as_numpy(column.codes)
+                encoded.values = column.values
+                encoded._index = column._index
+                return encoded
+            return column
+        return self._as_numpy(column) if self.use_numpy else column
+
+    @staticmethod
+    def _as_numpy(column):
+        """
+        Helper method
+        Returns a numpy copy of an array.array. A view would stop the
+        array from growing while it exists.
+        """
+        if not len(column):
+            return numpy.zeros(0, dtype=column.typecode)
+        return numpy.frombuffer(column, dtype=column.typecode).copy()
+
+    def total(self, name="length"):
+        """ Returns the sum of a numeric column """
+        column = self[name]
+        return column.sum() if self.use_numpy else sum(column)
+
+    def group_sum(self, by, name="length"):
+        """
+        Returns a dictionary of each value of the string column by to the
+        sum of the numeric column name over the rows with that value.
+        """
+        keys = self[by]
+        values = self[name]
+        if self.use_numpy:
+            sums = numpy.bincount(keys.codes, weights=values,
+                                  minlength=len(keys.values))
+            if values.dtype.kind == "i":
+                sums = sums.round().astype(values.dtype)
+        else:
+            sums = [0] * len(keys.values)
+            for code, value in zip(keys.codes, values):
+                sums[code] += value
+        return dict(zip(keys.values, sums))
+
+    def group_count(self, by):
+        """ Returns a dictionary of each value of the string column by to its row count """
+        keys = self[by]
+        if self.use_numpy:
+            counts = numpy.bincount(keys.codes, minlength=len(keys.values))
+        else:
+            counts = [0] * len(keys.values)
+            for code in keys.codes:
+                counts[code] += 1
+        return dict(zip(keys.values, counts))
+
+    def age(self, name="modificationTime", now=None):
+        """ Returns the age in seconds of a millisecond time column at now """
+        now_ms = (time.time() if now is None else now) * 1000
+        column = self[name]
+        if self.use_numpy:
+            return (now_ms - column) / 1000.0
+        return array.array("d", ((now_ms - x) / 1000.0 for x in column))
+
+    def to_dict(self):
+        """
+        Returns a dictionary of column name to a list, or with numpy an
+        array, of row values with strings decoded. Suitable for
+        pandas.DataFrame.
+        """
+        out = {}
+        for name, kind in self.columns:
+            column = self[name]
+            if kind == "str":
+                if self.use_numpy:
+                    values = numpy.empty(len(column.values), dtype=object)
+                    values[:] = column.values
+                    out[name] = values[column.codes]
+                else:
+                    out[name] = [column.values[x] for x in column.codes]
+            else:
+                out[name] = column if self.use_numpy else list(column)
+        return out
@@ -1,20 +1,1052 @@
 try:
     from urlparse import urljoin as url_join
     from urllib import quote as url_quote
-    from urllib import urlretrieve
+    from urlparse import urlparse as url_parse
 except ImportError:
-    from urllib.request import urlretrieve
     from urllib.parse import urljoin as url_join
     from urllib.parse import quote as url_quote
+    from urllib.parse import urlparse as url_parse
 
 import requests
+import math
+import mmap
 import os
+import random
+import sys
+import threading
+import time
 from errors import *
+from util import TokenBucket
+
+# Highest resolution clock for measuring request latencies
+_clock = getattr(time, "perf_counter", time.time)
+
+
+class SessionPool(object):
+    """
+    Thread safe pool of keep-alive http sessions shared by all rest clients.
+    One requests.Session is kept per scheme://host:port so that connections
+    to the same service are reused across calls instead of opening a new
+    tcp connection for each request.
+
+    Attributes:
+        pool_size(int)      : Maximum number of connections kept per host.
+        keep_alive(bool)    : If False every request is sent with
+                              'Connection: close'.
+        idle_timeout(float) : Seconds after which an unused host session is
+                              closed and evicted. None disables eviction.
+        pool_block(bool)    : If True callers wait for a free connection
+                              instead of opening an unpooled one when all
+                              pool_size connections are busy.
+    """
+
+    def __init__(self, pool_size=10, keep_alive=True, idle_timeout=60,
+                 pool_block=False):
+        self.pool_size = pool_size
+        self.keep_alive = keep_alive
+        self.idle_timeout = idle_timeout
+        self.pool_block = pool_block
+        self._lock = threading.Lock()
+        self._sessions = {}
+        self._last_used = {}
+        self._last_sweep = time.time()
+        self._session_hits = 0
+        self._session_misses = 0
+        self._evictions = 0
+        self._closed_requests = 0
+        self._closed_connections = 0
+
+    @staticmethod
+    def _host_key(url):
+        parts = url_parse(url)
+        return parts.scheme + "://" + parts.netloc
+
+    def _new_session(self):
+        session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=1,
+                                                pool_maxsize=self.pool_size,
+                                                pool_block=self.pool_block)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        if not self.keep_alive:
+            session.headers["Connection"] = "close"
+        return session
+
+    @staticmethod
+    def _connection_counts(session):
+        """ Returns (requests, connections) made through a session's pools """
+        num_requests, num_connections = 0, 0
+        for adapter in set(session.adapters.values()):
+            poolmanager = getattr(adapter, "poolmanager", None)
+            if poolmanager is None:
+                continue
+            for key in list(poolmanager.pools.keys()):
+                pool = poolmanager.pools.get(key)
+                if pool is not None:
+                    num_requests += pool.num_requests
+                    num_connections += pool.num_connections
+        return num_requests, num_connections
+
+    def _close(self, key):
+        """ Closes a host session. Caller must hold the lock. """
+        session = self._sessions.pop(key)
+        self._last_used.pop(key, None)
+        num_requests, num_connections = self._connection_counts(session)
+        self._closed_requests += num_requests
+        self._closed_connections += num_connections
+        session.close()
+
+    def _evict_idle(self, now):
+        """ Closes sessions idle for longer than idle_timeout. Caller must hold the lock. """
+        for key in [k for k, t in self._last_used.items()
+                    if now - t > self.idle_timeout]:
+            self._close(key)
+            self._evictions += 1
+        self._last_sweep = now
+
+    def session(self, url):
+        """
+        Returns the shared session for the host of url, creating it if needed.
+        Args:
+            url(str)    : Entire url
+        """
+        key = self._host_key(url)
+        now = time.time()
+        with self._lock:
+            if self.idle_timeout is not None and \
+                    now - self._last_sweep > self.idle_timeout / 2.0:
+                self._evict_idle(now)
+            session = self._sessions.get(key)
+            if session is None:
+                session = self._new_session()
+                self._sessions[key] = session
+                self._session_misses += 1
+            else:
+                self._session_hits += 1
+            self._last_used[key] = now
+            return session
+
+    def configure(self, pool_size=None, keep_alive=None, idle_timeout=None,
+                  pool_block=None):
+        """
+        Changes pool settings. Open sessions are closed so that the
+        new settings apply to subsequent requests.
+        """
+        with self._lock:
+            if pool_size is not None:
+                self.pool_size = pool_size
+            if keep_alive is not None:
+                self.keep_alive = keep_alive
+            if idle_timeout is not None:
+                self.idle_timeout = idle_timeout if idle_timeout > 0 else None
+            if pool_block is not None:
+                self.pool_block = pool_block
+            for key in list(self._sessions.keys()):
+                self._close(key)
+
+    def close(self):
+        """ Closes all sessions and their connections """
+        with self._lock:
+            for key in list(self._sessions.keys()):
+                self._close(key)
+
+    def stats(self):
+        """
+        Returns pool statistics as a dictionary
+            {
+                "hosts": N, "session_hits": N, "session_misses": N,
+                "evictions": N, "requests": N,
+                "connection_hits": N, "connection_misses": N
+            }
+        connection_misses is the number of tcp connections opened and
+        connection_hits the number of requests served on an already
+        open connection.
+        """
+        with self._lock:
+            num_requests, num_connections = \
+                self._closed_requests, self._closed_connections
+            for session in self._sessions.values():
+                session_requests, session_connections = \
+                    self._connection_counts(session)
+                num_requests += session_requests
+                num_connections += session_connections
+            return {"hosts": len(self._sessions),
+                    "session_hits": self._session_hits,
+                    "session_misses": self._session_misses,
+                    "evictions": self._evictions,
+                    "requests": num_requests,
+                    "connection_hits": max(num_requests - num_connections, 0),
+                    "connection_misses": num_connections}
+
+
+_SESSION_POOL = SessionPool()
+
+
+class AIMDLimiter(object):
+    """
+    Thread safe adaptive limit of concurrent requests to one host using
+    additive increase and multiplicative decrease. The limit grows by
+    increase after every limit requests that complete normally. It is
+    multiplied by decrease, at most once per limit completed requests,
+    when a request fails with a server or connection error or when the
+    smoothed latency rises above latency_factor times its baseline, the
+    lowest smoothed latency seen, which drifts up slowly so that a
+    cluster that stays slower is not taken for a congested one.
+
+    Attributes:
+        limit(float)            : Current limit.
+        min_limit(int)          : Lowest limit.
+        max_limit(int)          : Highest limit.
+        latency_factor(float)   : Rise of the latency over the baseline
+                                  taken for congestion.
+        latency_floor(float)    : Latencies in seconds below which there
+                                  is no congestion.
+    """
+
+    def __init__(self, initial=4, min_limit=1, max_limit=64, increase=1,
+                 decrease=0.5, latency_factor=2.0, latency_floor=0.05,
+                 smoothing=0.2, drift=0.01):
+        self.limit = float(max(min(initial, max_limit), min_limit))
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.increase = increase
+        self.decrease = decrease
+        self.latency_factor = latency_factor
+        self.latency_floor = latency_floor
+        self.smoothing = smoothing
+        self.drift = drift
+        self._cond = threading.Condition()
+        self._inflight = 0
+        self._latency = None
+        self._baseline = None
+        self._successes = 0
+        self._since_decrease = 0
+        self._increases = 0
+        self._decreases = 0
+        self._waited = 0.0
+
+    def acquire(self):
+        """ Blocks while limit requests are in flight """
+        with self._cond:
+            if self._inflight >= int(self.limit):
+                start = time.time()
+                while self._inflight >= int(self.limit):
+                    self._cond.wait()
+                self._waited += time.time() - start
+            self._inflight += 1
+
+    def release(self, latency=None, failed=False):
+        """
+        Records the end of a request that took latency seconds, None if
+        its latency says nothing about the load of the host, and adapts
+        the limit.
+        """
+        with self._cond:
+            self._inflight -= 1
+            self._since_decrease += 1
+            congested = failed
+            if latency is not None:
+                if self._latency is None:
+                    self._latency = latency
+                else:
+                    self._latency += self.smoothing * (latency - self._latency)
+                if self._baseline is None or self._latency < self._baseline:
+                    self._baseline = self._latency
+                else:
+                    self._baseline += self.drift * (self._latency - self._baseline)
+                if self._latency > self.latency_floor and \
+                        self._latency > self._baseline * self.latency_factor:
+                    congested = True
+            if congested:
+                self._successes = 0
+                if self._since_decrease >= self.limit:
+                    self.limit = max(float(self.min_limit), self.limit * self.decrease)
+                    self._since_decrease = 0
+                    self._decreases += 1
+            else:
+                self._successes += 1
+                if self._successes >= self.limit and self.limit < self.max_limit:
+                    self.limit = min(float(self.max_limit), self.limit + self.increase)
+                    self._successes = 0
+                    self._increases += 1
+            self._cond.notify_all()
+
+    def stats(self):
+        """ Returns the limit, requests in flight and latencies as a dictionary """
+        with self._cond:
+            return {"limit": int(self.limit),
+                    "inflight": self._inflight,
+                    "latency": self._latency,
+                    "baseline": self._baseline,
+                    "increases": self._increases,
+                    "decreases": self._decreases,
+                    "waited": self._waited}
+
+
+class RequestLimiter(object):
+    """
+    Client side limits of the requests sent to each host, shared by all
+    clients of the process: a token bucket of rate requests per second
+    and a limit of concurrent requests, fixed or adaptive (AIMDLimiter).
+    Nothing is limited until it is configured.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._hosts = {}
+        self._settings = {}
+
+    def configure(self, rate=None, burst=None, concurrency=None, adaptive=False,
+                  max_concurrency=64, latency_factor=2.0):
+        """ Replaces the limits. See Request.configure_limits """
+        with self._lock:
+            self._hosts = {}
+            self._settings = {}
+            if rate:
+                self._settings["rate"] = (rate, burst)
+            if adaptive:
+                self._settings["concurrency"] = dict(
+                    initial=concurrency or 4, max_limit=max_concurrency,
+                    latency_factor=latency_factor)
+            elif concurrency:
+                self._settings["concurrency"] = dict(
+                    initial=concurrency, min_limit=concurrency,
+                    max_limit=concurrency)
+
+    def _host(self, url):
+        """ Helper method. Returns the token bucket and limiter of the host of url """
+        key = SessionPool._host_key(url)
+        with self._lock:
+            limits = self._hosts.get(key)
+            if limits is None:
+                rate = self._settings.get("rate")
+                concurrency = self._settings.get("concurrency")
+                limits = self._hosts[key] = (
+                    TokenBucket(rate[0], rate[1]) if rate else None,
+                    AIMDLimiter(**concurrency) if concurrency else None)
+            return limits
+
+    def acquire(self, url):
+        """
+        Waits until a request to the host of url is allowed. Returns the
+        token to pass to release or None if nothing is limited.
+        """
+        if not self._settings:
+            return None
+        bucket, limiter = self._host(url)
+        if bucket:
+            bucket.acquire()
+        if limiter:
+            limiter.acquire()
+        return limiter, time.time()
+
+    def release(self, token, failed=False, sample=True):
+        """
+        Records the end of a request allowed by acquire. failed is True for
+        a server or connection error, sample False if its latency is not
+        a measure of the load of the host, as for data transfers.
+        """
+        if token is None or token[0] is None:
+            return
+        limiter, start = token
+        limiter.release(time.time() - start if sample else None, failed)
+
+    def stats(self):
+        """ Returns the AIMDLimiter stats of each host """
+        with self._lock:
+            hosts = dict(self._hosts)
+        return dict((key, limiter.stats()) for key, (bucket, limiter) in hosts.items()
+                    if limiter is not None)
+
+
+_LIMITER = RequestLimiter()
+
+
+class LatencyHistogram(object):
+    """
+    Latency histogram with buckets of bounded relative width in the manner
+    of HdrHistogram. Latencies are counted in microseconds: values below
+    2**(precision + 1) have a bucket each and every higher power of two
+    range is split into 2**precision buckets, so that percentiles are
+    within 1/2**precision of the recorded latencies at any magnitude and
+    recording one is a few integer operations. Not thread safe.
+
+    Attributes:
+        precision(int)  : Sub bucket bits per power of two. Default 5,
+                          about 3% relative error.
+        count(int)      : Number of recorded latencies.
+        total(float)    : Sum of the recorded latencies in seconds.
+        min(float)      : Lowest recorded latency in seconds.
+        max(float)      : Highest recorded latency in seconds.
+    """
+
+    def __init__(self, precision=5):
+        self.precision = precision
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+        self._counts = []
+
+    def _index(self, value):
+        """ Helper method. Returns the bucket of value microseconds """
+        shift = max(value.bit_length() - self.precision - 1, 0)
+        return (shift << self.precision) + (value >> shift)
+
+    def _bounds(self, index):
+        """ Helper method. Returns the lowest and highest microseconds of a bucket """
+        shift = max((index >> self.precision) - 1, 0)
+        low = (index - (shift << self.precision)) << shift
+        return low, low + (1 << shift) - 1
+
+    def record(self, latency):
+        """ Records a latency in seconds """
+        index = self._index(max(int(latency * 1000000), 0))
+        if index >= len(self._counts):
+            self._counts.extend([0] * (index + 1 - len(self._counts)))
+        self._counts[index] += 1
+        self.count += 1
+        self.total += latency
+        if self.min is None or latency < self.min:
+            self.min = latency
+        if self.max is None or latency > self.max:
+            self.max = latency
+
+    def merge(self, other):
+        """ Adds the latencies recorded by a histogram of the same precision """
+        if other.precision != self.precision:
+            raise IllegalArgumentError("Cannot merge histograms of precision {0} and {1}"
+                                       .format(self.precision, other.precision))
+        if len(other._counts) > len(self._counts):
+            self._counts.extend([0] * (len(other._counts) - len(self._counts)))
+        for index, count in enumerate(other._counts):
+            self._counts[index] += count
+        self.count += other.count
+        self.total += other.total
+        if other.min is not None and (self.min is None or other.min < self.min):
+            self.min = other.min
+        if other.max is not None and (self.max is None or other.max > self.max):
+            self.max = other.max
+        return self
+
+    def percentile(self, percent):
+        """
+        Returns the latency in seconds that percent of the recorded
+        latencies do not exceed or None if nothing was recorded.
+        """
+        if not self.count:
+            return None
+        rank = max(int(math.ceil(percent / 100.0 * self.count)), 1)
+        seen = 0
+        for index, count in enumerate(self._counts):
+            seen += count
+            if seen >= rank:
+                return min(self._bounds(index)[1] / 1000000.0, self.max)
+        return self.max
+
+    def cumulative(self, bounds):
+        """
+        Returns the number of latencies not above each of the ascending
+        bounds in seconds. Buckets are counted whole under the bounds
+        that are not below their lowest value.
+        """
+        counts = []
+        seen = 0
+        index = 0
+        for bound in bounds:
+            while index < len(self._counts) and \
+                    self._bounds(index)[0] <= bound * 1000000:
+                seen += self._counts[index]
+                index += 1
+            counts.append(seen)
+        return counts
+
+    def stats(self):
+        """
+        Returns the latency statistics in seconds as a dictionary
+            {
+                "count": N, "sum": F, "min": F, "max": F, "mean": F,
+                "p50": F, "p90": F, "p99": F, "p999": F
+            }
+        """
+        return {"count": self.count,
+                "sum": self.total,
+                "min": self.min,
+                "max": self.max,
+                "mean": self.total / self.count if self.count else None,
+                "p50": self.percentile(50),
+                "p90": self.percentile(90),
+                "p99": self.percentile(99),
+                "p999": self.percentile(99.9)}
+
+
+# Upper bounds in seconds of the buckets of the prometheus histograms
+PROMETHEUS_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25,
+                      0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+class RequestMetrics(object):
+    """
+    Thread safe request counts, bytes received and sent and latency
+    histograms by operation, host and status, shared by all clients of
+    the process. The operation is the webhdfs op parameter or the path of
+    the rest api with ids replaced by {id}, the status the http status
+    code or "error" when no response was received.
+
+    Attributes:
+        enabled(bool)   : Record requests. Default True.
+        precision(int)  : Precision of the LatencyHistogram.
+    """
+
+    LABELS = ("op", "host", "status")
+
+    def __init__(self, enabled=True, precision=5):
+        self.enabled = enabled
+        self.precision = precision
+        self._lock = threading.Lock()
+        self._series = {}
+
+    def record(self, op, host, status, latency, bytes_in=0, bytes_out=0):
+        """ Records a request that took latency seconds """
+        key = (op, host, status)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0, 0, LatencyHistogram(self.precision)]
+            series[0] += bytes_in
+            series[1] += bytes_out
+            series[2].record(latency)
+
+    def reset(self):
+        """ Removes all recorded requests """
+        with self._lock:
+            self._series = {}
+
+    def _grouped(self, group_by):
+        """
+        Helper method
+        Returns a dictionary of the values of the labels group_by to
+        [bytes_in, bytes_out, histogram] merged over the other labels.
+        """
+        positions = []
+        for label in group_by:
+            if label not in self.LABELS:
+                raise IllegalArgumentError("Invalid metric label {0}, expected one of {1}"
+                                           .format(label, ", ".join(self.LABELS)))
+            positions.append(self.LABELS.index(label))
+        groups = {}
+        with self._lock:
+            for key, (bytes_in, bytes_out, histogram) in self._series.items():
+                group = tuple(key[x] for x in positions)
+                merged = groups.get(group)
+                if merged is None:
+                    merged = groups[group] = [0, 0, LatencyHistogram(self.precision)]
+                merged[0] += bytes_in
+                merged[1] += bytes_out
+                merged[2].merge(histogram)
+        return groups
+
+    def snapshot(self, group_by=LABELS):
+        """
+        Returns a list of dictionaries, one per distinct value of the
+        labels group_by, with the most total latency first
+            {
+                "op": S, "host": S, "status": N, "count": N,
+                "bytes_in": N, "bytes_out": N,
+                "latency": LatencyHistogram.stats()
+            }
+        """
+        rows = []
+        for group, (bytes_in, bytes_out, histogram) in self._grouped(group_by).items():
+            row = dict(zip(group_by, group))
+            row.update({"count": histogram.count,
+                        "bytes_in": bytes_in,
+                        "bytes_out": bytes_out,
+                        "latency": histogram.stats()})
+            rows.append(row)
+        rows.sort(key=lambda x: -x["latency"]["sum"])
+        return rows
+
+    def prometheus(self, prefix="groot_request", buckets=PROMETHEUS_BUCKETS):
+        """
+        Returns the metrics in the prometheus text exposition format: a
+        histogram prefix_duration_seconds and the counters
+        prefix_received_bytes_total and prefix_sent_bytes_total labelled
+        with op, host and status.
+        """
+        groups = sorted(self._grouped(self.LABELS).items(), key=lambda x: str(x[0]))
+        labels = [(",".join('{0}="{1}"'.format(name, _prometheus_escape(value))
+                            for name, value in zip(self.LABELS, group)), series)
+                  for group, series in groups]
+        lines = ["# HELP {0}_duration_seconds Latency of hadoop rest api requests."
+                 .format(prefix),
+                 "# TYPE {0}_duration_seconds histogram".format(prefix)]
+        for label, (bytes_in, bytes_out, histogram) in labels:
+            for bound, count in zip(buckets, histogram.cumulative(buckets)):
+                lines.append('{0}_duration_seconds_bucket{{{1},le="{2!r}"}} {3}'
+                             .format(prefix, label, float(bound), count))
+            lines.append('{0}_duration_seconds_bucket{{{1},le="+Inf"}} {2}'
+                         .format(prefix, label, histogram.count))
+            lines.append("{0}_duration_seconds_sum{{{1}}} {2!r}"
+                         .format(prefix, label, histogram.total))
+            lines.append("{0}_duration_seconds_count{{{1}}} {2}"
+                         .format(prefix, label, histogram.count))
+        for name, position, text in (("received", 0, "received in"),
+                                     ("sent", 1, "sent in")):
+            lines.append("# HELP {0}_{1}_bytes_total Bytes {2} hadoop rest api requests."
+                         .format(prefix, name, text))
+            lines.append("# TYPE {0}_{1}_bytes_total counter".format(prefix, name))
+            for label, series in labels:
+                lines.append("{0}_{1}_bytes_total{{{2}}} {3}"
+                             .format(prefix, name, label, series[position]))
+        return "\n".join(lines) + "\n"
+
+
+def _prometheus_escape(value):
+    """ Returns a label value escaped for the prometheus text format """
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+_METRICS = RequestMetrics()
+
+
+class Span(object):
+    """
+    A named unit of work, such as the listing of one directory by
+    scan_dir or one phase of an upload, grouping the requests sent while
+    it is open.
+
+    Attributes:
+        name(str)           : Name of the span.
+        attributes(dict)    : Attributes of the span such as its path.
+        parent(Span)        : Enclosing span or None.
+        start(float)        : time.time() when the span was opened.
+        states(list)        : Values returned by the start_span hooks.
+    """
+
+    def __init__(self, name, attributes, parent):
+        self.name = name
+        self.attributes = attributes
+        self.parent = parent
+        self.start = time.time()
+        self.states = []
+
+
+class _NullScope(object):
+    """ Context manager doing nothing, returned by span while no hook is registered """
+
+    def __enter__(self):
+        return None
+
+    def __exit__(self, *args):
+        return False
+
+
+_NULL_SCOPE = _NullScope()
+
+
+class _SpanScope(object):
+    """ Context manager opening and closing a Span of a RequestHooks """
+
+    def __init__(self, hooks, name, attributes):
+        self._hooks = hooks
+        self._name = name
+        self._attributes = attributes
+
+    def __enter__(self):
+        self._parent = self._hooks.current()
+        self._registered = self._hooks._hooks
+        self.span = Span(self._name, self._attributes, self._parent)
+        self.span.states = [hook[2](self.span) if hook[2] else None
+                            for hook in self._registered]
+        self._hooks._local.span = self.span
+        return self.span
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._hooks._local.span = self._parent
+        for hook, state in zip(self._registered, self.span.states):
+            if hook[3]:
+                hook[3](self.span, state, exc_value)
+        return False
+
+
+class RequestHooks(object):
+    """
+    Registry of callbacks called around every request sent by Request
+    and around the spans that group requests, shared by all clients of
+    the process. The innermost open span of a thread is the context of
+    the requests it sends and is carried to the worker threads of the
+    parallel operations. While no hook is registered a request costs one
+    attribute check and spans are not created. Exceptions raised by the
+    callbacks propagate to the caller.
+    See Request.add_hook
+    """
+
+    def __init__(self):
+        self.active = False
+        self._lock = threading.Lock()
+        self._hooks = ()
+        self._local = threading.local()
+
+    def add(self, before_request=None, after_request=None, start_span=None,
+            end_span=None):
+        """ Registers callbacks and returns the hook to pass to remove """
+        hook = (before_request, after_request, start_span, end_span)
+        with self._lock:
+            self._hooks = self._hooks + (hook,)
+            self.active = True
+        return hook
+
+    def remove(self, hook):
+        """ Unregisters a hook returned by add """
+        with self._lock:
+            self._hooks = tuple(x for x in self._hooks if x is not hook)
+            self.active = bool(self._hooks)
+
+    def current(self):
+        """ Returns the innermost open span of the calling thread or None """
+        return getattr(self._local, "span", None)
+
+    def span(self, name, **attributes):
+        """ Returns a context manager opening a span around its block """
+        if not self.active:
+            return _NULL_SCOPE
+        return _SpanScope(self, name, attributes)
+
+    def propagate(self, func):
+        """
+        Returns func called within the span open when propagate was
+        called, for running func on another thread.
+        """
+        if not self.active:
+            return func
+        span = self.current()
+
+        def run(*args, **kwargs):
+            previous = self.current()
+            self._local.span = span
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self._local.span = previous
+        return run
+
+    def before(self, url, method, headers):
+        """
+        Helper method
+        Calls the before_request callbacks of a request and returns the
+        call to pass to after.
+        """
+        hooks = self._hooks
+        request = {"url": url,
+                   "method": (method or "GET").upper(),
+                   "op": url_metric_name(url),
+                   "host": SessionPool._host_key(url),
+                   "span": self.current(),
+                   "headers": headers,
+                   "start": time.time()}
+        return request, hooks, [hook[0](request) if hook[0] else None
+                                for hook in hooks]
+
+    @staticmethod
+    def after(call, response=None, error=None):
+        """ Helper method. Calls the after_request callbacks of a request """
+        request, hooks, states = call
+        for hook, state in zip(hooks, states):
+            if hook[1]:
+                hook[1](request, state, response, error)
+
+
+_HOOKS = RequestHooks()
+
+
+class UploadReader(object):
+    """
+    File like request body that sends a local file in chunk_size blocks.
+    With use_mmap the file is memory mapped and each block is a view on
+    the mapping, so the data goes from the page cache to the socket without
+    being copied in python. Otherwise blocks are read into one reused
+    buffer. The file is closed when the reader is closed or used as a
+    context manager.
+
+    Attributes:
+        length(int)     : Size of the file in bytes.
+        sent(int)       : Bytes handed to the connection so far.
+        elapsed(float)  : Seconds from the first to the last block.
+    """
+
+    def __init__(self, srcfile, chunk_size=4194304, use_mmap=True):
+        self.chunk_size = chunk_size or 4194304
+        self.sent = 0
+        self._file = open(srcfile, "rb")
+        self._map = None
+        self._buffer = None
+        self._start = None
+        self._end = None
+        try:
+            self.length = os.fstat(self._file.fileno()).st_size
+            if use_mmap and self.length:
+                self._map = mmap.mmap(self._file.fileno(), 0,
+                                      access=mmap.ACCESS_READ)
+            else:
+                self._buffer = bytearray(min(self.chunk_size, self.length) or 1)
+        except:
+            self._file.close()
+            raise
+
+    def __len__(self):
+        return self.length - self.sent
+
+    def _view(self, start, size):
+        try:
+            return memoryview(self._map)[start:start + size]
+        except TypeError:
+            # python 2 mmap only has the old buffer interface
+            return buffer(self._map, start, size)
+
+    def read(self, size=-1):
+        """ Returns the next block. size is ignored in favour of chunk_size. """
+        if self._start is None:
+            self._start = time.time()
+        size = min(self.chunk_size, self.length - self.sent)
+        if size <= 0:
+            if self._end is None:
+                self._end = time.time()
+            return b""
+        if self._map is not None:
+            block = self._view(self.sent, size)
+        else:
+            size = self._file.readinto(self._buffer)
+            block = memoryview(self._buffer)[:size]
+        self.sent += size
+        return block
+
+    @property
+    def elapsed(self):
+        if self._start is None:
+            return 0.0
+        return (self._end or time.time()) - self._start
+
+    def rate(self):
+        """ Returns the throughput of the upload in bytes per second """
+        return self.sent / max(self.elapsed, 1e-6)
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
 
 
 class Request(object):
     """ Requests class for rest calls to hadoop web rest api's"""
 
+    @staticmethod
+    def session(url):
+        """ Returns the pooled keep-alive session for the host of url """
+        return _SESSION_POOL.session(url)
+
+    @staticmethod
+    def configure_pool(pool_size=None, keep_alive=None, idle_timeout=None,
+                       pool_block=None):
+        """
+        Configures the connection pool shared by all clients.
+        Args:
+            pool_size(int)      : Maximum connections kept per host.
+            keep_alive(bool)    : Reuse connections between requests.
+            idle_timeout(float) : Seconds before an unused host session is closed.
+                                  0 disables idle eviction.
+            pool_block(bool)    : Wait for a free connection when the pool is exhausted.
+        """
+        _SESSION_POOL.configure(pool_size=pool_size, keep_alive=keep_alive,
+                                idle_timeout=idle_timeout, pool_block=pool_block)
+
+    @staticmethod
+    def pool_stats():
+        """ Returns hit and miss counts of the shared connection pool """
+        return _SESSION_POOL.stats()
+
+    @staticmethod
+    def configure_limits(rate=None, burst=None, concurrency=None, adaptive=False,
+                         max_concurrency=64, latency_factor=2.0):
+        """
+        Configures the client side limits of the requests sent to each
+        host by all clients of the process. Calling it without arguments
+        removes the limits.
+        Args:
+            rate(float)             : Requests started per second per host.
+            burst(float)            : Requests that may start at once after
+                                      an idle period. Default rate.
+            concurrency(int)        : Concurrent requests per host, the
+                                      initial limit if adaptive.
+            adaptive(bool)          : Adapt the concurrency limit between 1
+                                      and max_concurrency with AIMD, backing
+                                      off on server errors and rising latency
+                                      and ramping up while the host is healthy.
+            max_concurrency(int)    : Highest adaptive limit. Default 64.
+            latency_factor(float)   : Latency rise over the baseline taken for
+                                      congestion. Default 2.0.
+        """
+        _LIMITER.configure(rate=rate, burst=burst, concurrency=concurrency,
+                           adaptive=adaptive, max_concurrency=max_concurrency,
+                           latency_factor=latency_factor)
+
+    @staticmethod
+    def limit_stats():
+        """ Returns the adaptive concurrency limit and latencies of each host """
+        return _LIMITER.stats()
+
+    @staticmethod
+    def configure_metrics(enabled=True):
+        """ Starts or stops recording the latency and bytes of every request """
+        _METRICS.enabled = enabled
+
+    @staticmethod
+    def metric_stats(group_by=RequestMetrics.LABELS):
+        """
+        Returns the request counts, bytes and latency percentiles by the
+        labels group_by, any of "op", "host" and "status".
+        See RequestMetrics.snapshot
+        """
+        return _METRICS.snapshot(group_by)
+
+    @staticmethod
+    def prometheus_metrics(prefix="groot_request", buckets=PROMETHEUS_BUCKETS):
+        """ Returns the request metrics in the prometheus text format """
+        return _METRICS.prometheus(prefix, buckets)
+
+    @staticmethod
+    def reset_metrics():
+        """ Removes all recorded request metrics """
+        _METRICS.reset()
+
+    @staticmethod
+    def add_hook(before_request=None, after_request=None, start_span=None,
+                 end_span=None):
+        """
+        Registers callbacks called around every request sent by the
+        clients of the process and around every span.
+        Args:
+            before_request  : Called with a dictionary describing the
+                              request before it is sent
+                                  {
+                                      "url": S, "method": S, "op": S,
+                                      "host": S, "span": Span,
+                                      "headers": dict, "start": F
+                                  }
+                              Headers it adds to "headers", such as a
+                              trace context, are sent with the request.
+                              Its return value is passed to after_request.
+            after_request   : Called with the request dictionary, the
+                              value returned by before_request, the
+                              response and the exception raised by the
+                              request, one of them None, once the response
+                              is received.
+            start_span      : Called with a Span when it is opened. Its
+                              return value is passed to end_span.
+            end_span        : Called with the Span, the value returned by
+                              start_span and the exception raised in the
+                              span or None when it is closed.
+        Returns:
+            The hook to pass to remove_hook
+        """
+        return _HOOKS.add(before_request, after_request, start_span, end_span)
+
+    @staticmethod
+    def remove_hook(hook):
+        """ Unregisters a hook returned by add_hook """
+        _HOOKS.remove(hook)
+
+    @staticmethod
+    def span(name, **attributes):
+        """
+        Returns a context manager opening a Span with attributes around
+        its block. Requests sent in the block have it as their span.
+        Nothing is done while no hook is registered.
+        """
+        return _HOOKS.span(name, **attributes)
+
+    @staticmethod
+    def current_span():
+        """ Returns the innermost open span of the calling thread or None """
+        return _HOOKS.current()
+
+    @staticmethod
+    def propagate(func):
+        """
+        Returns func called within the span open when propagate was
+        called. Used to carry the span to functions run on thread pools.
+        """
+        return _HOOKS.propagate(func)
+
+    @staticmethod
+    def _measure(url, start, response=None, bytes_in=None, bytes_out=0,
+                 stream=False):
+        """
+        Helper method
+        Records a request to url started at start that returned response,
+        None if it failed. bytes_in defaults to the content length of the
+        response and bytes_out may be a callable returning the bytes sent.
+        """
+        if not _METRICS.enabled:
+            return
+        latency = _clock() - start
+        if response is None:
+            status, bytes_in = "error", 0
+        else:
+            status = response.status_code
+            if bytes_in is None:
+                length = response.headers.get("content-length")
+                if length is not None:
+                    bytes_in = int(length)
+                else:
+                    bytes_in = 0 if stream else len(response.content)
+        _METRICS.record(url_metric_name(url), SessionPool._host_key(url), status,
+                        latency, bytes_in,
+                        bytes_out() if callable(bytes_out) else bytes_out)
+
+    @staticmethod
+    def _limited(url, send, sample=True, bytes_out=0, stream=False, measure=True,
+                 method=None, headers=None):
+        """
+        Helper method
+        Sends a request with send() within the limits of the host of url
+        and returns the response. The request is recorded in the metrics
+        unless measure is False, in which case the caller records it once
+        the response is consumed. Failed requests are always recorded.
+        headers is the dictionary of headers sent by send() to which the
+        before_request hooks may add.
+        """
+        call = _HOOKS.before(url, method, headers) if _HOOKS.active else None
+        token = _LIMITER.acquire(url)
+        start = _clock()
+        try:
+            response = send()
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+            _LIMITER.release(token, failed=True)
+            Request._measure(url, start, bytes_out=bytes_out)
+            if call:
+                _HOOKS.after(call, error=sys.exc_info()[1])
+            raise
+        except:
+            _LIMITER.release(token, sample=False)
+            Request._measure(url, start, bytes_out=bytes_out)
+            if call:
+                _HOOKS.after(call, error=sys.exc_info()[1])
+            raise
+        _LIMITER.release(token, failed=response.status_code >= 500, sample=sample)
+        if measure:
+            Request._measure(url, start, response, bytes_out=bytes_out, stream=stream)
+        if call:
+            _HOOKS.after(call, response)
+        return response
+
     @staticmethod
     def url_request(url, method=None, data=None,
                     allow_redirects=False, timeout=10,
@@ -31,49 +1063,176 @@ class Request(object):
         Returns:
             Response in format
         """
+        if _HOOKS.active:
+            headers = dict(headers or {})
+        return Request._limited(url, lambda: Request._send_request(
+            url, method, data, allow_redirects, timeout, stream, headers),
+            bytes_out=_body_size(method, data), stream=stream, method=method,
+            headers=headers)
+
+    @staticmethod
+    def _send_request(url, method, data, allow_redirects, timeout, stream,
+                      headers):
+        """ Helper method. Sends the request of url_request """
+        session = _SESSION_POOL.session(url)
         if not method or method.lower() == "get":
-            return requests.get(url, allow_redirects=allow_redirects,
-                                timeout=timeout, params=data,
-                                stream=stream, headers=headers)
+            return session.get(url, allow_redirects=allow_redirects,
+                               timeout=timeout, params=data,
+                               stream=stream, headers=headers)
         elif method.lower() == "put":
             if data:
-                return requests.put(url, data=data,
-                                    allow_redirects=allow_redirects,
-                                    timeout=timeout, headers=headers)
+                return session.put(url, data=data,
+                                   allow_redirects=allow_redirects,
+                                   timeout=timeout, headers=headers)
             else:
-                return requests.put(url,
-                                    allow_redirects=allow_redirects,
-                                    timeout=timeout, headers=headers)
+                return session.put(url,
+                                   allow_redirects=allow_redirects,
+                                   timeout=timeout, headers=headers)
         elif method.lower() == "post":
             if data:
-                return requests.post(url, data=data,
+                return session.post(url, data=data,
                                     allow_redirects=allow_redirects,
                                     timeout=timeout, headers=headers)
             else:
-                return requests.post(url,
+                return session.post(url,
                                     allow_redirects=allow_redirects,
                                     timeout=timeout, headers=headers)
         elif method.lower() in ["delete", "del"]:
-            return requests.delete(url, data=data,
-                                   allow_redirects=allow_redirects,
-                                   timeout=timeout, headers=headers)
+            return session.delete(url, data=data,
+                                  allow_redirects=allow_redirects,
+                                  timeout=timeout, headers=headers)
         else:
             raise ValueError("Unrecognized method {}".format(method))
 
     @staticmethod
-    def url_file_download(url, tgtpath):
+    def _response_reader(response, buffer):
+        """
+        Helper method
+        Returns read, view where read is a function reading the body of a
+        streamed response into buffer[start:end] and returning the number
+        of bytes read, 0 at the end of the body. Where the http library
+        supports it the data is received with readinto straight into the
+        buffer through view, a memoryview to release once reading is done,
+        otherwise view is None.
+        """
+        raw = response.raw
+        fp = getattr(raw, "_fp", None)
+        if hasattr(fp, "readinto") and not response.headers.get("content-encoding"):
+            try:
+                view = memoryview(buffer)
+            except TypeError:
+                # python 2 mmap only has the old buffer interface
+                view = None
+            if view is not None and hasattr(view, "release"):
+                def readinto(start, end):
+                    # A traceback of a failed read must not keep buffer exported
+                    with view[start:end] as chunk:
+                        return fp.readinto(chunk)
+                return readinto, view
+            elif view is not None:
+                return (lambda start, end: fp.readinto(view[start:end])), None
+
+        def read(start, end):
+            data = raw.read(end - start, decode_content=True)
+            buffer[start:start + len(data)] = data
+            return len(data)
+        return read, None
+
+    @staticmethod
+    def _release_response(response):
+        """
+        Helper method
+        Returns the connection of a streamed response to the pool if its
+        body was consumed and closes it otherwise.
+        """
+        fp = getattr(response.raw, "_fp", None)
+        if fp is not None and not fp.isclosed():
+            # A chunked body ends with an empty chunk that is not read yet
+            response.raw.read(1)
+        if fp is not None and fp.isclosed():
+            response.raw.release_conn()
+        else:
+            response.close()
+
+    @staticmethod
+    def read_response_into(response, buffer, start=0, end=None,
+                           chunk_size=8388608, progress=None):
+        """
+        Reads the body of a streamed response into buffer[start:end].
+        Where the http library supports it the data is received with
+        readinto straight into the buffer without intermediate copies.
+        The connection goes back to the pool when the body is consumed.
+        Args:
+            response        : Response of a request made with stream=True
+            buffer          : Writable buffer such as a bytearray or mmap
+            start(int)      : Position in buffer of the first byte
+            end(int)        : Position in buffer to stop at. Default len(buffer)
+            chunk_size(int) : Maximum bytes received per read. Default 8MB.
+            progress        : Callable called with the number of bytes
+                              received after every read.
+        Returns:
+            Number of bytes read
+        """
+        end = len(buffer) if end is None else end
+        read, view = Request._response_reader(response, buffer)
+        pos = start
+        try:
+            while pos < end:
+                nbytes = read(pos, min(pos + chunk_size, end))
+                if not nbytes:
+                    break
+                pos += nbytes
+                if progress:
+                    progress(nbytes)
+        finally:
+            # An mmap cannot be closed while a view of it is alive
+            if view is not None:
+                view.release()
+            Request._release_response(response)
+        return pos - start
+
+    @staticmethod
+    def url_file_download(url, tgtpath, chunk_size=8388608, timeout=10):
         """
         Get url file into local target.
+        The response is received into one reused buffer of chunk_size
+        bytes which is written to the target.
         This method is blocking.
         Args:
             url    : Entire url
             tgtpath : Target local or network mounted file path
+            chunk_size : Size of the blocks received. Default 8MB.
+        Returns:
+            The response
         """
-        response = urlretrieve(url, tgtpath)
+        start = _clock()
+        headers = {} if _HOOKS.active else None
+        response = Request._limited(
+            url, lambda: _SESSION_POOL.session(url).get(url, stream=True,
+                                                        allow_redirects=True,
+                                                        timeout=timeout,
+                                                        headers=headers),
+            sample=False, measure=False, method="GET", headers=headers)
+        received = 0
+        try:
+            response.raise_for_status()
+            buf = bytearray(chunk_size)
+            view = memoryview(buf)
+            read = Request._response_reader(response, buf)[0]
+            with open(tgtpath, "wb") as f:
+                nbytes = read(0, chunk_size)
+                while nbytes:
+                    f.write(view[:nbytes])
+                    received += nbytes
+                    nbytes = read(0, chunk_size)
+        finally:
+            Request._release_response(response)
+            Request._measure(url, start, response, bytes_in=received)
         return response
 
     @staticmethod
-    def url_file_upload(url, srcfile, mode="create"):
+    def url_file_upload(url, srcfile, mode="create", chunk_size=None,
+                        use_mmap=True):
         """
         Put source file as url.
         This method is blocking.
@@ -81,14 +1240,30 @@ class Request(object):
             url    : Entire url
             srcfile : Source file path
             mode   : "create" or "append"
+            chunk_size : Size of the blocks written to the connection.
+                         Default 4MB.
+            use_mmap   : Send the file from a memory map. Default True.
+        Returns:
+            Response with the attribute upload_rate set to the
+            bytes per second sent.
         """
         if mode not in ("create", "append"):
             raise IllegalArgumentError("mode should have value 'create' or 'append'" +
                                        "provided value {0}".format(mode))
-        if mode == "create":
-            response = requests.put(url, data=open(srcfile, "rb"))
-        else:
-            response = requests.post(url, data=open(srcfile, "rb"))
+        headers = {} if _HOOKS.active else None
+        with UploadReader(srcfile, chunk_size=chunk_size,
+                          use_mmap=use_mmap) as body:
+            if mode == "create":
+                send = lambda: _SESSION_POOL.session(url).put(url, data=body,
+                                                              headers=headers)
+            else:
+                send = lambda: _SESSION_POOL.session(url).post(url, data=body,
+                                                               headers=headers)
+            response = Request._limited(url, send, sample=False,
+                                        bytes_out=len(body),
+                                        method="PUT" if mode == "create" else "POST",
+                                        headers=headers)
+            response.upload_rate = body.rate()
         return response
 
     @staticmethod
@@ -111,9 +1286,319 @@ class Request(object):
         if not inspect.isgeneratorfunction(data_iter) \
                 and not isinstance(data_iter, types.GeneratorType) and not isinstance(data_iter, Iterable):
             raise IllegalArgumentError("Argument is not a iterator or generator function or of generator type")
+        sent = [0]
+        if isinstance(data_iter, types.GeneratorType):
+            data_iter = _counted(data_iter, sent)
+        headers = {} if _HOOKS.active else None
         if mode == "create":
-            response = requests.put(url, data=data_iter)
+            send = lambda: _SESSION_POOL.session(url).put(url, data=data_iter,
+                                                          headers=headers)
         else:
-            response = requests.post(url, data=data_iter)
-        return response
+            send = lambda: _SESSION_POOL.session(url).post(url, data=data_iter,
+                                                           headers=headers)
+        return Request._limited(url, send, sample=False, bytes_out=lambda: sent[0],
+                                method="PUT" if mode == "create" else "POST",
+                                headers=headers)
+
+
+def _body_size(method, data):
+    """ Returns the bytes of the body of a request, 0 if data are query parameters or unknown """
+    if data is None or not method or method.lower() == "get":
+        return 0
+    if isinstance(data, (bytes, bytearray, type(u""))):
+        return len(data)
+    return 0
+
+
+def _counted(chunks, sent):
+    """ Generator adding the length of each chunk sent to sent[0] """
+    for chunk in chunks:
+        sent[0] += len(chunk)
+        yield chunk
+
+
+
+# Webhdfs operations that can be repeated without changing their outcome
+IDEMPOTENT_OPERATIONS = frozenset(["GETFILESTATUS", "LISTSTATUS", "LISTSTATUS_BATCH",
+                                   "GETCONTENTSUMMARY", "GETFILECHECKSUM",
+                                   "GETHOMEDIRECTORY", "GETDELEGATIONTOKEN",
+                                   "GETXATTRS", "LISTXATTRS", "GETACLSTATUS",
+                                   "CHECKACCESS", "OPEN", "MKDIRS", "SETOWNER",
+                                   "SETPERMISSION", "SETTIMES", "SETREPLICATION"])
+
+
+def url_operation(url):
+    """ Returns the upper case op parameter of a rest api url or None """
+    query = url_parse(url).query
+    for param in query.split("&"):
+        if param[:3].lower() == "op=":
+            return param[3:].upper()
+    return None
+
+
+def url_metric_name(url):
+    """
+    Returns the operation of a rest api url as recorded in the request
+    metrics: the webhdfs op parameter or the path after the api version,
+    such as cluster/apps, with the path elements holding digits, which
+    are ids, replaced by {id}.
+    """
+    op = url_operation(url)
+    if op:
+        return op
+    parts = url_parse(url).path.strip("/").split("/")
+    for i, part in enumerate(parts):
+        if part == "v1":
+            parts = parts[i + 1:]
+            break
+    return "/".join("{id}" if any(c.isdigit() for c in part) else part
+                    for part in parts)
+
+
+class RetryPolicy(object):
+    """
+    Decides whether a failed request is retried and how long to wait
+    before the next attempt.
 
+    Attributes:
+        max_attempts(int)   : Attempts of a request including the first.
+                              1 disables retries.
+        backoff(float)      : Seconds waited after the first failure,
+                              doubled after every further failure.
+        max_backoff(float)  : Upper bound of the wait.
+        jitter(float)       : Fraction of the wait that is randomized so
+                              that clients retrying together spread out.
+        retry_statuses(set) : Http status codes retried.
+    """
+
+    def __init__(self, max_attempts=4, backoff=0.5, max_backoff=30.0, jitter=0.5,
+                 retry_statuses=(502, 503, 504)):
+        self.max_attempts = max(max_attempts, 1)
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.jitter = jitter
+        self.retry_statuses = frozenset(retry_statuses)
+
+    def delay(self, attempt):
+        """ Returns the seconds to wait after the failed attempt number attempt """
+        delay = min(self.max_backoff, self.backoff * (2 ** (attempt - 1)))
+        return delay * (1 - self.jitter * random.random())
+
+    @staticmethod
+    def idempotent(url, method=None):
+        """ Returns True if the request can be repeated after it may have run """
+        if not method or method.lower() == "get":
+            return True
+        return url_operation(url) in IDEMPOTENT_OPERATIONS
+
+
+class CircuitBreaker(object):
+    """
+    Thread safe circuit breaker of one host. It opens after threshold
+    consecutive failures and lets requests through again, one trial
+    request first, once reset_timeout seconds have passed.
+
+    Attributes:
+        threshold(int)          : Consecutive failures that open it.
+        reset_timeout(float)    : Seconds it stays open.
+    """
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, threshold=5, reset_timeout=30.0):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self._failures = 0
+        self._opened = 0
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """ Returns True if a request may be sent to the host """
+        with self._lock:
+            if self.state == self.OPEN and \
+                    time.time() - self._opened >= self.reset_timeout:
+                # Let one trial request through
+                self.state = self.HALF_OPEN
+                return True
+            return self.state == self.CLOSED
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self._failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self.state == self.HALF_OPEN or self._failures >= self.threshold:
+                self.state = self.OPEN
+                self._opened = time.time()
+
+    def record_error(self):
+        """ Records a request that failed for a reason other than the host """
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                # The trial request is over without a success
+                self.state = self.OPEN
+                self._opened = time.time()
+
+
+class Transport(object):
+    """
+    Sends rest api requests to the active host of a group of HA hosts.
+    Failed requests are retried according to a RetryPolicy, a request
+    refused by a standby namenode or a host that cannot be reached fails
+    over to the next host, and each host has a CircuitBreaker so that a
+    dead host is skipped instead of timing out on every request.
+    Urls of other hosts, such as datanode redirects, are sent unchanged.
+
+    Attributes:
+        hosts(list)         : Base urls of the hosts, scheme://host:port.
+        retry(RetryPolicy)  : Retry policy. Default RetryPolicy().
+        breakers(dict)      : CircuitBreaker of each host.
+    """
+
+    def __init__(self, hosts, retry=None, active=None, breaker_threshold=5,
+                 breaker_reset=30.0):
+        if not hosts:
+            raise MissingArgumentError("hosts not provided")
+        self.hosts = [SessionPool._host_key(x) for x in hosts]
+        self.retry = retry or RetryPolicy()
+        self.breakers = dict((x, CircuitBreaker(breaker_threshold, breaker_reset))
+                             for x in self.hosts)
+        self._active = self.hosts.index(SessionPool._host_key(active)) \
+            if active and SessionPool._host_key(active) in self.hosts else 0
+        self._lock = threading.Lock()
+        self._retries = 0
+        self._failovers = 0
+
+    @property
+    def active(self):
+        """ Base url of the host requests are sent to """
+        return self.hosts[self._active]
+
+    def _choose(self):
+        """
+        Helper method
+        Returns the active host if its circuit is closed, otherwise makes the
+        next host whose circuit allows a request active. None if every
+        circuit is open.
+        """
+        with self._lock:
+            count = len(self.hosts)
+            for i in range(count):
+                index = (self._active + i) % count
+                if self.breakers[self.hosts[index]].allow():
+                    if index != self._active:
+                        self._active = index
+                        self._failovers += 1
+                    return self.hosts[index]
+            return None
+
+    def _failover(self, host):
+        """ Helper method. Makes the host after host active if host is active """
+        with self._lock:
+            if len(self.hosts) > 1 and self.hosts[self._active] == host:
+                self._active = (self._active + 1) % len(self.hosts)
+                self._failovers += 1
+
+    @staticmethod
+    def _remote_exception(response):
+        """ Helper method. Returns the java exception name of an error response """
+        try:
+            return response.json()["RemoteException"]["exception"]
+        except Exception:
+            return ""
+
+    @staticmethod
+    def _not_sent(error):
+        """ Helper method. Returns True if error happened before the request was sent """
+        if isinstance(error, requests.exceptions.ConnectTimeout):
+            return True
+        reason = getattr(error.args[0], "reason", None) if error.args else None
+        return type(reason).__name__ in ("NewConnectionError", "ConnectTimeoutError")
+
+    def request(self, url, method=None, **kwargs):
+        """
+        Submits a request like Request.url_request, retrying and failing over
+        between the hosts. Returns the last response, or raises the last
+        connection error, once the retry policy gives up.
+        """
+        host_key = SessionPool._host_key(url)
+        if host_key not in self.breakers:
+            return Request.url_request(url, method=method, **kwargs)
+        path = url[len(host_key):]
+        idempotent = self.retry.idempotent(url, method)
+        tried = set()
+        attempt = 0
+        while True:
+            attempt += 1
+            host = self._choose()
+            retryable, failed_over = False, False
+            if host is None:
+                error = RequestError("Circuit open for every host of {0}".format(url))
+                retryable = True
+            else:
+                tried.add(host)
+                try:
+                    response = Request.url_request(host + path, method=method, **kwargs)
+                except (requests.exceptions.ConnectionError,
+                        requests.exceptions.Timeout) as e:
+                    error = e
+                    self.breakers[host].record_failure()
+                    self._failover(host)
+                    failed_over = True
+                    retryable = idempotent or self._not_sent(e)
+                except Exception:
+                    # Ends the trial request of a half open circuit
+                    self.breakers[host].record_error()
+                    raise
+                else:
+                    error = response
+                    status = response.status_code
+                    exception = self._remote_exception(response) \
+                        if status == 403 or status >= 500 else ""
+                    if exception == "StandbyException":
+                        # A standby namenode runs nothing, any request can be resent
+                        self.breakers[host].record_failure()
+                        self._failover(host)
+                        failed_over = True
+                        retryable = True
+                    elif exception == "RetriableException" or \
+                            status in self.retry.retry_statuses:
+                        if status >= 500:
+                            self.breakers[host].record_failure()
+                        else:
+                            # The host answered, it is only busy
+                            self.breakers[host].record_success()
+                        retryable = idempotent or exception == "RetriableException"
+                    else:
+                        self.breakers[host].record_success()
+                        return response
+            if not retryable or attempt >= self.retry.max_attempts:
+                if isinstance(error, Exception):
+                    raise error
+                return error
+            if not isinstance(error, Exception):
+                error.close()
+            with self._lock:
+                self._retries += 1
+            # Moving to a host not tried yet needs no wait
+            if not (failed_over and self.active not in tried):
+                time.sleep(self.retry.delay(attempt))
+
+    def stats(self):
+        """
+        Returns transport statistics as a dictionary
+            {
+                "active": base url, "retries": N, "failovers": N,
+                "breakers": {host: "closed", "open" or "half_open"}
+            }
+        """
+        with self._lock:
+            return {"active": self.active,
+                    "retries": self._retries,
+                    "failovers": self._failovers,
+                    "breakers": dict((x, b.state) for x, b in self.breakers.items())}
@@ -1,6 +1,6 @@
 from __future__ import print_function
 from request import Request
-from util import convert_to_dict, encode_params
+from util import convert_to_dict, encode_params, iter_json_items
 from constants import YARN_APP_FINAL_STATUS, YARN_APP_STATUS
 from errors import *
 from requests.exceptions import ConnectionError, RequestException, InvalidURL
@@ -27,13 +27,14 @@ class ResourceManager(object):
         else:
             raise MissingParameterException("Resource Manager Host Address")
 
-    def request(self, api_path, **query_args):
+    def request(self, api_path, stream=False, **query_args):
         """
         The function is used to call the url_request function by passing the url to
         connect to and optional data that needs to be passed.
 
         Args:
             api_path: HTTP URL with the REST API Path
+            stream: If True the response body is not read until it is consumed
             **query_args: Optional parameters that needs to be passed on to the API call
                             in the form of JSON
 
@@ -42,9 +43,9 @@ class ResourceManager(object):
         """
         rqst = Request()
         if query_args:
-            resp = rqst.url_request(api_path, data=query_args['data'])
+            resp = rqst.url_request(api_path, data=query_args['data'], stream=stream)
         else:
-            resp = rqst.url_request(api_path)
+            resp = rqst.url_request(api_path, stream=stream)
         if resp.status_code == 404:
             raise InvalidURL
         if resp.status_code != 200:
@@ -122,6 +123,51 @@ class ResourceManager(object):
             Application details in JSON Format
 
         """
+        path, params = self._cluster_applications_args(app_id, states, final_status, user, queue, limit,
+                                                       started_time_begin, started_time_end,
+                                                       finished_time_begin, finished_time_end,
+                                                       application_types, application_tags)
+        try:
+            resp = self.request(self.url + path, data=encode_params(params))
+            return self.response_to_json(resp)
+        except ConnectionError as e:
+            print(str(e))
+
+    def iter_cluster_applications(self, states=None, final_status=None, user=None, queue=None, limit=None,
+                                  started_time_begin=None, started_time_end=None, finished_time_begin=None,
+                                  finished_time_end=None, application_types=None, application_tags=None):
+        """
+        Generator over the applications in the cluster that satisfy the parameters being passed.
+        The response is parsed incrementally from the stream so that memory does not grow with
+        the number of applications returned.
+
+        Args:
+            Same as cluster_applications without app_id.
+
+        Returns:
+            Generator of application details, one dictionary per application
+
+        """
+        path, params = self._cluster_applications_args(None, states, final_status, user, queue, limit,
+                                                       started_time_begin, started_time_end,
+                                                       finished_time_begin, finished_time_end,
+                                                       application_types, application_tags)
+        resp = self.request(self.url + path, stream=True, data=encode_params(params))
+        try:
+            for app in iter_json_items(resp.iter_content(chunk_size=65536), "app"):
+                yield app
+        finally:
+            resp.close()
+
+    def _cluster_applications_args(self, app_id=None, states=None, final_status=None, user=None, queue=None,
+                                   limit=None, started_time_begin=None, started_time_end=None,
+                                   finished_time_begin=None, finished_time_end=None,
+                                   application_types=None, application_tags=None):
+        """
+        Function used to validate the cluster applications parameters
+        Returns:
+            The api path and the dictionary of query parameters
+        """
         if app_id:
             path = "/ws/v1/cluster/apps/" + app_id
         else:
@@ -165,11 +211,7 @@ class ResourceManager(object):
                     raise InvalidParameterException(final_status)
                 else:
                     pass
-        try:
-            resp = self.request(self.url + path, data=encode_params(params))
-            return self.response_to_json(resp)
-        except ConnectionError as e:
-            print(str(e))
+        return path, params
 
     def cluster_appstatistics(self, states=None, application_types=None):
         """
@@ -1,8 +1,18 @@
 from six import with_metaclass
+from six.moves import filter as ifilter
 from fnmatch import fnmatch
+import operator
 import re
 from util import ReadOnlyClass
 
+# Operations compiled into infix python comparisons
+_INFIX_OPERATORS = {operator.gt: ">",
+                    operator.lt: "<",
+                    operator.ge: ">=",
+                    operator.le: "<=",
+                    operator.eq: "==",
+                    operator.ne: "!="}
+
 
 def regex_search(text, pattern=None):
     pattern = pattern or ".*"
@@ -14,6 +24,52 @@ def glob_search(text, pattern=None):
     return fnmatch(text, pattern)
 
 
+# Tokens of a textual query: parentheses, quoted strings, comparison
+# operators and bare words such as keys, numbers and logical operators
+_QUERY_TOKEN = re.compile(r"""\s*(?:(?P<paren>[()])|
+                                   '(?P<squote>(?:[^'\\]|\\.)*)'|
+                                   "(?P<dquote>(?:[^"\\]|\\.)*)"|
+                                   (?P<oper>>=|<=|==|!=|>|<|=|~)|
+                                   (?P<word>[^\s()'"<>=!~]+))""", re.X)
+
+
+def tokenize_query(query):
+    """
+    Splits a textual query into tokens.
+    Returns:
+        list of (kind, text) where kind is one of "paren", "string",
+        "oper" or "word"
+    """
+    tokens = []
+    pos = 0
+    query = query.rstrip()
+    while pos < len(query):
+        match = _QUERY_TOKEN.match(query, pos)
+        if not match or match.end() == pos:
+            raise ValueError("Query syntax error at position {0}: {1}"
+                             .format(pos, query[pos:]))
+        kind = match.lastgroup
+        text = match.group(kind)
+        if kind in ("squote", "dquote"):
+            quote = "'" if kind == "squote" else '"'
+            kind, text = "string", text.replace("\\" + quote, quote)
+        tokens.append((kind, text))
+        pos = match.end()
+    return tokens
+
+
+def compile_operation(oper, val):
+    """
+    Returns a function of one argument x equivalent to oper(x, val).
+    Operations with a compile attribute, such as the regex and glob
+    searches, are given the chance to precompile val.
+    """
+    compiler = getattr(oper, "compile", None)
+    if compiler is not None:
+        return compiler(val)
+    return lambda x: oper(x, val)
+
+
 class SearchKeys(with_metaclass(ReadOnlyClass, object)):
     """
     This is the base class for the key dictionary on which searches that be made
@@ -56,7 +112,8 @@ class SearchLogicalOperators(with_metaclass(ReadOnlyClass, object)):
     LOGIC_DICT :  A dictionary with key as the logical operation
                   and value as precedence.
     """
-    LOGIC_DICT = {"and": 1,
+    LOGIC_DICT = {"not": 0,
+                  "and": 1,
                   "or": 2}
 
     def __new__(cls):
@@ -138,6 +195,7 @@ class SearchExpressionList(object):
 
     def __init__(self, search_logical_operators, search_expression=None):
         self.expr_list = []
+        self._compiled = None
 
         if not issubclass(search_logical_operators, SearchLogicalOperators):
             raise ValueError("search_logical_operators not of type or subclass"
@@ -154,25 +212,208 @@ class SearchExpressionList(object):
                 raise ValueError(token)
 
         self.expr_list.append(token)
+        self._compiled = None
+
+    def keys(self):
+        """ Returns the set of status fields searched by the expression list """
+        return set(x.key for x in self.expr_list
+                   if isinstance(x, SearchExpression))
 
     def add_expression(self, expression):
         """ Parser the expression and add it.
+        The infix expression is converted to postfix with the shunting-yard
+        algorithm. "not" binds tighter than "and" which binds tighter than
+        "or". When the list already holds an expression the two are
+        combined with "and".
         Arguments:
             expression(list) : An expression list in infix format
                                The list can contain
                                1) Curved braces
                                2) Search Expression of type SearchExpression or its derivative
-                               3) Logical Operator with string value "and" or "or"
+                               3) Logical Operator with string value "and", "or" or "not"
+        """
+        logic_dict = self.search_logical_operators.LOGIC_DICT
+        output = []
+        opstack = []
+        expect_operand = True
+        for token in expression:
+            if isinstance(token, SearchExpression):
+                if not expect_operand:
+                    raise ValueError("Search Expression incorrect: "
+                                     "missing operator before {0}".format(token))
+                output.append(token)
+                expect_operand = False
+            elif token == "(":
+                if not expect_operand:
+                    raise ValueError("Search Expression incorrect: "
+                                     "missing operator before (")
+                opstack.append(token)
+            elif token == ")":
+                while opstack and opstack[-1] != "(":
+                    output.append(opstack.pop())
+                if not opstack or expect_operand:
+                    raise ValueError("Search Expression incorrect: unbalanced )")
+                opstack.pop()
+            elif token == "not":
+                if not expect_operand:
+                    raise ValueError("Search Expression incorrect: "
+                                     "missing operator before not")
+                # Unary prefix operator, pushed without popping
+                opstack.append(token)
+            elif token in logic_dict:
+                if expect_operand:
+                    raise ValueError("Search Expression incorrect: "
+                                     "missing operand before {0}".format(token))
+                while opstack and opstack[-1] != "(" and \
+                        logic_dict[opstack[-1]] <= logic_dict[token]:
+                    output.append(opstack.pop())
+                opstack.append(token)
+                expect_operand = True
+            else:
+                raise ValueError(token)
+        if expect_operand:
+            raise ValueError("Search Expression incorrect: missing operand")
+        while opstack:
+            token = opstack.pop()
+            if token == "(":
+                raise ValueError("Search Expression incorrect: unbalanced (")
+            output.append(token)
+
+        combine = bool(self.expr_list)
+        for token in output:
+            self.add(token)
+        if combine:
+            self.add("and")
+
+    def query_expression(self, key, oper, val):
         """
-        pass
+        Returns the SearchExpression for key oper val of a textual query.
+        Subclasses implement this to map query keys, operators and
+        values such as units onto their search keys and operators.
+        """
+        raise NotImplementedError("Queries are not supported by {0}"
+                                  .format(type(self).__name__))
+
+    def add_query(self, query):
+        """
+        Parses a textual query and adds it like add_expression.
+        A query is made of comparisons "key oper value" combined with
+        "and", "or", "not" and parentheses. Values containing spaces
+        or operator characters are quoted with ' or ".
+        Example:
+            size > 1GB and (owner = hive or not name ~ '\\.tmp$')
+        """
+        tokens = tokenize_query(query)
+        logic_dict = self.search_logical_operators.LOGIC_DICT
+        expression = []
+        i = 0
+        while i < len(tokens):
+            kind, text = tokens[i]
+            if kind == "paren":
+                expression.append(text)
+                i += 1
+            elif kind == "word" and text.lower() in logic_dict:
+                expression.append(text.lower())
+                i += 1
+            elif kind == "word" and i + 2 < len(tokens) and \
+                    tokens[i + 2][0] in ("word", "string"):
+                oper_kind, oper = tokens[i + 1]
+                if oper_kind not in ("oper", "word"):
+                    raise ValueError("Query syntax error: expected operator "
+                                     "after {0}".format(text))
+                expression.append(self.query_expression(text, oper,
+                                                         tokens[i + 2][1]))
+                i += 3
+            else:
+                raise ValueError("Query syntax error near {0}".format(text))
+        self.add_expression(expression)
+
+    def required_expressions(self):
+        """
+        Returns the search expressions that hold for every match, that is
+        the expressions joined to the rest of the list with "and" only.
+        """
+        stack = []
+        try:
+            for token in self.expr_list:
+                if isinstance(token, SearchExpression):
+                    stack.append([token])
+                elif token == "not":
+                    stack.pop()
+                    stack.append([])
+                else:
+                    right = stack.pop()
+                    left = stack.pop()
+                    if token == "and":
+                        stack.append(left + right)
+                    else:
+                        stack.append([x for x in left
+                                      if any(x is y for y in right)])
+        except IndexError:
+            raise ValueError("Search Expression incorrect")
+        return stack[0] if len(stack) == 1 else []
+
+    def _compile(self):
+        """
+        Helper method
+        Translates the postfix expression list into the source of a single
+        python function, with and/or short circuiting, and compiles it.
+        Comparisons are inlined and regex and glob patterns precompiled.
+        """
+        env = {}
+        stack = []
+        for i, token in enumerate(self.expr_list):
+            if isinstance(token, SearchExpression):
+                env["k%d" % i] = token.key
+                symbol = _INFIX_OPERATORS.get(token.oper)
+                if symbol:
+                    env["v%d" % i] = token.val
+                    stack.append("(d[k%d] %s v%d)" % (i, symbol, i))
+                else:
+                    env["p%d" % i] = compile_operation(token.oper, token.val)
+                    stack.append("p%d(d[k%d])" % (i, i))
+            elif token == "not":
+                if not stack:
+                    raise ValueError("Search Expression incorrect")
+                stack.append("(not %s)" % stack.pop())
+            else:
+                try:
+                    right = stack.pop()
+                    left = stack.pop()
+                except IndexError:
+                    raise ValueError("Search Expression incorrect")
+                stack.append("(%s %s %s)" % (left, token, right))
+
+        if len(stack) != 1:
+            raise ValueError("Search Expression incorrect")
+        exec("def _match(d):\n    return True if %s else False\n" % stack[0], env)
+        return env["_match"]
+
+    def compiled(self):
+        """ Returns the expression list compiled into a function of a dictionary """
+        if self._compiled is None:
+            self._compiled = self._compile()
+        return self._compiled
 
     def match(self, dict_object):
+        """ Returns True if dict_object matches the search expression list """
+        return self.compiled()(dict_object)
+
+    def filter(self, iterable):
+        """ Returns an iterator over the dictionaries in iterable that match """
+        return ifilter(self.compiled(), iterable)
+
+    def match_postfix(self, dict_object):
         """ Method to match the Search to evaluate postfix expression
+            This is the interpreter match used before expressions were
+            compiled. It is kept to benchmark against.
             Algorithm:
                 Initialize a stack
                 Until end of expression list
                 do
-                  if token in list is a logical operator
+                  if token is not
+                     pop 1 expression and push its negation
+                  else if token in list is a logical operator
                      pop 2 expressions and evaluate truth
                          based on the logical operator
                   else if token in list is an expression
@@ -187,7 +428,12 @@ class SearchExpressionList(object):
         se_stack = []  # to store intermediate expression results
 
         for i in range(0, len(self.expr_list)):
-            if self.expr_list[i] in self.search_logical_operators.LOGIC_DICT:
+            if self.expr_list[i] == "not":
+                try:
+                    se_stack.append(not se_stack.pop())
+                except IndexError:
+                    raise ValueError("Search Expression incorrect")
+            elif self.expr_list[i] in self.search_logical_operators.LOGIC_DICT:
                 try:
                     search_exp1_truth = se_stack.pop()
                     search_exp2_truth = se_stack.pop()
@@ -208,7 +454,5 @@ class SearchExpressionList(object):
             # print se_stack[0]
             return se_stack[0]
 
-            # print(path_status[search_exp.key], search_exp.val)
-
     def __str__(self):
         return ",".join(str(x) for x in self.expr_list)
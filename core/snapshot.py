@@ -0,0 +1,737 @@
+"""
+    Local, memory mapped snapshot index of an hdfs namespace.
+
+    A snapshot holds the FileStatus of every object under a directory in
+    typed columns of a single file. Rows are written in depth first
+    order, each directory listing followed by the listings of its sub
+    directories, so the objects under any directory are a contiguous
+    range of rows. A directory table links the rows into a path trie and
+    length and modificationTime are also stored as sorted row orders so
+    that range searches do not visit every row.
+
+    Example:
+        from webhdfs import Webhdfs
+        from snapshot import Snapshot, build_snapshot
+
+        whdfs = Webhdfs(host="namenode.host.com", port=50070)
+        snap = build_snapshot(whdfs, "/apps", "/var/tmp/apps.snap")
+        for status in snap.query("size > 10GB and owner = hive and mtime > 90d"):
+            print(status["fullPath"])
+        snap = snap.refresh(whdfs)
+"""
+
+import array
+import json
+import mmap
+import operator
+import os
+import posixpath
+import struct
+import sys
+import time
+from multiprocessing.pool import ThreadPool
+
+from columns import INT64_TYPECODE
+from errors import IllegalArgumentError, MissingArgumentError
+from webhdfs import WhdfsSearchKeys, WhdfsSearchExpressionList
+
+_MAGIC = b"GRTSNAP1"
+_VERSION = 1
+
+_TYPE_NAMES = ("FILE", "DIRECTORY", "SYMLINK")
+_TYPE_CODES = dict((name, code) for code, name in enumerate(_TYPE_NAMES))
+_DIR_TYPE = _TYPE_CODES["DIRECTORY"]
+
+# Columns of the object rows. parent is the directory table index of the
+# directory listing the object, dir the directory table index of the
+# object itself or -1, name, owner and group index the string table.
+ROW_COLUMNS = (("parent", "i"),
+               ("dir", "i"),
+               ("name", "i"),
+               ("type", "b"),
+               ("length", INT64_TYPECODE),
+               ("replication", "i"),
+               ("blockSize", INT64_TYPECODE),
+               ("modificationTime", INT64_TYPECODE),
+               ("accessTime", INT64_TYPECODE),
+               ("owner", "i"),
+               ("group", "i"),
+               ("permission", "i"),
+               ("childrenNum", "i"),
+               ("fileCount", INT64_TYPECODE),
+               ("directoryCount", INT64_TYPECODE),
+               ("spaceConsumed", INT64_TYPECODE))
+
+# Columns of the directory table. row is the row of the directory status,
+# rows first to listed are its listing, rows first to end everything under
+# it and directories up to last are its sub directories.
+DIR_COLUMNS = (("dir_parent", "i"),
+               ("dir_row", "i"),
+               ("dir_first", "i"),
+               ("dir_listed", "i"),
+               ("dir_end", "i"),
+               ("dir_last", "i"))
+
+# Row orders sorted on these columns
+SORTED_COLUMNS = ("length", "modificationTime")
+
+_STRING_COLUMNS = ("owner", "group")
+
+
+def _extend(dest, src, start, end, shift=0):
+    """
+    Helper method
+    Appends src[start:end] to the array dest, adding shift to values that
+    are not negative.
+    """
+    part = src[start:end]
+    if shift:
+        dest.extend(x + shift if x >= 0 else x for x in part)
+    elif isinstance(part, memoryview) and part.format == dest.typecode:
+        dest.frombytes(part.tobytes())
+    elif isinstance(part, array.array) and part.typecode == dest.typecode:
+        dest.extend(part)
+    else:
+        convert = float if dest.typecode == "d" else int
+        dest.extend(convert(x) for x in part)
+
+
+class _SnapshotWriter(object):
+    """
+    Helper class
+    Accumulates rows and directories in depth first order and writes them
+    into a snapshot file.
+    """
+
+    def __init__(self, strings=None):
+        self.rows = dict((name, array.array(tc)) for name, tc in ROW_COLUMNS)
+        self.dirs = dict((name, array.array(tc)) for name, tc in DIR_COLUMNS)
+        # Strings of a previous snapshot keep their index so copied rows
+        # can be reused as they are
+        self.strings = list(strings or [])
+        self._string_ids = dict((x, i) for i, x in enumerate(self.strings))
+
+    def __len__(self):
+        return len(self.rows["parent"])
+
+    def string_id(self, text):
+        string_id = self._string_ids.get(text)
+        if string_id is None:
+            string_id = self._string_ids[text] = len(self.strings)
+            self.strings.append(text)
+        return string_id
+
+    def _row_values(self, status):
+        """ Helper method. Returns the column values of a FileStatus but its name """
+        otype = _TYPE_CODES.get(status.get("type"), 0)
+        length = status.get("length") or 0
+        replication = status.get("replication") or 0
+        # Directory totals are added up by finish
+        return (("type", otype),
+                ("length", length),
+                ("replication", replication),
+                ("blockSize", status.get("blockSize") or 0),
+                ("modificationTime", status.get("modificationTime") or 0),
+                ("accessTime", status.get("accessTime") or 0),
+                ("owner", self.string_id(status.get("owner") or "")),
+                ("group", self.string_id(status.get("group") or "")),
+                ("permission", int(status.get("permission") or "0", 8)),
+                ("childrenNum", status.get("childrenNum") or 0),
+                ("fileCount", 0 if otype == _DIR_TYPE else 1),
+                ("directoryCount", 0),
+                ("spaceConsumed", 0 if otype == _DIR_TYPE else length * replication))
+
+    def add_row(self, status, parent):
+        """ Appends the row of a FileStatus listed in directory parent """
+        rows = self.rows
+        rows["parent"].append(parent)
+        rows["dir"].append(-1)
+        rows["name"].append(self.string_id(status.get("pathSuffix") or ""))
+        for name, value in self._row_values(status):
+            rows[name].append(value)
+
+    def set_row(self, row, status):
+        """ Updates a row with a newer FileStatus of the same object """
+        for name, value in self._row_values(status):
+            self.rows[name][row] = value
+
+    def add_dir(self, parent, row):
+        """ Adds the directory whose status is row and returns its index """
+        dir_id = len(self.dirs["dir_parent"])
+        self.dirs["dir_parent"].append(parent)
+        self.dirs["dir_row"].append(row)
+        for name in ("dir_first", "dir_listed", "dir_end"):
+            self.dirs[name].append(len(self))
+        self.dirs["dir_last"].append(dir_id + 1)
+        if row >= 0:
+            self.rows["dir"][row] = dir_id
+        return dir_id
+
+    def end_dir(self, dir_id, first, listed):
+        """ Records the rows and sub directories of a directory once it is complete """
+        self.dirs["dir_first"][dir_id] = first
+        self.dirs["dir_listed"][dir_id] = listed
+        self.dirs["dir_end"][dir_id] = len(self)
+        self.dirs["dir_last"][dir_id] = len(self.dirs["dir_parent"])
+
+    def copy_listing(self, old, old_id, dir_id):
+        """
+        Appends the listing of directory old_id of the Snapshot old as the
+        listing of directory dir_id. Returns the rows of its sub directories.
+        """
+        first, listed = old.dir_column("dir_first")[old_id], old.dir_column("dir_listed")[old_id]
+        start = len(self)
+        for name, tc in ROW_COLUMNS:
+            if name == "parent":
+                self.rows[name].extend(array.array("i", [dir_id]) * (listed - first))
+            elif name == "dir":
+                self.rows[name].extend(array.array("i", [-1]) * (listed - first))
+            else:
+                _extend(self.rows[name], old.column(name), first, listed)
+        types = self.rows["type"]
+        return [row for row in range(start, len(self)) if types[row] == _DIR_TYPE]
+
+    def copy_dir(self, old, old_id, dir_id):
+        """
+        Copies everything under directory old_id of the Snapshot old as
+        the content of directory dir_id.
+        """
+        first, end = old.dir_column("dir_first")[old_id], old.dir_column("dir_end")[old_id]
+        last = old.dir_column("dir_last")[old_id]
+        row_shift = len(self) - first
+        dir_shift = dir_id - old_id
+        for name, tc in ROW_COLUMNS:
+            _extend(self.rows[name], old.column(name), first, end,
+                    dir_shift if name in ("parent", "dir") else 0)
+        for name, tc in DIR_COLUMNS:
+            shift = dir_shift if name in ("dir_parent", "dir_last") else row_shift
+            _extend(self.dirs[name], old.dir_column(name), old_id + 1, last, shift)
+        self.end_dir(dir_id, first + row_shift,
+                     old.dir_column("dir_listed")[old_id] + row_shift)
+
+    def finish(self):
+        """ Adds up the totals of the directories and sorts the row orders """
+        rows, dirs = self.rows, self.dirs
+        count = len(self)
+        totals = {}
+        for name in ("length", "fileCount", "spaceConsumed"):
+            column = rows[name]
+            cumulative = array.array(INT64_TYPECODE, [0]) * (count + 1)
+            total = 0
+            for i, otype in enumerate(rows["type"]):
+                if otype != _DIR_TYPE:
+                    total += column[i]
+                cumulative[i + 1] = total
+            totals[name] = cumulative
+        for dir_id, row in enumerate(dirs["dir_row"]):
+            first, end = dirs["dir_first"][dir_id], dirs["dir_end"][dir_id]
+            for name, cumulative in totals.items():
+                rows[name][row] = cumulative[end] - cumulative[first]
+            # A directory counts itself like GETCONTENTSUMMARY does
+            rows["directoryCount"][row] = dirs["dir_last"][dir_id] - dir_id
+        self.orders = dict((name, array.array("i", sorted(range(count),
+                                                          key=rows[name].__getitem__)))
+                           for name in SORTED_COLUMNS)
+
+    def write(self, output, root, stats=None):
+        """ Writes the snapshot file output through a temporary file """
+        sections = []
+        for name, tc in ROW_COLUMNS:
+            sections.append((name, self.rows[name]))
+        for name, tc in DIR_COLUMNS:
+            sections.append((name, self.dirs[name]))
+        for name in SORTED_COLUMNS:
+            sections.append(("order_" + name, self.orders[name]))
+        encoded = [x.encode("utf-8") for x in self.strings]
+        offsets = array.array(INT64_TYPECODE, [0]) * (len(encoded) + 1)
+        total = 0
+        for i, text in enumerate(encoded):
+            total += len(text)
+            offsets[i + 1] = total
+        sections.append(("string_offsets", offsets))
+
+        columns = {}
+        offset = 0
+        for name, column in sections:
+            columns[name] = [column.typecode, offset, len(column)]
+            offset += (len(column) * column.itemsize + 7) // 8 * 8
+        header = {"version": _VERSION,
+                  "root": root,
+                  "created": int(time.time() * 1000),
+                  "byteorder": sys.byteorder,
+                  "rows": len(self),
+                  "dirs": len(self.dirs["dir_parent"]),
+                  "columns": columns,
+                  "strings": [offset, total, len(encoded)],
+                  "stats": stats or {}}
+        header = json.dumps(header, sort_keys=True).encode("utf-8")
+        header += b" " * (-len(header) % 8)
+
+        tmpfile = output + ".tmp"
+        with open(tmpfile, "wb") as fout:
+            fout.write(_MAGIC + struct.pack("<Q", len(header)) + header)
+            for name, column in sections:
+                column.tofile(fout)
+                fout.write(b"\0" * (-len(column) * column.itemsize % 8))
+            for text in encoded:
+                fout.write(text)
+        if os.path.exists(output):
+            os.remove(output)
+        os.rename(tmpfile, output)
+
+
+class Snapshot(object):
+    """
+    Read only, memory mapped snapshot written by build_snapshot.
+    Queries use the WhdfsSearchKeys fields and run without any request to
+    the namenode.
+
+    Attributes:
+        path(str)    : Snapshot file.
+        root(str)    : hdfs directory the snapshot was taken of.
+        created(int) : Time the snapshot was written in milliseconds.
+        stats(dict)  : Directories listed and reused when it was written.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, "rb")
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._views = []
+        magic, header_len = struct.unpack_from("<8sQ", self._map, 0)
+        if magic != _MAGIC:
+            self.close()
+            raise IOError("{0} is not a snapshot".format(path))
+        header = json.loads(self._map[16:16 + header_len].decode("utf-8"))
+        if header["version"] != _VERSION or header["byteorder"] != sys.byteorder:
+            self.close()
+            raise IOError("Snapshot {0} version or byte order not supported".format(path))
+        self.root = header["root"]
+        self.created = header["created"]
+        self.stats = header["stats"]
+        self._rows = header["rows"]
+        self._data = 16 + header_len
+        self._columns = dict((name, self._load(*spec))
+                             for name, spec in header["columns"].items())
+        self._strings_offset, self._strings_size, self._strings_count = header["strings"]
+        self._dir_paths = None
+        self._dir_index = None
+        self._string_cache = {}
+
+    def _load(self, typecode, offset, count):
+        """
+        Helper method
+        Returns a column of the mapped file, without a copy if memoryview
+        can cast it.
+        """
+        start = self._data + offset
+        size = struct.calcsize(typecode) * count
+        if hasattr(memoryview, "cast"):
+            base = memoryview(self._map)
+            view = base[start:start + size]
+            column = view.cast(typecode)
+            self._views.extend([column, view, base])
+            return column
+        try:
+            column = array.array(typecode)
+            column.fromstring(self._map[start:start + size])
+            return column
+        except ValueError:
+            return list(struct.unpack_from("<%d%s" % (count, typecode), self._map, start))
+
+    def close(self):
+        """ Unmaps the snapshot file """
+        for view in getattr(self, "_views", []):
+            view.release()
+        self._views = []
+        self._columns = {}
+        self._map.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __len__(self):
+        return self._rows
+
+    def column(self, name):
+        """ Returns a row column """
+        return self._columns[name]
+
+    def dir_column(self, name):
+        """ Returns a directory table column """
+        return self._columns[name]
+
+    def string(self, string_id):
+        """ Returns an entry of the string table """
+        offsets = self._columns["string_offsets"]
+        start = self._data + self._strings_offset
+        return self._map[start + int(offsets[string_id]):
+                         start + int(offsets[string_id + 1])].decode("utf-8")
+
+    def strings(self):
+        """ Returns the string table as a list """
+        return [self.string(i) for i in range(self._strings_count)]
+
+    def _cached_string(self, string_id):
+        """ Helper method. Decodes owner and group names once """
+        text = self._string_cache.get(string_id)
+        if text is None:
+            text = self._string_cache[string_id] = self.string(string_id)
+        return text
+
+    def dir_paths(self):
+        """ Returns the list of full paths of the directory table """
+        if self._dir_paths is None:
+            parents = self._columns["dir_parent"]
+            dir_rows = self._columns["dir_row"]
+            names = self._columns["name"]
+            paths = []
+            for dir_id in range(len(parents)):
+                if parents[dir_id] < 0:
+                    paths.append(self.root)
+                else:
+                    parent = paths[parents[dir_id]]
+                    paths.append(("" if parent == "/" else parent) + "/" +
+                                 self.string(names[dir_rows[dir_id]]))
+            self._dir_paths = paths
+        return self._dir_paths
+
+    def dir_id(self, path):
+        """ Returns the directory table index of path or None """
+        if self._dir_index is None:
+            self._dir_index = dict((x, i) for i, x in enumerate(self.dir_paths()))
+        return self._dir_index.get(posixpath.normpath(path) if path != "/" else path)
+
+    def status(self, row, keys=None):
+        """
+        Returns the FileStatus of a row extended with fullPath and the
+        content summary fields, or only the fields in keys.
+        """
+        columns = self._columns
+        status = {}
+        for key in (keys if keys is not None else _STATUS_KEYS):
+            if key == "pathSuffix":
+                status[key] = self.string(columns["name"][row])
+            elif key == "fullPath":
+                parent = columns["parent"][row]
+                if parent < 0:
+                    status[key] = self.root
+                else:
+                    path = self.dir_paths()[parent]
+                    status[key] = ("" if path == "/" else path) + "/" + \
+                        self.string(columns["name"][row])
+            elif key == "type":
+                status[key] = _TYPE_NAMES[columns["type"][row]]
+            elif key in _STRING_COLUMNS:
+                status[key] = self._cached_string(columns[key][row])
+            elif key == "permission":
+                status[key] = "%o" % columns[key][row]
+            elif key in ("quota", "spaceQuota"):
+                status[key] = -1
+            else:
+                status[key] = int(columns[key][row])
+        return status
+
+    def get_path_status(self, path):
+        """ Returns the status of path in the snapshot or None """
+        path = posixpath.normpath(path) if path != "/" else path
+        dir_id = self.dir_id(path)
+        if dir_id is not None:
+            return self.status(self._columns["dir_row"][dir_id])
+        parent = self.dir_id(posixpath.dirname(path))
+        if parent is None:
+            return None
+        name = posixpath.basename(path)
+        names = self._columns["name"]
+        for row in range(self._columns["dir_first"][parent],
+                         self._columns["dir_listed"][parent]):
+            if self.string(names[row]) == name:
+                return self.status(row)
+        return None
+
+    def _search_rows(self, start, end, search_exp_list):
+        """
+        Helper method
+        Returns the rows between start and end to match against
+        search_exp_list, narrowed with the sorted orders when the
+        expression list requires a range of length or modificationTime.
+        """
+        best = None
+        for exp in (search_exp_list.required_expressions() if search_exp_list else []):
+            bounds = self._sorted_range(exp.key, exp.oper, exp.val)
+            if bounds and (best is None or bounds[2] - bounds[1] < best[2] - best[1]):
+                best = bounds
+        if best is None:
+            return range(start, end)
+        order, low, high = best
+        if end - start <= high - low:
+            return range(start, end)
+        return sorted(row for row in order[low:high] if start <= row < end)
+
+    def _sorted_range(self, key, oper, val):
+        """
+        Helper method
+        Returns (order, low, high) such that the rows order[low:high] are
+        the rows where oper(column[key], val), or None.
+        """
+        if key not in SORTED_COLUMNS or not isinstance(val, (int, float)) or \
+                isinstance(val, bool) or oper not in _RANGE_OPERATORS:
+            return None
+        order = self._columns["order_" + key]
+        column = self._columns[key]
+
+        def bisect(strict):
+            # First position whose value is > val (strict) or >= val
+            low, high = 0, len(order)
+            while low < high:
+                mid = (low + high) // 2
+                value = column[order[mid]]
+                if value > val or (not strict and value == val):
+                    high = mid
+                else:
+                    low = mid + 1
+            return low
+
+        name = _RANGE_OPERATORS[oper]
+        if name == ">":
+            return order, bisect(True), len(order)
+        if name == ">=":
+            return order, bisect(False), len(order)
+        if name == "<":
+            return order, 0, bisect(False)
+        if name == "<=":
+            return order, 0, bisect(True)
+        return order, bisect(False), bisect(True)
+
+    def query(self, query=None, search_exp_list=None, path=None, otype="all",
+              limit=None):
+        """
+        Searches the snapshot.
+
+        Args:
+            query(str)          : Textual query as for Webhdfs.scan_dir, for
+                                  example "size > 10GB and mtime > 90d".
+            search_exp_list(WhdfsSearchExpressionList)
+                                : Search expression list. Combined with
+                                  query using "and".
+            path(str)           : Only search under this directory.
+                                  Default the root of the snapshot.
+            otype(str)          : File, dir or all. Default all.
+            limit(int)          : Maximum number of statuses returned.
+
+        Returns:
+            Generator of the matching statuses extended with fullPath and
+            the content summary fields.
+        """
+        if query:
+            search_exp_list = WhdfsSearchExpressionList.from_query(query, search_exp_list)
+        if otype not in ("all", "file", "dir"):
+            raise IllegalArgumentError("otype should be 'all', 'file' or 'dir' " +
+                                       "provided value {0}".format(otype))
+        path = path or self.root
+        full_path_key = WhdfsSearchKeys.get_value(WhdfsSearchKeys.FULL_PATH_KEY)
+        for exp in (search_exp_list.required_expressions() if search_exp_list else []):
+            literal_prefix = getattr(exp.oper, "literal_prefix", None)
+            if exp.key == full_path_key and literal_prefix:
+                # The deepest directory containing every match
+                prefix = posixpath.dirname(literal_prefix(exp.val) + "x")
+                if len(prefix) > len(path) and prefix.startswith(path.rstrip("/") + "/"):
+                    while prefix != path and self.dir_id(prefix) is None:
+                        prefix = posixpath.dirname(prefix)
+                    path = prefix
+        dir_id = self.dir_id(path)
+        if dir_id is None:
+            return
+        start = self._columns["dir_first"][dir_id]
+        end = self._columns["dir_end"][dir_id]
+
+        types = self._columns["type"]
+        wanted = {"file": _TYPE_CODES["FILE"], "dir": _DIR_TYPE}.get(otype)
+        match = search_exp_list.compiled() if search_exp_list else None
+        keys = list(search_exp_list.keys()) if search_exp_list else []
+        found = 0
+        for row in self._search_rows(start, end, search_exp_list):
+            if wanted is not None and types[row] != wanted:
+                continue
+            if match and not match(self.status(row, keys)):
+                continue
+            yield self.status(row)
+            found += 1
+            if limit and found >= limit:
+                return
+
+    def refresh(self, whdfs, output=None, verify=False, ignore_error=True,
+                workers=1):
+        """
+        Writes a new snapshot of the same root reusing the directories that
+        did not change since this one was taken. See build_snapshot.
+        The snapshot is closed and the new one returned.
+        """
+        output = output or self.path
+        if os.path.abspath(output) == os.path.abspath(self.path):
+            tmpfile = output + ".prev"
+            self.close()
+            if os.path.exists(tmpfile):
+                os.remove(tmpfile)
+            os.rename(self.path, tmpfile)
+            previous = Snapshot(tmpfile)
+            try:
+                snapshot = build_snapshot(whdfs, self.root, output, previous,
+                                          verify, ignore_error, workers)
+            except:
+                previous.close()
+                os.rename(tmpfile, output)
+                raise
+            previous.close()
+            os.remove(tmpfile)
+            return snapshot
+        try:
+            return build_snapshot(whdfs, self.root, output, self, verify,
+                                  ignore_error, workers)
+        finally:
+            self.close()
+
+
+_STATUS_KEYS = ("pathSuffix", "fullPath", "type", "length", "replication",
+                "blockSize", "modificationTime", "accessTime", "owner",
+                "group", "permission", "childrenNum", "fileCount",
+                "directoryCount", "spaceConsumed", "quota", "spaceQuota")
+
+# Search operations narrowed with the sorted orders
+_RANGE_OPERATORS = {operator.gt: ">",
+                    operator.ge: ">=",
+                    operator.lt: "<",
+                    operator.le: "<=",
+                    operator.eq: "="}
+
+
+def _unchanged(previous, old_id, status):
+    """
+    Helper method
+    Returns True if the directory old_id of the previous snapshot has the
+    modification time and number of children of its current status.
+    """
+    row = previous.dir_column("dir_row")[old_id]
+    return previous.column("modificationTime")[row] == status.get("modificationTime") and \
+        previous.column("childrenNum")[row] == (status.get("childrenNum") or 0)
+
+
+def _same_summary(previous, old_id, summary):
+    """
+    Helper method
+    Returns True if the content summary of the directory old_id of the
+    previous snapshot matches summary.
+    """
+    row = previous.dir_column("dir_row")[old_id]
+    return bool(summary) and all(previous.column(key)[row] == summary.get(key)
+                                 for key in ("length", "fileCount", "directoryCount"))
+
+
+def build_snapshot(whdfs, path, output, previous=None, verify=False,
+                   ignore_error=True, workers=1):
+    """
+    Lists the directories under path and writes them into the snapshot file
+    output.
+
+    Args:
+        whdfs(Webhdfs)      : Client used to list the namespace.
+        path(str)           : hdfs directory to take the snapshot of.
+        output(str)         : Local snapshot file. Written through a
+                              temporary file and replaced at the end.
+        previous(Snapshot)  : Earlier snapshot of the same path to refresh.
+                              Only directories whose modification time or
+                              number of children changed are listed again.
+                              The listings of the other directories are
+                              reused and their sub directories checked with
+                              GETFILESTATUS. Directory modification times
+                              change when entries are added, removed or
+                              renamed in them but not when a file is
+                              appended to.
+        verify(bool)        : Also compare the content summary of unchanged
+                              directories with the previous snapshot. When
+                              they match everything under the directory is
+                              reused without further requests, otherwise it
+                              is listed again. Costs one
+                              GETCONTENTSUMMARY per unchanged directory
+                              checked. Default False.
+        ignore_error(bool)  : Skip directories that cannot be listed.
+                              Default True.
+        workers(int)        : Number of threads requesting the statuses of
+                              the sub directories of a reused listing.
+                              Default 1.
+
+    Returns:
+        Snapshot
+    """
+    if not path:
+        raise MissingArgumentError("Path not provided")
+    path = posixpath.normpath(path) if path != "/" else path
+    root_status = whdfs.get_path_status(path)
+    if root_status.get("type") != "DIRECTORY":
+        raise IllegalArgumentError("{0} is not a directory".format(path))
+    if previous is not None and previous.root != path:
+        previous = None
+
+    start = time.time()
+    pool = ThreadPool(workers) if workers and workers > 1 else None
+    status_func = lambda x: whdfs.get_path_status(x, ignore_error=True)
+    writer = _SnapshotWriter(previous.strings() if previous is not None else None)
+    writer.add_row(root_status, -1)
+    stats = {"listed": 0, "reused": 0, "copied": 0}
+    # Depth first: a directory is listed, then each sub directory with
+    # everything under it, then the directory is ended
+    stack = [(path, -1, 0, root_status)]
+    try:
+        while stack:
+            dirpath, parent, row, status = stack.pop()
+            if dirpath is None:
+                # End marker holding the directory index and listing rows
+                writer.end_dir(parent, row, status)
+                continue
+            dir_id = writer.add_dir(parent, row)
+            prefix = "" if dirpath == "/" else dirpath
+            old_id = previous.dir_id(dirpath) if previous is not None else None
+            first = len(writer)
+            children = []
+            unchanged = old_id is not None and _unchanged(previous, old_id, status)
+            if unchanged and verify:
+                if _same_summary(previous, old_id,
+                                 whdfs.get_content_summary(dirpath, ignore_error=True)):
+                    writer.copy_dir(previous, old_id, dir_id)
+                    stats["copied"] += 1
+                    continue
+                # Something below changed size, list again for fresh file rows
+                unchanged = False
+            if unchanged:
+                rows = writer.copy_listing(previous, old_id, dir_id)
+                paths = [prefix + "/" + writer.strings[writer.rows["name"][x]] for x in rows]
+                statuses = pool.map(status_func, paths) if pool else map(status_func, paths)
+                for childpath, child_row, child in zip(paths, rows, statuses):
+                    if child:
+                        writer.set_row(child_row, child)
+                        children.append((childpath, dir_id, child_row, child))
+                stats["reused"] += 1
+            else:
+                for child in whdfs.iter_long_list_dir(dirpath, ignore_error=ignore_error) or []:
+                    if child.get("type") == "DIRECTORY":
+                        children.append((prefix + "/" + child["pathSuffix"],
+                                         dir_id, len(writer), child))
+                    writer.add_row(child, dir_id)
+                stats["listed"] += 1
+            stack.append((None, dir_id, first, len(writer)))
+            stack.extend(reversed(children))
+    finally:
+        if pool:
+            pool.terminate()
+
+    writer.finish()
+    writer.write(output, path, stats)
+    print("Snapshot of {0} with {1} objects written to {2} in {3:.1f} seconds "
+          "({4} directories listed, {5} listings reused, {6} trees copied)"
+          .format(path, len(writer), output, time.time() - start,
+                  stats["listed"], stats["reused"], stats["copied"]))
+    return Snapshot(output)
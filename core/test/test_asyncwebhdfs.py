@@ -0,0 +1,91 @@
+import sys
+import os
+import pytest
+sys.path.append(os.path.dirname(os.path.realpath(__file__)) + "/../")
+sys.path.append(os.path.dirname(os.path.realpath(__file__)) + "/../../benchmarks")
+
+# AsyncWebhdfs needs python 3 and aiohttp
+pytest.importorskip("aiohttp")
+
+import asyncio
+from asyncwebhdfs import AsyncWebhdfs
+from errors import RequestError
+from webhdfs import Webhdfs
+from mockserver import MockServer, generate
+
+
+class Test:
+    """ AsyncWebhdfs against the local mock rest server of the benchmarks """
+
+    def setup_method(self, method):
+        self.server = MockServer().start()
+        generate(self.server.ns, "/data", dirs=4, files=2, depth=3)
+        self.loop = asyncio.new_event_loop()
+        self.whdfs = self.connect(max_concurrency=2)
+
+    def teardown_method(self, method):
+        self.run(self.whdfs.close())
+        self.loop.close()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def run(self, coro):
+        return self.loop.run_until_complete(coro)
+
+    def connect(self, **kwargs):
+        return self.run(AsyncWebhdfs(host="127.0.0.1", port=self.server.port, **kwargs).connect())
+
+    def walk(self, agen, count=None):
+        """ Returns the items of the async generator agen, at most count """
+        items = []
+        try:
+            while count is None or len(items) < count:
+                items.append(self.run(agen.__anext__()))
+        except StopAsyncIteration:
+            pass
+        return items
+
+    def test_001_list_dir(self):
+        assert sorted(self.run(self.whdfs.list_dir("/data", otype="dir"))) == \
+            ["d0", "d1", "d2", "d3"]
+        assert self.run(self.whdfs.list_dir("/data", pattern="*.orc")) == ["part-00000.orc"]
+        statuses = self.run(self.whdfs.long_list_dir("/data", otype="dir", ext_status=True))
+        assert [x["fileCount"] for x in statuses] == [10, 10, 10, 10]
+
+    def test_002_scan_dir_matches_webhdfs(self):
+        expected = [(root, [x["pathSuffix"] for x in dirs], [x["pathSuffix"] for x in files])
+                    for root, dirs, files in
+                    Webhdfs(host="127.0.0.1", port=self.server.port).scan_dir("/data")]
+        result = [(root, [x["pathSuffix"] for x in dirs], [x["pathSuffix"] for x in files])
+                  for root, dirs, files in self.walk(self.whdfs.scan_dir("/data"))]
+        assert len(result) == 21
+        assert result == expected
+
+    def test_003_scan_dir_bounded_look_ahead(self):
+        listed = []
+        long_list_dir = self.whdfs.long_list_dir
+
+        def counting(path=None, **kwargs):
+            listed.append(path)
+            return long_list_dir(path=path, **kwargs)
+        self.whdfs.long_list_dir = counting
+        scan = self.whdfs.scan_dir("/data")
+        for i in range(1, 4):
+            self.walk(scan, 1)
+            # The directories yielded plus at most max_concurrency listings ahead
+            assert len(listed) <= i + self.whdfs.max_concurrency
+        self.run(scan.aclose())
+        assert len(listed) < 21
+
+    def test_004_errors(self):
+        with pytest.raises(IOError):
+            self.run(self.whdfs.list_dir("/missing"))
+        assert self.run(self.whdfs.list_dir("/missing", ignore_error=True)) is None
+        with pytest.raises(IOError):
+            self.walk(self.whdfs.scan_dir("/missing"))
+        with pytest.raises(IOError):
+            self.walk(self.whdfs.iter_file("/missing.orc"))
+        self.server.ns.put_file("/data/d0/d0/d0/part-00000.orc", b"abc")
+        assert self.walk(self.whdfs.iter_file("/data/d0/d0/d0/part-00000.orc")) == [b"abc"]
+        with pytest.raises(RequestError):
+            self.run(AsyncWebhdfs(host="127.0.0.1", port=1).connect())
@@ -0,0 +1,43 @@
+import sys
+import os
+import time
+sys.path.append(os.path.dirname(os.path.realpath(__file__)) + "/../")
+
+
+from cache import StatusCache
+
+
+class Test:
+    def setup_method(self, method):
+        self.cache = StatusCache(max_size=3, ttl=60)
+
+    def test_001_lru_eviction(self):
+        for name in ("a", "b", "c"):
+            self.cache.put("/tmp/" + name, {"type": "FILE"})
+        assert self.cache.get("/tmp/a/")
+        self.cache.put("/tmp/d", {"type": "FILE"})
+        assert self.cache.get("/tmp/b") is None
+        assert self.cache.get("tmp//a") and self.cache.get("/tmp/d")
+        stats = self.cache.stats()
+        assert stats["evictions"] == 1
+        assert stats["hits"] == 3 and stats["misses"] == 1
+
+    def test_002_ttl_expiry(self):
+        cache = StatusCache(ttl=0.01)
+        cache.put("/tmp/a", {"type": "FILE"})
+        time.sleep(0.05)
+        assert cache.get("/tmp/a") is None
+        assert cache.stats()["expirations"] == 1
+
+    def test_003_listing_and_invalidation(self):
+        cache = StatusCache()
+        listing = [{"pathSuffix": "d", "type": "DIRECTORY"},
+                   {"pathSuffix": "f", "type": "FILE"}]
+        assert list(cache.put_listing("/tmp", listing)) == listing
+        assert cache.get("/tmp/f") == {"pathSuffix": "", "type": "FILE"}
+        cache.put("/tmp/d/x", {"type": "FILE"})
+        cache.invalidate("/tmp/d")
+        assert cache.get("/tmp/d/x")
+        cache.invalidate("/tmp", recursive=True)
+        assert cache.get("/tmp/f") is None and cache.get("/tmp/d/x") is None
+        assert cache.stats()["size"] == 0
@@ -0,0 +1,37 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.realpath(__file__)) + "/../")
+
+
+from columns import StatusColumns
+
+
+class Test:
+    def setup_method(self):
+        self.statuses = [{"pathSuffix": "f%d" % i, "length": i * 1024,
+                          "replication": 3, "modificationTime": 1000 * i,
+                          "accessTime": 0, "owner": ["hdfs", "hive"][i % 2],
+                          "type": "FILE"}
+                         for i in range(10)]
+
+    def test_001_columns(self):
+        cols = StatusColumns(use_numpy=False).extend(self.statuses, "/data")
+        assert len(cols) == 10
+        assert list(cols["length"]) == [x["length"] for x in self.statuses]
+        assert cols["owner"].values == ["hdfs", "hive"]
+        assert cols["owner"][3] == "hive"
+        assert cols["root"].code("/data") == 0 and cols["root"].code("/tmp") == -1
+        assert cols.to_dict()["owner"] == [x["owner"] for x in self.statuses]
+
+    def test_002_aggregations(self):
+        cols = StatusColumns(use_numpy=False).extend(self.statuses, "/data")
+        assert cols.total() == 45 * 1024
+        assert cols.group_sum("owner") == {"hdfs": 20 * 1024, "hive": 25 * 1024}
+        assert cols.group_count("owner") == {"hdfs": 5, "hive": 5}
+        assert list(cols.age(now=10))[:2] == [10.0, 9.0]
+
+    def test_003_custom_columns(self):
+        cols = StatusColumns([("pathSuffix", "str"), ("length", "float")],
+                             use_numpy=False).extend(self.statuses)
+        assert "owner" not in cols
+        assert cols.to_dict()["pathSuffix"][:2] == ["f0", "f1"]
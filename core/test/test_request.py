@@ -0,0 +1,274 @@
+import sys
+import os
+import time
+import tempfile
+sys.path.append(os.path.dirname(os.path.realpath(__file__)) + "/../")
+
+
+from request import SessionPool, UploadReader
+from request import CircuitBreaker, RetryPolicy, Transport, url_operation
+from request import AIMDLimiter, RequestLimiter
+from request import LatencyHistogram, RequestMetrics, url_metric_name
+from request import Request
+
+
+class Test:
+    def setup_method(self, method):
+        self.pool = SessionPool(pool_size=4, idle_timeout=60)
+
+    def teardown_method(self, method):
+        self.pool.close()
+
+    def test_001_session_reused_per_host(self):
+        session = self.pool.session("http://nn1.host.com:50070/webhdfs/v1/tmp?op=LISTSTATUS")
+        assert session is self.pool.session("http://nn1.host.com:50070/webhdfs/v1/apps?op=GETFILESTATUS")
+        assert session is not self.pool.session("http://nn2.host.com:50070/webhdfs/v1/tmp?op=LISTSTATUS")
+        stats = self.pool.stats()
+        assert stats["hosts"] == 2
+        assert stats["session_hits"] == 1
+        assert stats["session_misses"] == 2
+
+    def test_002_idle_session_evicted(self):
+        pool = SessionPool(idle_timeout=0.01)
+        session = pool.session("http://nn1.host.com:50070/webhdfs/v1/tmp")
+        time.sleep(0.05)
+        assert session is not pool.session("http://nn1.host.com:50070/webhdfs/v1/tmp")
+        assert pool.stats()["evictions"] == 1
+        pool.close()
+
+    def test_003_configure_resets_sessions(self):
+        session = self.pool.session("http://rm.host.com:8088/ws/v1/cluster/info")
+        self.pool.configure(pool_size=16, keep_alive=False)
+        new_session = self.pool.session("http://rm.host.com:8088/ws/v1/cluster/info")
+        assert new_session is not session
+        assert new_session.headers["Connection"] == "close"
+        assert new_session.get_adapter("http://rm.host.com")._pool_maxsize == 16
+
+    def test_004_upload_reader_blocks(self):
+        data = os.urandom(10000)
+        fd, srcfile = tempfile.mkstemp()
+        os.write(fd, data)
+        os.close(fd)
+        try:
+            for use_mmap in (True, False):
+                with UploadReader(srcfile, chunk_size=4096, use_mmap=use_mmap) as body:
+                    assert len(body) == 10000
+                    blocks = []
+                    block = body.read(8192)
+                    while block:
+                        # python 2 mmap blocks are buffer objects
+                        blocks.append(block.tobytes() if isinstance(block, memoryview)
+                                      else bytes(block))
+                        block = body.read(8192)
+                    assert [len(x) for x in blocks] == [4096, 4096, 1808]
+                    assert b"".join(blocks) == data
+                    assert body.sent == 10000
+                assert body._file.closed
+        finally:
+            os.remove(srcfile)
+
+    def test_005_retry_policy(self):
+        policy = RetryPolicy(backoff=1, max_backoff=4, jitter=0.5)
+        assert 0.5 <= policy.delay(1) <= 1
+        assert 2 <= policy.delay(3) <= 4 and policy.delay(10) <= 4
+        assert url_operation("http://nn:50070/webhdfs/v1/x?user.name=a&op=liststatus") == "LISTSTATUS"
+        assert policy.idempotent("http://nn:50070/webhdfs/v1/x?op=MKDIRS", "put")
+        assert not policy.idempotent("http://nn:50070/webhdfs/v1/x?op=DELETE", "delete")
+        assert not policy.idempotent("http://nn:50070/webhdfs/v1/x?op=CONCAT", "post")
+
+    def test_006_circuit_breaker(self):
+        breaker = CircuitBreaker(threshold=2, reset_timeout=0.05)
+        breaker.record_failure()
+        assert breaker.allow()
+        breaker.record_failure()
+        assert breaker.state == CircuitBreaker.OPEN and not breaker.allow()
+        time.sleep(0.06)
+        assert breaker.allow() and breaker.state == CircuitBreaker.HALF_OPEN
+        assert not breaker.allow()
+        breaker.record_failure()
+        assert breaker.state == CircuitBreaker.OPEN
+        time.sleep(0.06)
+        assert breaker.allow()
+        breaker.record_success()
+        assert breaker.state == CircuitBreaker.CLOSED and breaker.allow()
+
+    def test_007_transport_skips_open_hosts(self):
+        transport = Transport(["http://nn1:50070", "http://nn2:50070/"],
+                              active="http://nn2:50070", breaker_threshold=1)
+        assert transport.active == "http://nn2:50070"
+        transport.breakers["http://nn2:50070"].record_failure()
+        assert transport._choose() == "http://nn1:50070"
+        transport.breakers["http://nn1:50070"].record_failure()
+        assert transport._choose() is None
+        assert transport.stats()["failovers"] == 1
+
+    def test_008_aimd_limiter(self):
+        limiter = AIMDLimiter(initial=4, max_limit=6, latency_floor=0.01)
+        for i in range(20):
+            limiter.acquire()
+            limiter.release(0.02)
+        assert limiter.stats()["limit"] == 6
+        # Errors halve the limit once per window of requests
+        for i in range(3):
+            limiter.acquire()
+            limiter.release(0.02, failed=True)
+        assert limiter.stats()["limit"] == 3
+        for i in range(10):
+            limiter.acquire()
+            limiter.release(0.5)
+        assert limiter.stats()["limit"] < 3 and limiter.stats()["decreases"] >= 2
+
+    def test_009_fixed_concurrency(self):
+        import threading
+        limits = RequestLimiter()
+        assert limits.acquire("http://nn1:50070/webhdfs/v1/") is None
+        limits.configure(concurrency=2)
+        peak = [0, 0]
+        lock = threading.Lock()
+
+        def request():
+            token = limits.acquire("http://nn1:50070/webhdfs/v1/x")
+            with lock:
+                peak[0] += 1
+                peak[1] = max(peak[1], peak[0])
+            time.sleep(0.02)
+            with lock:
+                peak[0] -= 1
+            limits.release(token)
+        threads = [threading.Thread(target=request) for i in range(6)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert peak[1] == 2
+        assert limits.stats()["http://nn1:50070"]["limit"] == 2
+
+    def test_010_latency_histogram(self):
+        histogram = LatencyHistogram()
+        for i in range(1, 1001):
+            histogram.record(i / 1000.0)
+        assert histogram.count == 1000 and histogram.max == 1.0
+        for percent in (50, 90, 99):
+            assert abs(histogram.percentile(percent) - percent / 100.0) <= percent / 100.0 / 32
+        assert histogram.cumulative([0.0005, 0.1, 2.0]) == [0, 100, 1000]
+        merged = LatencyHistogram().merge(histogram).merge(histogram)
+        assert merged.count == 2000 and merged.percentile(50) == histogram.percentile(50)
+
+    def test_011_request_metrics(self):
+        assert url_metric_name("http://nn1:50070/webhdfs/v1/tmp?user.name=a&op=liststatus") == "LISTSTATUS"
+        assert url_metric_name("http://rm:8088/ws/v1/cluster/apps/application_1_0001/state") == \
+            "cluster/apps/{id}/state"
+        metrics = RequestMetrics()
+        metrics.record("LISTSTATUS", "http://nn1:50070", 200, 0.01, bytes_in=100)
+        metrics.record("LISTSTATUS", "http://nn2:50070", 200, 0.03, bytes_in=50)
+        metrics.record("CREATE", "http://dn1:50075", 201, 0.5, bytes_out=1000)
+        rows = metrics.snapshot(group_by=("op",))
+        assert [x["op"] for x in rows] == ["CREATE", "LISTSTATUS"]
+        assert rows[1]["count"] == 2 and rows[1]["bytes_in"] == 150
+        text = metrics.prometheus()
+        assert 'groot_request_duration_seconds_bucket{op="LISTSTATUS",host="http://nn1:50070",' \
+               'status="200",le="0.01"} 1' in text
+        assert 'groot_request_sent_bytes_total{op="CREATE",host="http://dn1:50075",status="201"} 1000' in text
+
+    def test_012_request_hooks(self):
+        from multiprocessing.pool import ThreadPool
+
+        class Response(object):
+            status_code = 200
+            headers = {"content-length": "2"}
+        events = []
+
+        def before(request):
+            request["headers"]["traceparent"] = "00-1"
+            return request["span"].name if request["span"] else None
+
+        def after(request, state, response, error):
+            events.append((request["op"], state, response.status_code))
+
+        def start(span):
+            events.append(("start", span.name, span.parent and span.parent.name))
+
+        def end(span, state, error):
+            events.append(("end", span.name, error is not None))
+
+        sent = []
+        assert Request.span("job") is Request.span("other")
+        hook = Request.add_hook(before, after, start, end)
+        try:
+            with Request.span("job"):
+                with Request.span("list", path="/tmp"):
+                    headers = {}
+                    Request._limited("http://nn1:50070/webhdfs/v1/tmp?op=LISTSTATUS",
+                                     lambda: sent.append(dict(headers)) or Response(),
+                                     headers=headers)
+                pool = ThreadPool(1)
+                assert pool.apply(Request.propagate(Request.current_span)).name == "job"
+                assert pool.apply(Request.current_span) is None
+                pool.terminate()
+            try:
+                with Request.span("failed"):
+                    raise ValueError()
+            except ValueError:
+                pass
+        finally:
+            Request.remove_hook(hook)
+        assert sent == [{"traceparent": "00-1"}]
+        assert events == [("start", "job", None), ("start", "list", "job"),
+                          ("LISTSTATUS", "list", 200), ("end", "list", False),
+                          ("end", "job", False), ("start", "failed", None),
+                          ("end", "failed", True)]
+        assert Request.current_span() is None
+
+    def test_013_half_open_trial_always_recorded(self):
+        class Response(object):
+            status_code = 403
+
+            def json(self):
+                return {"RemoteException": {"exception": "RetriableException"}}
+
+            def close(self):
+                pass
+
+        def fail(url, method=None, **kwargs):
+            raise ValueError("bad request")
+
+        transport = Transport(["http://nn1:50070"], retry=RetryPolicy(max_attempts=1),
+                              breaker_threshold=1, breaker_reset=0.01)
+        breaker = transport.breakers["http://nn1:50070"]
+        url_request = Request.url_request
+        try:
+            Request.url_request = staticmethod(fail)
+            breaker.record_failure()
+            time.sleep(0.02)
+            try:
+                transport.request("http://nn1:50070/webhdfs/v1/tmp?op=LISTSTATUS")
+                assert False
+            except ValueError:
+                pass
+            assert breaker.state == CircuitBreaker.OPEN
+            time.sleep(0.02)
+            Request.url_request = staticmethod(lambda url, method=None, **kwargs: Response())
+            assert transport.request("http://nn1:50070/webhdfs/v1/tmp?op=LISTSTATUS").status_code == 403
+            assert breaker.state == CircuitBreaker.CLOSED
+        finally:
+            Request.url_request = staticmethod(url_request)
+
+    def test_014_caller_errors_not_host_failures(self):
+        def fail(url, method=None, **kwargs):
+            raise TypeError("unexpected keyword argument")
+
+        transport = Transport(["http://nn1:50070"], retry=RetryPolicy(max_attempts=1),
+                              breaker_threshold=1)
+        breaker = transport.breakers["http://nn1:50070"]
+        url_request = Request.url_request
+        try:
+            Request.url_request = staticmethod(fail)
+            for i in range(3):
+                try:
+                    transport.request("http://nn1:50070/webhdfs/v1/tmp?op=LISTSTATUS")
+                    assert False
+                except TypeError:
+                    pass
+            assert breaker.state == CircuitBreaker.CLOSED
+        finally:
+            Request.url_request = staticmethod(url_request)
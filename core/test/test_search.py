@@ -0,0 +1,106 @@
+import sys
+import os
+import random
+sys.path.append(os.path.dirname(os.path.realpath(__file__)) + "/../")
+
+
+from webhdfs import WhdfsSearchKeys as keys
+from webhdfs import WhdfsSearchExpression, WhdfsSearchExpressionList
+
+
+class Test:
+    def setup_method(self):
+        rand = random.Random(7)
+        self.statuses = [{"pathSuffix": "part-%05d.%s" % (i, rand.choice(["orc", "csv", "tmp"])),
+                          "length": rand.randint(0, 1000),
+                          "owner": rand.choice(["hdfs", "hive"])}
+                         for i in range(500)]
+
+    def test_001_compiled_matches_interpreter(self):
+        exp_list = WhdfsSearchExpressionList()
+        exp_list.add(WhdfsSearchExpression(keys.SIZE_KEY, ">", 300))
+        exp_list.add(WhdfsSearchExpression(keys.PATH_KEY, "glob", "*.orc"))
+        exp_list.add("and")
+        exp_list.add(WhdfsSearchExpression(keys.PATH_KEY, "regex", r"\.csv$"))
+        exp_list.add(WhdfsSearchExpression(keys.OWNER_KEY, "=", "hive"))
+        exp_list.add("and")
+        exp_list.add("or")
+        expected = [x for x in self.statuses if exp_list.match_postfix(x)]
+        assert expected
+        assert [x for x in self.statuses if exp_list.match(x)] == expected
+        assert list(exp_list.filter(self.statuses)) == expected
+
+    def test_002_short_circuit(self):
+        # The second expression would fail on a missing key if evaluated
+        exp_list = WhdfsSearchExpressionList(WhdfsSearchExpression(keys.SIZE_KEY, ">", 10))
+        exp_list.add(WhdfsSearchExpression(keys.OWNER_KEY, "=", "hdfs"))
+        exp_list.add("and")
+        assert exp_list.match({"length": 1}) is False
+
+    def test_003_recompiled_after_add(self):
+        exp_list = WhdfsSearchExpressionList(WhdfsSearchExpression(keys.SIZE_KEY, ">", 10))
+        assert exp_list.match({"length": 20, "owner": "hive"})
+        exp_list.add(WhdfsSearchExpression(keys.OWNER_KEY, "=", "hdfs"))
+        exp_list.add("and")
+        assert not exp_list.match({"length": 20, "owner": "hive"})
+
+    def test_004_incorrect_expression(self):
+        exp_list = WhdfsSearchExpressionList(WhdfsSearchExpression(keys.SIZE_KEY, ">", 10))
+        exp_list.add("and")
+        try:
+            exp_list.match({"length": 20})
+            raise AssertionError("incorrect expression was not reported")
+        except ValueError:
+            pass
+
+    def test_005_infix_precedence(self):
+        # not binds tighter than and, which binds tighter than or
+        exp_list = WhdfsSearchExpressionList()
+        exp_list.add_expression(["not", WhdfsSearchExpression(keys.OWNER_KEY, "=", "hive"),
+                                 "or", WhdfsSearchExpression(keys.SIZE_KEY, ">", 500),
+                                 "and", "(", WhdfsSearchExpression(keys.PATH_KEY, "glob", "*.orc"),
+                                 "or", WhdfsSearchExpression(keys.PATH_KEY, "glob", "*.csv"), ")"])
+        expected = [x for x in self.statuses
+                    if not x["owner"] == "hive" or
+                    (x["length"] > 500 and x["pathSuffix"].endswith((".orc", ".csv")))]
+        assert list(exp_list.filter(self.statuses)) == expected
+        assert [x for x in self.statuses if exp_list.match_postfix(x)] == expected
+
+    def test_006_infix_errors(self):
+        for expression in (["(", WhdfsSearchExpression(keys.SIZE_KEY, ">", 1)],
+                           [WhdfsSearchExpression(keys.SIZE_KEY, ">", 1), "and"],
+                           [WhdfsSearchExpression(keys.SIZE_KEY, ">", 1),
+                            WhdfsSearchExpression(keys.SIZE_KEY, "<", 9)]):
+            try:
+                WhdfsSearchExpressionList().add_expression(expression)
+                raise AssertionError("{0} was not reported".format(expression))
+            except ValueError:
+                pass
+
+    def test_007_query(self):
+        exp_list = WhdfsSearchExpressionList.from_query(
+            "size > 0.5KB and (owner = hive or not name ~ '\\.(csv|tmp)$')")
+        expected = [x for x in self.statuses
+                    if x["length"] > 512 and
+                    (x["owner"] == "hive" or x["pathSuffix"].endswith(".orc"))]
+        assert list(exp_list.filter(self.statuses)) == expected
+
+    def test_008_query_mtime_age(self):
+        import time
+        now = int(time.time() * 1000)
+        exp_list = WhdfsSearchExpressionList.from_query("mtime < 30d")
+        assert exp_list.match({"modificationTime": now - 86400000})
+        assert not exp_list.match({"modificationTime": now - 31 * 86400000})
+        exp_list = WhdfsSearchExpressionList.from_query("mtime >= 2015-01-01")
+        assert exp_list.match({"modificationTime": 1420070400000})
+        assert not exp_list.match({"modificationTime": 1420070399999})
+
+    def test_009_required_expressions(self):
+        path_exp = WhdfsSearchExpression(keys.FULL_PATH_KEY, "glob", "/data/2015-*")
+        exp_list = WhdfsSearchExpressionList()
+        exp_list.add_expression([path_exp, "and", "(", WhdfsSearchExpression(keys.SIZE_KEY, ">", 1),
+                                 "or", "not", WhdfsSearchExpression(keys.OWNER_KEY, "=", "hive"), ")"])
+        assert exp_list.required_expressions() == [path_exp]
+        exp_list.add(WhdfsSearchExpression(keys.SIZE_KEY, "<", 9))
+        exp_list.add("or")
+        assert exp_list.required_expressions() == []
@@ -0,0 +1,115 @@
+import sys
+import os
+import tempfile
+sys.path.append(os.path.dirname(os.path.realpath(__file__)) + "/../")
+
+
+from snapshot import Snapshot, build_snapshot
+
+
+class FakeHdfs(object):
+    """ Namespace of FileStatus dictionaries answering the calls made by build_snapshot """
+
+    def __init__(self):
+        self.nodes = {"/data": self.status("DIRECTORY")}
+        self.calls = []
+        self.put("/data/a.orc", length=10 << 30, owner="hive")
+        self.put("/data/d0/b.orc", length=100)
+        self.put("/data/d0/d1/c.orc", length=200, mtime=1000)
+        self.put("/data/d2/e.orc", length=300)
+
+    @staticmethod
+    def status(otype, length=0, owner="hdfs", mtime=2000):
+        return {"type": otype, "length": length, "owner": owner, "group": "hdfs",
+                "permission": "755", "replication": 3 if otype == "FILE" else 0,
+                "blockSize": 0, "modificationTime": mtime, "accessTime": 0,
+                "childrenNum": 0}
+
+    def put(self, path, length=0, owner="hdfs", mtime=2000):
+        parent = os.path.dirname(path)
+        if parent not in self.nodes:
+            self.put(parent)
+            self.nodes[parent]["type"] = "DIRECTORY"
+        self.nodes[parent]["childrenNum"] += 1
+        self.nodes[parent]["modificationTime"] += 1
+        self.nodes[path] = self.status("FILE", length, owner, mtime)
+
+    def children(self, path):
+        return sorted(x for x in self.nodes if os.path.dirname(x) == path)
+
+    def get_path_status(self, path, ignore_error=False):
+        self.calls.append(("status", path))
+        return dict(self.nodes[path], pathSuffix="") if path in self.nodes else None
+
+    def iter_long_list_dir(self, path, ignore_error=False):
+        self.calls.append(("list", path))
+        return [dict(self.nodes[x], pathSuffix=os.path.basename(x))
+                for x in self.children(path)]
+
+    def get_content_summary(self, path, ignore_error=False):
+        self.calls.append(("summary", path))
+        files = [x for x in self.nodes if x.startswith(path + "/")]
+        return {"length": sum(self.nodes[x]["length"] for x in files),
+                "fileCount": len([x for x in files if self.nodes[x]["type"] == "FILE"]),
+                "directoryCount": 1 + len([x for x in files
+                                           if self.nodes[x]["type"] == "DIRECTORY"])}
+
+
+class Test:
+    def setup_method(self):
+        self.whdfs = FakeHdfs()
+        self.tmpdir = tempfile.mkdtemp()
+        self.output = os.path.join(self.tmpdir, "data.snap")
+
+    def teardown_method(self):
+        for name in os.listdir(self.tmpdir):
+            os.remove(os.path.join(self.tmpdir, name))
+        os.rmdir(self.tmpdir)
+
+    def test_001_build(self):
+        with build_snapshot(self.whdfs, "/data", self.output) as snap:
+            assert len(snap) == len(self.whdfs.nodes)
+            root = snap.get_path_status("/data")
+            assert root["length"] == (10 << 30) + 600
+            assert root["fileCount"] == 4 and root["directoryCount"] == 4
+            assert snap.get_path_status("/data/d0")["length"] == 300
+            assert snap.get_path_status("/data/d0/d1/c.orc")["owner"] == "hdfs"
+            assert snap.get_path_status("/data/missing") is None
+
+    def test_002_query(self):
+        with build_snapshot(self.whdfs, "/data", self.output) as snap:
+            calls = len(self.whdfs.calls)
+            result = lambda *args, **kwargs: sorted(x["fullPath"] for x in
+                                                    snap.query(*args, **kwargs))
+            assert result("size > 1GB") == ["/data/a.orc"]
+            assert result("size > 100 and size <= 300", otype="file") == \
+                ["/data/d0/d1/c.orc", "/data/d2/e.orc"]
+            assert result("owner = hive") == ["/data/a.orc"]
+            assert result("path glob '/data/d0/*'") == \
+                ["/data/d0/b.orc", "/data/d0/d1", "/data/d0/d1/c.orc"]
+            assert result(path="/data/d0", otype="dir") == ["/data/d0/d1"]
+            assert len(list(snap.query(limit=2))) == 2
+            assert len(self.whdfs.calls) == calls
+
+    def test_003_refresh(self):
+        snap = build_snapshot(self.whdfs, "/data", self.output)
+        self.whdfs.put("/data/d0/d1/new.orc", length=5)
+        self.whdfs.calls = []
+        with snap.refresh(self.whdfs) as snap:
+            assert ("list", "/data/d0/d1") in self.whdfs.calls
+            assert ("list", "/data/d2") not in self.whdfs.calls
+            assert snap.get_path_status("/data/d0/d1/new.orc")["length"] == 5
+            assert snap.get_path_status("/data")["fileCount"] == 5
+            assert snap.stats["reused"] == 3
+        assert os.listdir(self.tmpdir) == ["data.snap"]
+
+    def test_004_refresh_verify(self):
+        snap = build_snapshot(self.whdfs, "/data", self.output)
+        self.whdfs.nodes["/data/d2/e.orc"]["length"] = 400
+        self.whdfs.calls = []
+        with snap.refresh(self.whdfs, verify=True) as snap:
+            assert ("list", "/data/d2") in self.whdfs.calls
+            assert ("list", "/data/d0") not in self.whdfs.calls
+            assert snap.get_path_status("/data/d2/e.orc")["length"] == 400
+            assert snap.get_path_status("/data")["length"] == (10 << 30) + 700
+            assert snap.stats["copied"] == 1
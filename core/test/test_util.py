@@ -0,0 +1,57 @@
+import sys
+import os
+import json
+sys.path.append(os.path.dirname(os.path.realpath(__file__)) + "/../")
+
+
+from util import iter_json_items, glob_literal_prefix, regex_literal_prefix
+from util import TokenBucket, merge_dict, timer
+
+
+class Test:
+    doc = {"FileStatuses": {"FileStatus": [{"pathSuffix": u"part-%05d \u00e9 ]" % i,
+                                            "length": i,
+                                            "nested": [1, {"a": "]"}]}
+                                           for i in range(100)]}}
+
+    def _chunks(self, size):
+        raw = json.dumps(self.doc, indent=1, ensure_ascii=False).encode("utf-8")
+        return [raw[i:i + size] for i in range(0, len(raw), size)]
+
+    def test_001_stream_matches_buffered_parse(self):
+        expected = self.doc["FileStatuses"]["FileStatus"]
+        for size in (1, 7, 64, 65536):
+            assert list(iter_json_items(self._chunks(size), "FileStatus")) == expected
+
+    def test_002_missing_or_null_array(self):
+        assert list(iter_json_items([b'{"apps":null}'], "app")) == []
+        assert list(iter_json_items([b'{"apps":{"app":[]}}'], "app")) == []
+        assert list(iter_json_items([b'{"RemoteException":{"message":"x"}}'], "FileStatus")) == []
+
+    def test_003_truncated_document(self):
+        try:
+            list(iter_json_items([b'{"apps":{"app":[{"id":1},{"id'], "app"))
+            raise AssertionError("truncated document was not reported")
+        except ValueError:
+            pass
+
+    def test_004_literal_prefix(self):
+        assert glob_literal_prefix("/data/2015-*/x?.orc") == "/data/2015-"
+        assert regex_literal_prefix("^/data/ab?c") == "/data/a"
+        assert regex_literal_prefix("^/data/x+") == "/data/x"
+        assert regex_literal_prefix("/data/x") == ""
+        assert regex_literal_prefix("^/data|^/apps") == ""
+
+    def test_005_token_bucket(self):
+        bucket = TokenBucket(100, capacity=2)
+        assert bucket.try_acquire() and bucket.try_acquire()
+        assert not bucket.try_acquire()
+        assert 0 < bucket.acquire() < 0.1
+        assert bucket.acquire(5) >= 0
+
+    def test_006_merge_dict(self):
+        assert merge_dict({"a": 1, "b": 1}, {"b": 2}) == {"a": 1, "b": 2}
+
+    def test_007_timer_returns_result(self):
+        add = timer(lambda x, y: x + y)
+        assert add(1, y=2) == 3
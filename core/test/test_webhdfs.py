@@ -106,6 +106,47 @@ class Test:
         assert next(gen)
         del gen
 
+    def test_008_scan_dir_2(self):
+        path = self.hdfs_webhcat
+        server = dict((root, dirs) for root, dirs, files in self.whdfs.scan_dir(path))
+        for root, dirs, files in self.whdfs.scan_dir(path, summary="aggregate"):
+            for x, y in zip(dirs, server[root]):
+                for key in ("directoryCount", "fileCount", "length", "spaceConsumed"):
+                    assert x[key] == y[key]
+
+    def test_008_scan_dir_3(self):
+        path = self.hdfs_apps
+        roots = [root for root, dirs, files in
+                 self.whdfs.scan_dir(path, prune=lambda p, st: p != self.hdfs_webhcat)]
+        assert set(roots) <= set([path, self.hdfs_webhcat])
+        found = sum(len(dirs) + len(files) for root, dirs, files in
+                    self.whdfs.scan_dir(path, max_results=2))
+        assert found <= 2
+
+    def test_008_scan_changes(self):
+        path = self.hdfs_webhcat
+        state = {}
+        events = list(self.whdfs.scan_changes(path, state))
+        assert set(event for event, fullpath, status in events) <= set(["added"])
+        assert path in state
+        assert list(self.whdfs.scan_changes(path, state)) == []
+
+    def test_008_disk_usage(self):
+        path = self.hdfs_apps
+        usage = self.whdfs.disk_usage(path, depth=1, top_n=2, group_by="owner")
+        summary = self.whdfs.get_content_summary(path)
+        assert usage["total"]["length"] == summary["length"]
+        assert usage["total"]["fileCount"] == summary["fileCount"]
+        assert sum(x["fileCount"] for x in usage["groups"].values()) == summary["fileCount"]
+        assert len(usage["top_files"]) <= 2
+
+    def test_008_find_small_files(self):
+        for entry in self.whdfs.find_small_files(self.hdfs_apps, min_count=2):
+            assert entry["smallFileCount"] >= 2
+            assert sum(entry["distribution"].values()) == entry["fileCount"]
+            for group in entry["groups"]:
+                assert group["sources"] and group["length"] <= group["blockSize"]
+
     def test_009_upload_file(self):
         # Try uploading a file to local
         assert not self.whdfs.is_exists(self.hdfs_rand_file_1)
@@ -119,6 +160,22 @@ class Test:
         self.whdfs.upload_files(infilelist, self.hdfs_rand_parent_dir)
         assert self.whdfs.is_file(self.hdfs_rand_file_1) and self.whdfs.is_file(self.hdfs_rand_file_2)
 
+    def test_010_upload_dir(self):
+        # Upload a local tree with sub directories in parallel
+        import shutil
+        import tempfile
+        srcdir = tempfile.mkdtemp()
+        os.makedirs(os.path.join(srcdir, "a", "b"))
+        shutil.copy(self.local_rand_file_1, os.path.join(srcdir, "a"))
+        shutil.copy(self.local_rand_file_2, os.path.join(srcdir, "a", "b"))
+        try:
+            assert self.whdfs.upload_dir(srcdir, self.hdfs_rand_parent_dir, workers=4)
+            tgtdir = self.hdfs_rand_parent_dir + "/" + os.path.basename(srcdir)
+            assert self.whdfs.is_file(tgtdir + "/a/" + os.path.basename(self.local_rand_file_1))
+            assert self.whdfs.is_file(tgtdir + "/a/b/" + os.path.basename(self.local_rand_file_2))
+        finally:
+            shutil.rmtree(srcdir)
+
     def test_012_append_file(self):
         # Try uploading files to local
         infile = self.local_rand_file_1
@@ -136,6 +193,13 @@ class Test:
         assert os.path.isfile(self.local_rand_file_1)
         # self.local_rand_file_1
 
+    def test_013_read_into(self):
+        buf = bytearray(100)
+        assert self.whdfs.read_into(self.hdfs_rand_file_1, buf, offset=10) == 100
+        with open(self.local_rand_file_1, "rb") as f:
+            f.seek(10)
+            assert f.read(100) == bytes(buf)
+
     def test_014_download_files(self):
         # Try downloading files to local
         os.remove(self.local_rand_file_1)
@@ -145,6 +209,17 @@ class Test:
         self.whdfs.download_files(hdfs_file_list, self.local_dir)
         assert os.path.isfile(self.local_rand_file_1) and os.path.isfile(self.local_rand_file_2)
 
+    def test_014_download_files_1(self):
+        # Download files in parallel in small ranges
+        os.remove(self.local_rand_file_1)
+        os.remove(self.local_rand_file_2)
+        hdfs_file_list = [self.hdfs_rand_file_1, self.hdfs_rand_file_2]
+        assert self.whdfs.download_files(hdfs_file_list, self.local_dir,
+                                         workers=4, split_size=1024)
+        assert os.path.getsize(self.local_rand_file_1) == \
+            self.whdfs.get_path_status(self.hdfs_rand_file_1)["length"]
+        assert not os.path.exists(self.local_rand_file_1 + ".part")
+
     def test_016_rename(self):
         # Use whdfs.rename
         # renames path
@@ -169,10 +244,22 @@ class Test:
     def test_040_delete(self):
         # Use whdfs.delete
         # Deletes path
-        self.whdfs.delete(self.hdfs_rand_child_dir)
+        assert self.whdfs.delete(self.hdfs_rand_child_dir)
         assert not self.whdfs.is_exists(self.hdfs_rand_child_dir)
+        assert not self.whdfs.delete(self.hdfs_rand_child_dir)
         self.whdfs.make_dirs(self.hdfs_rand_child_dir)
 
+    def test_041_bulk(self):
+        paths = [self.hdfs_rand_child_dir + "/bulk_%d" % i for i in range(4)]
+        report = self.whdfs.bulk(paths, op="mkdir", workers=2, rate=100)
+        assert report["succeeded"] == 4 and not report["failed"]
+        report = self.whdfs.bulk(self.whdfs.scan_dir(self.hdfs_rand_child_dir),
+                                 op="chmod", permission="700")
+        assert report["total"] == 4 and not report["failed"]
+        assert self.whdfs.get_path_status(paths[0])["permission"] == "700"
+        report = self.whdfs.bulk(paths + [paths[0]], op="delete", recursive=True)
+        assert report["succeeded"] == 4 and len(report["failed"]) == 1
+
          
         
          
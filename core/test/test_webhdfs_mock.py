@@ -0,0 +1,143 @@
+import sys
+import os
+import shutil
+import json
+import tempfile
+import time
+import pytest
+sys.path.append(os.path.dirname(os.path.realpath(__file__)) + "/../")
+sys.path.append(os.path.dirname(os.path.realpath(__file__)) + "/../../benchmarks")
+
+
+from errors import IllegalArgumentError
+from webhdfs import Webhdfs, _ScanPrefetcher
+from mockserver import MockServer, generate
+
+
+class Test:
+    """ Webhdfs against the local mock rest server of the benchmarks """
+
+    def setup_method(self, method):
+        self.server = MockServer().start()
+        generate(self.server.ns, "/data", dirs=2, files=2, depth=2)
+        self.whdfs = Webhdfs(host="127.0.0.1", port=self.server.port)
+        self.tmpdir = tempfile.mkdtemp()
+
+    def teardown_method(self, method):
+        self.server.shutdown()
+        self.server.server_close()
+        shutil.rmtree(self.tmpdir)
+
+    def test_001_download_empty_file(self):
+        self.server.ns.put_file("/data/_SUCCESS")
+        target = os.path.join(self.tmpdir, "_SUCCESS")
+        assert self.whdfs.download_file("/data/_SUCCESS", target) is True
+        assert os.path.getsize(target) == 0
+        assert self.whdfs.download_files(["/data/_SUCCESS"], self.tmpdir, split_size=4)
+        assert not os.path.exists(target + ".part")
+
+    def test_002_failed_concat_not_counted(self):
+        plan = [{"target": "/data/part-00000.orc", "sources": ["/data/part-00001.csv"]},
+                {"target": "/data/missing.orc", "sources": ["/data/d0/part-00000.orc"]}]
+        result = self.whdfs.compact_small_files(plan)
+        assert result["groups"] == 1 and result["files"] == 1
+        assert [x[0] for x in result["failed"]] == ["/data/missing.orc"]
+        assert "/data/d0/part-00000.orc" in self.server.ns.nodes
+        assert "/data/part-00001.csv" not in self.server.ns.nodes
+        result = self.whdfs.compact_small_files(
+            [{"target": "/data/part-00000.orc", "sources": ["/data/d0/missing.orc"]}])
+        assert result["groups"] == 0
+        assert [x[0] for x in result["failed"]] == ["/data/part-00000.orc"]
+        assert "/data/d0/missing.orc does not exist" in str(result["failed"][0][1])
+
+    def test_003_scan_changes_with_status_cache(self):
+        whdfs = Webhdfs(host="127.0.0.1", port=self.server.port, cache_size=1000, cache_ttl=600)
+        state = {}
+        assert len(list(whdfs.scan_changes("/data", state))) == 8
+        assert list(whdfs.scan_changes("/data", state)) == []
+        self.server.ns.put_file("/data/d0/new.orc", b"x")
+        self.server.ns.delete("/data/d1/part-00000.orc")
+        events = set((event, path) for event, path, status in whdfs.scan_changes("/data", state))
+        assert ("added", "/data/d0/new.orc") in events
+        assert ("removed", "/data/d1/part-00000.orc") in events
+        assert list(whdfs.scan_changes("/data", state)) == []
+
+    def test_004_disk_usage_rejects_summary(self):
+        usage = self.whdfs.disk_usage("/data", workers=2)
+        assert usage["total"]["fileCount"] == 6
+        assert sorted(usage["levels"][1]) == ["/data/d0", "/data/d1"]
+        with pytest.raises(IllegalArgumentError):
+            self.whdfs.disk_usage("/data", summary="content")
+
+    def test_005_aggregate_scan_summaries(self):
+        generate(self.server.ns, "/wide", dirs=4, files=2, depth=3)
+        ops = self.server.ops
+        before = ops.get("GETCONTENTSUMMARY", 0)
+        cols = self.whdfs.scan_to_columns("/wide", query="path glob /wide/d0*")
+        assert len(cols) == 10
+        assert ops.get("GETCONTENTSUMMARY", 0) == before
+        # Directories beyond level are summarized only when yielded
+        scan = list(self.whdfs.scan_dir("/wide", level=1, otype="file", summary="aggregate"))
+        assert ops.get("GETCONTENTSUMMARY", 0) == before
+        scan = list(self.whdfs.scan_dir("/wide", level=1, summary="aggregate"))
+        assert ops.get("GETCONTENTSUMMARY", 0) == before + 4
+        assert [x["fileCount"] for x in scan[0][1]] == [10, 10, 10, 10]
+        assert "partialSummary" not in scan[0][1][0]
+        scan = list(self.whdfs.scan_dir("/wide", otype="dir", query="path glob /wide/d0*",
+                                        summary="aggregate", workers=2))
+        root, dirs, files = scan[-1]
+        assert root == "/wide" and [x["pathSuffix"] for x in dirs] == ["d0"]
+        assert dirs[0]["fileCount"] == 10 and "partialSummary" not in dirs[0]
+        assert ops.get("GETCONTENTSUMMARY", 0) == before + 4
+
+    def test_006_range_failing_mid_body(self):
+        self.server.ns.put_file("/data/big.bin", length=300000)
+        target = os.path.join(self.tmpdir, "big.bin")
+        open_file = self.whdfs._open_file
+
+        def broken_open(srcfile, offset=None, **kwargs):
+            r = open_file(srcfile, offset=offset, **kwargs)
+            if offset == 100000:
+                fp = r.raw._fp
+
+                def fail(*args, **kwargs):
+                    raise IOError("Connection reset by peer")
+                if hasattr(fp, "readinto"):
+                    fp.readinto = fail
+                r.raw.read = fail
+            return r
+        self.whdfs._open_file = broken_open
+        with pytest.raises(IOError) as excinfo:
+            self.whdfs.download_file("/data/big.bin", target, split_size=100000)
+        assert "Connection reset" in str(excinfo.value)
+        with open(target + ".part.progress") as f:
+            ranges = json.load(f)["ranges"]
+        assert [offset for start, end, offset in ranges] == [100000, 100000, 200000]
+        # The next download fetches the ranges left
+        self.whdfs._open_file = open_file
+        assert self.whdfs.download_file("/data/big.bin", target, split_size=100000)
+        with open(target, "rb") as f:
+            assert f.read() == self.server.ns.read("/data/big.bin")
+
+    def test_007_prefetcher_failures_and_close(self):
+        def listing(path):
+            if path.endswith("bad"):
+                raise IOError("listing of {0} failed".format(path))
+            time.sleep(0.01)
+            return [path]
+        prefetcher = _ScanPrefetcher(listing, 2, max_buffered=4)
+        prefetcher.hint(["/a", "/bad", "/c", "/dbad", "/e", "/f"])
+        assert prefetcher.get("/a") == ["/a"]
+        with pytest.raises(IOError):
+            prefetcher.get("/bad")
+        # Listed by the caller before it was fetched ahead
+        assert prefetcher.get("/f") == ["/f"]
+        assert prefetcher.get("/c") == ["/c"]
+        time.sleep(0.1)
+        assert prefetcher._inflight == 0
+        assert len(prefetcher._results) == 2
+        prefetcher.close()
+        assert not prefetcher._results and not prefetcher._queued
+        # A scan stopped early closes its prefetcher
+        scan = self.whdfs.scan_dir("/data", workers=2, max_results=3)
+        assert sum(len(dirs) + len(files) for root, dirs, files in scan) == 3
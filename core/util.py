@@ -3,8 +3,11 @@ try:
 except ImportError:
     from urllib.parse import urlencode
 
-from fnmatch import fnmatch
+from fnmatch import fnmatch, translate
+import os
 import re
+import threading
+import time
 
 def convert_to_dict(args=None):
     if args:
@@ -27,6 +30,47 @@ def glob_search(text, pattern=None):
     return fnmatch( text, pattern )
 
 
+def compile_regex_search(pattern=None):
+    """ Returns a function of text equivalent to regex_search with the
+        pattern compiled once """
+    return re.compile(pattern or ".*").search
+
+
+def compile_glob_search(pattern=None):
+    """ Returns a function of text equivalent to glob_search with the
+        pattern translated and compiled once """
+    match = re.compile(translate(os.path.normcase(pattern or "*"))).match
+    if os.path.normcase("A") == "A":
+        return match
+    return lambda text: match(os.path.normcase(text))
+
+
+def glob_literal_prefix(pattern=None):
+    """ Returns the text every string matched by the glob pattern starts with """
+    return re.split(r"[*?[]", pattern or "", 1)[0]
+
+
+def regex_literal_prefix(pattern=None):
+    """ Returns the text every string searched by the regex pattern starts
+        with. This is empty unless the pattern is anchored with ^ """
+    pattern = pattern or ""
+    if not pattern.startswith("^") or "|" in pattern:
+        return ""
+    prefix = re.split(r"[.^$*+?{}\[\]\\|()]", pattern[1:], 1)[0]
+    if prefix and pattern[1 + len(prefix):][:1] in ("?", "*", "{"):
+        # The last character is optional or repeated
+        prefix = prefix[:-1]
+    return prefix
+
+
+# Search expressions use these to precompile their patterns and to prune
+# directory scans on path patterns
+regex_search.compile = compile_regex_search
+glob_search.compile = compile_glob_search
+regex_search.literal_prefix = regex_literal_prefix
+glob_search.literal_prefix = glob_literal_prefix
+
+
 class ReadOnlyClass( type ):
     def __setattr__(cls, name, value):
         raise AttributeError( 'Cannot set class attribute.' )
@@ -38,10 +82,11 @@ def timer(func):
         ___start___ = time.time( )
         print("The function is {0}".format( func.__name__ ))
         print("The start time is {0}".format( time.ctime( int( ___start___ ) ) ))
-        func( *args, **kwargs )
+        result = func( *args, **kwargs )
         ___end___ = time.time( )
         print("The end time is {0}".format( time.ctime( int( ___end___ ) ) ))
         print("Total time taken is {0}".format( ___end___ - ___start___ ))
+        return result
 
     return outfunc
 
@@ -49,4 +94,140 @@ def timer(func):
 def merge_dict(dict1, dict2):
     """ Merges 2 dictionaries. If there are common keys in both,
         the value in the second dictionary will have precedence"""
-    return dict( (key, value) for (key, value) in (dict1.items( ) + dict2.items( )) )
+    merged = dict( dict1 )
+    merged.update( dict2 )
+    return merged
+
+
+def iter_json_items(chunks, key, encoding="utf-8"):
+    """ Incrementally parses a json document and yields the elements of the
+        first array named key one at a time.
+        Only the element being decoded and the unread part of the current
+        chunk are held in memory, so large responses such as LISTSTATUS
+        or the yarn application list can be processed with a memory
+        footprint that does not grow with the response size.
+        Args:
+            chunks(iterable) : byte or text chunks of the document,
+                               for example response.iter_content()
+            key(str)         : member name of the array to stream. The first
+                               occurrence of "key" in the document is used.
+            encoding(str)    : encoding of byte chunks. Default utf-8.
+        Returns:
+            Generator of the decoded array elements. Nothing is yielded when
+            key is not present or its value is null.
+    """
+    import codecs
+    import json
+    decoder = json.JSONDecoder()
+    text_decoder = codecs.getincrementaldecoder(encoding)()
+    chunks = iter(chunks)
+    marker = '"' + key + '"'
+    state = {"buf": u"", "pos": 0}
+
+    def fill():
+        """ Appends the next chunk to the buffer. Returns False at the end. """
+        for chunk in chunks:
+            if isinstance(chunk, bytes):
+                chunk = text_decoder.decode(chunk)
+            if chunk:
+                buf, pos = state["buf"], state["pos"]
+                state["buf"], state["pos"] = buf[pos:] + chunk, 0
+                return True
+        return False
+
+    def next_char():
+        """ Skips white space and returns the next character or None at the end """
+        while True:
+            buf, pos = state["buf"], state["pos"]
+            while pos < len(buf) and buf[pos] in " \t\r\n":
+                pos += 1
+            state["pos"] = pos
+            if pos < len(buf):
+                return buf[pos]
+            if not fill():
+                return None
+
+    # Locate the member name followed by a colon.
+    while True:
+        idx = state["buf"].find(marker, state["pos"])
+        if idx >= 0:
+            state["pos"] = idx + len(marker)
+            if next_char() == ":":
+                state["pos"] += 1
+                break
+            continue
+        state["pos"] = max(state["pos"], len(state["buf"]) - len(marker))
+        if not fill():
+            return
+
+    if next_char() != "[":
+        return
+    state["pos"] += 1
+
+    while True:
+        char = next_char()
+        if char is None:
+            raise ValueError("Unexpected end of json document in array {0}".format(key))
+        if char == "]":
+            return
+        if char == ",":
+            state["pos"] += 1
+            continue
+        while True:
+            try:
+                item, end = decoder.raw_decode(state["buf"], state["pos"])
+                break
+            except ValueError:
+                # The element continues in the next chunk.
+                if not fill():
+                    raise
+        state["pos"] = end
+        yield item
+
+
+class TokenBucket(object):
+    """
+    Thread safe token bucket rate limiter.
+
+    Attributes:
+        rate(float)     : Tokens added per second.
+        capacity(float) : Maximum tokens held, the largest burst allowed.
+                          Default rate, or 1 if rate is below 1.
+    """
+
+    def __init__(self, rate, capacity=None):
+        if rate <= 0:
+            raise ValueError("Token bucket rate should be positive")
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else max(rate, 1))
+        self._tokens = self.capacity
+        self._updated = time.time()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self._tokens = min(self.capacity,
+                           self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_acquire(self, tokens=1):
+        """ Takes tokens if available and returns True, otherwise returns False """
+        with self._lock:
+            self._refill(time.time())
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return True
+            return False
+
+    def acquire(self, tokens=1):
+        """ Blocks until tokens are available and takes them. Returns the seconds waited """
+        waited = 0.0
+        while True:
+            with self._lock:
+                self._refill(time.time())
+                # Requests above capacity run on a full bucket and leave a debt
+                if self._tokens >= min(tokens, self.capacity):
+                    self._tokens -= tokens
+                    return waited
+                delay = (min(tokens, self.capacity) - self._tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
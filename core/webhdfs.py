@@ -1,17 +1,38 @@
 # import requests
 # from requests.exceptions import HTTPError
 import requests
-from request import Request
-from request import url_join
+from request import Request, RetryPolicy, Transport
+from request import url_join, url_quote, url_operation
 from errors import HTTPError, RequestError, MissingArgumentError, IllegalArgumentError
 import os
+import posixpath
+import re
+import sys
 import time
+import calendar
 import getpass
+import heapq
 import operator
 import json
-from util import regex_search, glob_search, merge_dict
+import mmap
+import threading
+import six
+from six.moves import queue
+from collections import deque
+from multiprocessing.pool import ThreadPool
+from util import regex_search, glob_search, merge_dict, iter_json_items
+from util import TokenBucket
 from search import SearchKeys, SearchOperators, SearchLogicalOperators
 from search import SearchExpression, SearchExpressionList
+from cache import StatusCache
+from columns import StatusColumns
+
+
+_QUERY_NUMBER = re.compile(r"^(\d+(?:\.\d*)?)([a-zA-Z]*)$")
+_QUERY_DATE = re.compile(r"^(\d{4})-(\d{2})-(\d{2})$")
+_QUERY_SIZE_UNITS = {"": 1, "k": 1 << 10, "m": 1 << 20, "g": 1 << 30,
+                     "t": 1 << 40, "p": 1 << 50}
+_QUERY_AGE_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400, "w": 604800}
 
 
 class WhdfsSearchKeys(SearchKeys):
@@ -29,6 +50,8 @@ class WhdfsSearchKeys(SearchKeys):
     COUNT_QUOTA_KEY = "count_quota"
     RAW_SIZE_KEY = "raw_length"
     SPACE_QUOTA_KEY = "space_quota"
+    FULL_PATH_KEY = "full_path"
+    BLOCK_SIZE_KEY = "block_size"
     SEARCH_KEY_DICT = {DIR_COUNT_KEY: "directoryCount",
                        FILE_COUNT_KEY: "fileCount",
                        COUNT_QUOTA_KEY: "quota",
@@ -39,7 +62,15 @@ class WhdfsSearchKeys(SearchKeys):
                        OWNER_KEY: "owner",
                        REPL_KEY: "replication",
                        TYPE_KEY: "type",
-                       SIZE_KEY: "length"}
+                       SIZE_KEY: "length",
+                       FULL_PATH_KEY: "fullPath",
+                       BLOCK_SIZE_KEY: "blockSize"}
+    # Additional names of search keys in textual queries
+    QUERY_ALIAS_DICT = {"size": SIZE_KEY,
+                        "path": FULL_PATH_KEY,
+                        "repl": REPL_KEY}
+    # Search keys whose query values may carry a size unit such as 1GB
+    QUERY_SIZE_KEYS = (SIZE_KEY, RAW_SIZE_KEY, SPACE_QUOTA_KEY, BLOCK_SIZE_KEY)
 
 
 class WhdfsSearchOperators(SearchOperators):
@@ -51,6 +82,7 @@ class WhdfsSearchOperators(SearchOperators):
                  '>=': operator.ge,
                  '<=': operator.le,
                  '=': operator.eq,
+                 '!=': operator.ne,
                  'regex': regex_search,
                  'glob': glob_search}
 
@@ -83,10 +115,245 @@ class WhdfsSearchExpressionList(SearchExpressionList):
                                The list can contain
                                1) Curved braces
                                2) Search Expression of type SearchExpression or its derivative
-                               3) Logical Operator with string value "and" or "or"
+                               3) Logical Operator with string value "and", "or" or "not"
         """
         super(WhdfsSearchExpressionList, self).add_expression(expression)
-        pass
+
+    def query_expression(self, key, oper, val):
+        """
+        Returns the WhdfsSearchExpression for a comparison of a textual query.
+        Keys are the WhdfsSearchKeys values or the aliases size, path and repl.
+        Operators are >, <, >=, <=, = (or ==), !=, ~ (or regex) and glob.
+        Size values take the units K, M, G, T and P (powers of 1024) with an
+        optional B, for example 1GB. Times are modification times in
+        milliseconds, dates as YYYY-MM-DD (UTC) or an age with one of the
+        units s, m, h, d and w, in which case the comparison is on the age:
+        mtime < 30d matches objects modified within the last 30 days.
+        """
+        key = WhdfsSearchKeys.QUERY_ALIAS_DICT.get(key.lower(), key.lower())
+        oper = {"==": "=", "~": "regex"}.get(oper.lower(), oper.lower())
+        if key not in WhdfsSearchKeys.SEARCH_KEY_DICT:
+            raise ValueError("Invalid query key {0}".format(key))
+        if oper in ("regex", "glob"):
+            return WhdfsSearchExpression(key, oper, val)
+
+        numeric = _QUERY_NUMBER.match(val)
+        if key == WhdfsSearchKeys.MTIME_KEY:
+            date = _QUERY_DATE.match(val)
+            if date:
+                val = calendar.timegm(tuple(int(x) for x in date.groups()) +
+                                      (0, 0, 0)) * 1000
+            elif numeric and numeric.group(2):
+                unit = numeric.group(2).lower()
+                if unit not in _QUERY_AGE_UNITS:
+                    raise ValueError("Invalid age unit in {0}".format(val))
+                # An age bound is the opposite bound on the modification time
+                age = float(numeric.group(1)) * _QUERY_AGE_UNITS[unit]
+                val = int((time.time() - age) * 1000)
+                oper = {">": "<", "<": ">", ">=": "<=", "<=": ">="}.get(oper, oper)
+            elif numeric:
+                val = int(numeric.group(1))
+        elif key in WhdfsSearchKeys.QUERY_SIZE_KEYS and numeric:
+            unit = numeric.group(2).lower().rstrip("b")
+            if unit not in _QUERY_SIZE_UNITS:
+                raise ValueError("Invalid size unit in {0}".format(val))
+            val = int(float(numeric.group(1)) * _QUERY_SIZE_UNITS[unit])
+        elif numeric and not numeric.group(2) and \
+                key not in (WhdfsSearchKeys.PATH_KEY, WhdfsSearchKeys.FULL_PATH_KEY,
+                            WhdfsSearchKeys.OWNER_KEY, WhdfsSearchKeys.TYPE_KEY):
+            val = float(numeric.group(1)) if "." in val else int(numeric.group(1))
+        return WhdfsSearchExpression(key, oper, val)
+
+    @classmethod
+    def from_query(cls, query, search_exp_list=None):
+        """
+        Returns a new expression list for a textual query. Tokens of
+        search_exp_list, if given, are copied and combined with the query
+        using "and".
+        Example:
+            WhdfsSearchExpressionList.from_query(
+                "size > 1GB and mtime < 30d and name ~ '\\.orc$'")
+        """
+        exp_list = cls()
+        for token in (search_exp_list.expr_list if search_exp_list else []):
+            exp_list.add(token)
+        exp_list.add_query(query)
+        return exp_list
+
+
+# Operations of Webhdfs.bulk and the methods running them
+_BULK_OPERATIONS = {"delete": "delete",
+                    "rename": "rename",
+                    "chmod": "change_perm",
+                    "change_perm": "change_perm",
+                    "chown": "change_owner",
+                    "change_owner": "change_owner",
+                    "mkdir": "make_dirs",
+                    "make_dirs": "make_dirs"}
+
+# Files smaller than this are counted as small files
+_SMALL_FILE_SIZE = 128 << 20
+
+# File length as a fraction of its block size reported by find_small_files
+_SIZE_DISTRIBUTION = ((0.01, "<1%"), (0.1, "1-10%"), (0.5, "10-50%"),
+                      (1.0, "50-100%"))
+_SIZE_DISTRIBUTION_FULL = ">=100%"
+
+# Totals reported by disk_usage
+_USAGE_KEYS = ("length", "spaceConsumed", "fileCount", "smallFileCount",
+               "directoryCount")
+
+# Status fields compared by scan_changes to report modified objects
+_CHANGE_KEYS = ("length", "modificationTime", "owner", "group", "permission",
+                "replication")
+
+
+class _ScanPrefetcher(object):
+    """
+    Lists directories ahead of a depth first scan on a thread pool.
+    Paths hinted by the scan are kept on a stack so the directories that
+    will be visited next are submitted first. At most workers * 2 listings
+    run at a time and at most max_buffered completed listings are held
+    before they are consumed. Directories that were not fetched ahead are
+    listed by the calling thread. Listings never requested, because the
+    scan was closed early, are dropped by close.
+    """
+
+    def __init__(self, list_func, workers, max_buffered=None):
+        self._list_func = list_func
+        self._pool = ThreadPool(workers)
+        self._max_inflight = workers * 2
+        self._max_buffered = max_buffered or workers * 64
+        self._lock = threading.Lock()
+        self._inflight = 0
+        self._results = {}
+        self._queued = []
+        self._pending = set()
+
+    def _fetch(self, path):
+        # Failed listings do not reach the callback, so errors are returned
+        try:
+            return self._list_func(path), None
+        except Exception:
+            return None, sys.exc_info()
+
+    def _done(self, result):
+        with self._lock:
+            self._inflight -= 1
+
+    def _fill(self):
+        while self._queued and len(self._results) < self._max_buffered:
+            path = self._queued.pop()
+            if path not in self._pending:
+                # Already listed by get
+                continue
+            with self._lock:
+                if self._inflight >= self._max_inflight:
+                    self._queued.append(path)
+                    return
+                self._inflight += 1
+            self._pending.discard(path)
+            self._results[path] = self._pool.apply_async(self._fetch, (path,),
+                                                         callback=self._done)
+
+    def hint(self, paths):
+        """ Queues paths for listing, given in the order they will be visited """
+        self._queued.extend(reversed(paths))
+        self._pending.update(paths)
+        self._fill()
+
+    def get(self, path):
+        """ Returns the listing of path, waiting for it if it was fetched ahead """
+        result = self._results.pop(path, None)
+        if result is None:
+            self._pending.discard(path)
+            olist = self._list_func(path)
+        else:
+            olist, error = result.get()
+            if error:
+                six.reraise(*error)
+        self._fill()
+        return olist
+
+    def close(self):
+        """ Stops the listings in flight and drops the ones not consumed """
+        self._pool.terminate()
+        self._queued = []
+        self._pending.clear()
+        self._results.clear()
+
+
+class _RangeDownload(object):
+    """
+    State of a download of a hdfs file split into byte ranges.
+    Ranges are written into a preallocated part file next to the target
+    and the offset reached in each range is saved in a progress file so
+    that an interrupted download can be resumed. The part file is renamed
+    to the target once every range is complete.
+    """
+
+    def __init__(self, srcfile, target, status, split_size=None, resume=True):
+        self.srcfile = srcfile
+        self.target = target
+        self.part = target + ".part"
+        self.progress = target + ".part.progress"
+        self.length = int(status["length"])
+        self.mtime = status.get("modificationTime")
+        self.error = None
+        self._lock = threading.Lock()
+        self.ranges = self._load() if resume else None
+        if self.ranges is None:
+            self._create(split_size)
+
+    def _load(self):
+        """ Returns the ranges of a previous download of the same file version """
+        try:
+            with open(self.progress) as f:
+                state = json.load(f)
+            if state["length"] != self.length or state["mtime"] != self.mtime or \
+                    os.path.getsize(self.part) != self.length:
+                return None
+            return [list(x) for x in state["ranges"]]
+        except (IOError, OSError, ValueError, KeyError, TypeError):
+            return None
+
+    def _create(self, split_size):
+        # An empty file has no ranges
+        split_size = max(1, split_size or self.length)
+        # Each range is [start, end, offset reached]
+        self.ranges = [[x, min(x + split_size, self.length), x]
+                       for x in range(0, self.length, split_size)]
+        with open(self.part, "wb") as f:
+            f.truncate(self.length)
+        self.save()
+
+    def pending(self):
+        """ Returns the indexes of the ranges that are not complete """
+        return [i for i, x in enumerate(self.ranges) if x[2] < x[1]]
+
+    def advance(self, index, nbytes):
+        with self._lock:
+            self.ranges[index][2] += nbytes
+
+    def save(self):
+        with self._lock:
+            with open(self.progress, "w") as f:
+                json.dump({"length": self.length, "mtime": self.mtime,
+                           "ranges": self.ranges}, f)
+
+    def finish(self):
+        """ Checks the size of the part file and moves it to the target """
+        targetsize = os.path.getsize(self.part)
+        if self.pending() or targetsize != self.length:
+            raise IOError("source size for file {0} is {1} "
+                          .format(self.srcfile, self.length) +
+                          "target size for file {0} is {1}\n"
+                          .format(self.target, targetsize) +
+                          "File sizes differ. Download failed.")
+        if os.path.exists(self.target):
+            os.remove(self.target)
+        os.rename(self.part, self.target)
+        os.remove(self.progress)
 
 
 class Webhdfs(object):
@@ -94,7 +361,8 @@ class Webhdfs(object):
     """
 
     def __init__(self, host=None, port=50070, url=None, protocol="http",
-                 url_ext="webhdfs/v1", user=None):
+                 url_ext="webhdfs/v1", user=None, cache_size=0, cache_ttl=30,
+                 retry_policy=None):
         """ Initialization for class object.
             Args:
                 protocol(str) : The  protocol to be used to connect to webhdfs.
@@ -106,6 +374,14 @@ class Webhdfs(object):
                                 The connection attempt will be made in order from left to right.
                 port          : The port on which webhdfs is listening.
                 url           : Url which is a combination of protocol, host and port
+                cache_size    : Number of path statuses kept in the status cache.
+                                Default 0 disables the cache.
+                cache_ttl     : Seconds a cached path status is used. Default 30.
+                retry_policy  : RetryPolicy of requests to the namenode. Requests
+                                refused by a standby namenode or to a host that
+                                cannot be reached fail over to the next HA host.
+                                Default RetryPolicy(). RetryPolicy(max_attempts=1)
+                                disables retries.
         """
         if (not host or not port) and not url:
             raise MissingArgumentError("Either url or a combination of host and port " +
@@ -120,8 +396,13 @@ class Webhdfs(object):
         self.url_ext = url_ext
         self.user = user or getpass.getuser()
         self.response_timeout = 20
+        self._batch_listing = None
+        self._status_cache = StatusCache(cache_size, cache_ttl) if cache_size else None
+        # Hosts are probed without retries, the transport is set up after
+        self.transport = None
 
         hosts = host
+        base_urls = []
         if url:
             self.base_url = url
             try:
@@ -133,6 +414,7 @@ class Webhdfs(object):
             if isinstance(hosts, str):
                 hosts = [x.strip() for x in hosts.split(",")]
             nnstatus = False
+            base_urls = [protocol + "://" + x + ":" + str(port) for x in hosts]
             for host in hosts:
                 self.base_url = protocol + "://" + host + ":" + str(port)
                 try:
@@ -145,6 +427,18 @@ class Webhdfs(object):
             if nnstatus is False:
                 raise RequestError("Cannot connect to webhdfs service at {0}"
                                    .format(self._get_path_url(path="/")))
+        self.transport = Transport(base_urls or [self.base_url], retry_policy,
+                                   active=self.base_url)
+
+    def _request(self, url, method=None, **kwargs):
+        """
+        Helper method
+        Submits a request to the namenode through the transport, which
+        retries and fails over between HA hosts.
+        """
+        if self.transport is None:
+            return Request.url_request(url, method=method, **kwargs)
+        return self.transport.request(url, method=method, **kwargs)
 
     def _get_path_url(self, path):
         """
@@ -208,7 +502,7 @@ class Webhdfs(object):
 
         err_msg = ""
         try:
-            response = Request.url_request(url, method=method, data=data, timeout=self.response_timeout)
+            response = self._request(url, method=method, data=data, timeout=self.response_timeout)
             json_response = response.json()
             if "RemoteException" in json_response:
                 err_msg = json_response['RemoteException']['message']
@@ -231,6 +525,45 @@ class Webhdfs(object):
             else:
                 return {}
 
+    def url_json_iter(self, url, key, method=None, data=None,
+                      ignore_error=False):
+        """
+        Submit a url request to webhdfs and parse the json response
+        incrementally from the response stream.
+        Parameters
+        ---------------
+        url    : Entire url
+        key    : Name of the json array whose elements are produced,
+                 for example FileStatus for LISTSTATUS.
+        method : None, PUT, POST, DELETE or GET
+        data : Any payload that needs to be passed
+        ignore_error  : Ignores webhdfs remote exceptions and produce nothing
+
+        Returns
+        ---------
+        Generator of the elements of the array as dictionaries
+        """
+        if not url:
+            raise MissingArgumentError("URL not provided")
+
+        response = self._request(url, method=method, data=data,
+                                 timeout=self.response_timeout, stream=True)
+        try:
+            if response.status_code != 200:
+                err_msg = response.text
+                try:
+                    err_msg = response.json()['RemoteException']['message']
+                except (ValueError, KeyError, TypeError):
+                    pass
+                if not ignore_error:
+                    raise IOError("Error Reported in url request call \n{0}\n"
+                                  .format(err_msg))
+                return
+            for item in iter_json_items(response.iter_content(chunk_size=65536), key):
+                yield item
+        finally:
+            response.close()
+
     def is_exists(self, path):
         """
         Checks if hdfs path exists.
@@ -359,13 +692,59 @@ class Webhdfs(object):
         if not path:
             raise MissingArgumentError("Path not provided")
 
+        if self._status_cache is not None:
+            json_fileinfo = self._status_cache.get(path)
+            if json_fileinfo is not None:
+                return dict(json_fileinfo)
+
         list_dir_op = "GETFILESTATUS"
         url = self._get_op_url(self._get_path_url(path), list_dir_op)
         json_fileinfo = self.url_json_request(url, ignore_error=ignore_error)
         if "FileStatus" in json_fileinfo:
             json_fileinfo = json_fileinfo["FileStatus"]
+            if self._status_cache is not None:
+                self._status_cache.put(path, dict(json_fileinfo))
         return json_fileinfo
 
+    def _cache_listing(self, path, statuses):
+        """
+        Helper method
+        Returns the statuses of a listing of path, storing them in the
+        status cache as they are read when the cache is enabled.
+        """
+        if self._status_cache is None:
+            return statuses
+        return self._status_cache.put_listing(
+            path, statuses, WhdfsSearchKeys.get_value(WhdfsSearchKeys.PATH_KEY))
+
+    def _invalidate_status(self, path, recursive=False):
+        """
+        Helper method
+        Removes path and its parent directory, whose modification time
+        and children change with it, from the status cache.
+        """
+        if self._status_cache is not None and path:
+            self._status_cache.invalidate(path, recursive=recursive)
+            self._status_cache.invalidate(posixpath.dirname(StatusCache.key(path)))
+
+    def cache_stats(self):
+        """
+        Returns hit rate statistics of the status cache as a dictionary
+            {
+                "size": N, "hits": N, "misses": N, "hit_rate": F,
+                "evictions": N, "expirations": N, "invalidations": N
+            }
+        or None if the cache is disabled.
+        """
+        if self._status_cache is None:
+            return None
+        return self._status_cache.stats()
+
+    def clear_cache(self):
+        """ Removes all entries from the status cache """
+        if self._status_cache is not None:
+            self._status_cache.clear()
+
     def get_content_summary(self, path, ignore_error=False):
         """
         Get path information
@@ -409,6 +788,7 @@ class Webhdfs(object):
         url = self._get_op_url(self._get_path_url(path), list_dir_op)
 
         self.url_json_request(url, method="put")
+        self._invalidate_status(path)
 
     def make_dir(self, path, permission=None):
         """
@@ -439,6 +819,7 @@ class Webhdfs(object):
 
         url = self._get_op_url(self._get_path_url(path), make_dir_op)
         self.url_json_request(url, method="PUT")
+        self._invalidate_status(path)
 
     def create_symlink(self, path, destination, create_parent=False):
         """
@@ -459,7 +840,8 @@ class Webhdfs(object):
         if create_parent:
             create_sym_op += "&createParent=true"
         url = self._get_op_url(self._get_path_url(path), create_sym_op)
-        Request.url_request(url, method="PUT")
+        self._request(url, method="PUT")
+        self._invalidate_status(path)
 
     def delete(self, path, recursive=False):
         """
@@ -468,13 +850,17 @@ class Webhdfs(object):
             path(str)         : Path on HDFS to rename
             recursive(Bool)   : If True will recursively delete. Default False
 
+        Returns:
+            True if the path was deleted, False if it did not exist
         """
         if not path:
             raise MissingArgumentError("Path not provided")
         delete_op = "DELETE&recursive=" + str(recursive).lower()
 
         url = self._get_op_url(self._get_path_url(path), delete_op)
-        self.url_json_request(url, method="DELETE")
+        response = self.url_json_request(url, method="DELETE")
+        self._invalidate_status(path, recursive=True)
+        return bool(response.get("boolean"))
 
     def rename(self, path, newpath):
         """
@@ -482,6 +868,10 @@ class Webhdfs(object):
         Args:
             path(str)         : Path on HDFS to rename
             newpath(str)      : Rename Path
+
+        Returns:
+            True if the path was renamed, False if the namenode refused it,
+            for example when path does not exist
         """
 
         if not path:
@@ -491,7 +881,25 @@ class Webhdfs(object):
 
         rename_op = "RENAME&destination=" + newpath
         url = self._get_op_url(self._get_path_url(path), rename_op)
-        self.url_json_request(url, method="PUT")
+        response = self.url_json_request(url, method="PUT")
+        self._invalidate_status(path, recursive=True)
+        self._invalidate_status(newpath, recursive=True)
+        return bool(response.get("boolean"))
+
+    def _metadata_request(self, url, method=None):
+        """
+        Helper method
+        Submits a request whose successful response has no body, such as
+        SETOWNER or SETPERMISSION, and raises IOError if it failed.
+        """
+        response = self._request(url, method=method,
+                                 timeout=self.response_timeout)
+        try:
+            self._check_transfer(response)
+        except HTTPError as e:
+            raise IOError("Error Reported in url request call \n{0}\n"
+                          .format(str(e) or response.status_code))
+        return response
 
     def change_owner(self, path, owner=None, group=None):
         """
@@ -509,7 +917,8 @@ class Webhdfs(object):
         if group:
             change_owner_op += "&group=" + group
         url = self._get_op_url(self._get_path_url(path), change_owner_op)
-        Request.url_request(url, method="PUT")
+        self._metadata_request(url, method="PUT")
+        self._invalidate_status(path)
 
     def change_perm(self, path, permission):
         """
@@ -524,20 +933,164 @@ class Webhdfs(object):
             raise MissingArgumentError("Permission")
         change_perm_op = "SETPERMISSION&permission=" + str(permission)
         url = self._get_op_url(self._get_path_url(path), change_perm_op)
-        Request.url_request(url, method="PUT")
+        self._metadata_request(url, method="PUT")
+        self._invalidate_status(path)
+
+    def _bulk_items(self, ops, op=None, op_args=None):
+        """
+        Helper method
+        Yields the (operation, path, arguments) of each entry of ops, which
+        may be operation dictionaries, paths or scan_dir results.
+        """
+        op_args = op_args or {}
+        for item in ops:
+            if isinstance(item, dict):
+                args = dict(item)
+                path = args.pop("path", None)
+                if "op" in args:
+                    name = args.pop("op")
+                else:
+                    # Entries for op also take the common arguments
+                    name = op
+                    for key, value in op_args.items():
+                        args.setdefault(key, value)
+                yield name, path, args
+            elif isinstance(item, six.string_types):
+                yield op, item, op_args
+            elif isinstance(item, tuple) and len(item) == 3:
+                # scan_dir result, files first as recursive operations on a
+                # directory also affect its content
+                root, dirs, files = item
+                for x in list(files) + list(dirs):
+                    yield op, self._scan_child_path(root, x), op_args
+            else:
+                raise IllegalArgumentError("Invalid bulk operation {0}".format(item))
+
+    def iter_bulk(self, ops, op=None, workers=4, rate=None, ignore_error=True,
+                  **op_args):
+        """
+        Runs a stream of metadata operations on a bounded thread pool and
+        yields their results as they complete. Only twice workers
+        operations are read from ops ahead of their completion, so ops can
+        be a large generator such as a scan.
+
+        Args:
+            ops             : Iterable of operations, each one either
+                                a dictionary {"op": operation, "path": path,
+                                argument: value}, a path for operation op,
+                                or a scan_dir result (root, dirs, files)
+                                applying op to every directory and file.
+            op(str)         : Operation of entries that do not name one:
+                                "delete", "rename", "chmod", "chown" or
+                                "mkdir", or the Webhdfs method names
+                                "change_perm", "change_owner", "make_dirs".
+            workers(int)    : Number of concurrent requests. Default 4.
+            rate(float)     : Maximum operations started per second.
+                                Default None is not limited.
+            ignore_error(bool): Default True. Failures are yielded and the
+                                other operations still run. If False the
+                                first failure is raised.
+            op_args         : Arguments of the operations run for op, for
+                                example permission="750" or recursive=True.
+
+        Returns:
+            Generator of dictionaries {"op": operation, "path": path,
+            "result": value returned, "error": None or error message}.
+            delete and rename returning False count as errors.
+        """
+        bucket = TokenBucket(rate) if rate else None
+        workers = max(workers or 1, 1)
+
+        def run(name, path, args):
+            result, error = None, None
+            try:
+                if bucket:
+                    bucket.acquire()
+                method = _BULK_OPERATIONS.get(name)
+                if method is None:
+                    raise IllegalArgumentError("Invalid bulk operation {0}".format(name))
+                result = getattr(self, method)(path, **args)
+                if result is False:
+                    error = "{0} of {1} returned false".format(name, path)
+            except Exception as e:
+                error = str(e) or e.__class__.__name__
+            return {"op": name, "path": path, "result": result, "error": error}
+
+        items = self._bulk_items(ops, op, op_args)
+        pool = ThreadPool(workers)
+        done = queue.Queue()
+        inflight = 0
+        exhausted = False
+        try:
+            while not exhausted or inflight:
+                while not exhausted and inflight < workers * 2:
+                    try:
+                        item = next(items)
+                    except StopIteration:
+                        exhausted = True
+                        break
+                    pool.apply_async(Request.propagate(run), item, callback=done.put)
+                    inflight += 1
+                if not inflight:
+                    break
+                result = done.get()
+                inflight -= 1
+                if result["error"] is not None and not ignore_error:
+                    raise IOError("Bulk {0} of {1} failed: {2}".format(
+                        result["op"], result["path"], result["error"]))
+                yield result
+        finally:
+            pool.terminate()
+
+    def bulk(self, ops, op=None, workers=4, rate=None, ignore_error=True,
+             **op_args):
+        """
+        Runs a stream of metadata operations like iter_bulk and returns a
+        report.
+
+        Returns:
+            Dictionary
+            {
+                "total": operations run,
+                "succeeded": operations without error,
+                "failed": [result of each failed operation],
+                "results": [result of every operation]
+            }
+
+        Example:
+            # Restrict everything not modified for a year
+            report = whdfs.bulk(whdfs.scan_dir("/data", query="mtime > 365d"),
+                                op="chmod", permission="700", rate=200)
+            for failure in report["failed"]:
+                print(failure["path"], failure["error"])
+            whdfs.bulk([{"op": "rename", "path": "/tmp/a", "newpath": "/tmp/b"},
+                        {"op": "delete", "path": "/tmp/c", "recursive": True}])
+        """
+        report = {"total": 0, "succeeded": 0, "failed": [], "results": []}
+        for result in self.iter_bulk(ops, op, workers, rate, ignore_error, **op_args):
+            report["total"] += 1
+            report["results"].append(result)
+            if result["error"] is None:
+                report["succeeded"] += 1
+            else:
+                report["failed"].append(result)
+        return report
 
     def _build_extended_info(self, dir_count=0, file_count=0, count_quota=-1,
-                             space_quota=-1, raw_size=0):
-        return \
+                             space_quota=-1, raw_size=0, length=None):
+        ext_info = \
             {WhdfsSearchKeys.get_value(WhdfsSearchKeys.DIR_COUNT_KEY): dir_count,
              WhdfsSearchKeys.get_value(WhdfsSearchKeys.FILE_COUNT_KEY): file_count,
              WhdfsSearchKeys.get_value(WhdfsSearchKeys.COUNT_QUOTA_KEY): count_quota,
              WhdfsSearchKeys.get_value(WhdfsSearchKeys.SPACE_QUOTA_KEY): space_quota,
              WhdfsSearchKeys.get_value(WhdfsSearchKeys.RAW_SIZE_KEY): raw_size}
+        if length is not None:
+            ext_info[WhdfsSearchKeys.get_value(WhdfsSearchKeys.SIZE_KEY)] = length
+        return ext_info
 
     def _list_dir_info(self, path=None, otype="all", key=None,
                        ignore_error=False, search_exp_list=None,
-                       ext_status=False):
+                       ext_status=False, stream=False):
 
         """ Helper function to list directory information
         type == "all" will list all contents
@@ -548,14 +1101,28 @@ class Webhdfs(object):
         ignore_error : Ignores url errors which includes errors reported
                     from wbhdfs
         search_exp_list(WhdfsSearchExpressionList) : Search expression list.
+        stream : Parse the response incrementally so that the json tree of
+                 the whole listing is never built. The matching entries are
+                 still collected in the returned list.
         """
         list_dir_op = "LISTSTATUS"
         url = self._get_op_url(self._get_path_url(path), list_dir_op)
         tmap = {"file": "FILE", "dir": "DIRECTORY", "symlink": "SYMLINK"}
 
         try:
-            json_dirlist = \
-                self.url_json_request(url, ignore_error=ignore_error)
+            if stream:
+                # Same shape as the buffered response with the status list
+                # replaced by a generator over the response stream.
+                json_dirlist = {'FileStatuses': {'FileStatus':
+                                self.url_json_iter(url, "FileStatus",
+                                                   ignore_error=ignore_error)}}
+            else:
+                json_dirlist = \
+                    self.url_json_request(url, ignore_error=ignore_error)
+
+            if json_dirlist and "FileStatuses" in json_dirlist:
+                json_dirlist['FileStatuses']['FileStatus'] = \
+                    self._cache_listing(path, json_dirlist['FileStatuses']['FileStatus'])
 
             if not json_dirlist or "RemoteException" in json_dirlist:
                 if not ignore_error:
@@ -590,9 +1157,10 @@ class Webhdfs(object):
                             outlist.append(self._list_attribute(ext_x, key))
                     return outlist
                 else:
-                    return [self._list_attribute(x, key) for x in
-                            json_dirlist['FileStatuses']['FileStatus']
-                            if not search_exp_list or search_exp_list.match(x)]
+                    statuses = json_dirlist['FileStatuses']['FileStatus']
+                    if search_exp_list:
+                        statuses = search_exp_list.filter(statuses)
+                    return [self._list_attribute(x, key) for x in statuses]
             else:
                 type_key = WhdfsSearchKeys.get_value(WhdfsSearchKeys.TYPE_KEY)
                 path_key = WhdfsSearchKeys.get_value(WhdfsSearchKeys.PATH_KEY)
@@ -629,7 +1197,7 @@ class Webhdfs(object):
                 raise
 
     def list_dir(self, path=None, otype="all", pattern=None,
-                 pattern_type="glob", ignore_error=False):
+                 pattern_type="glob", ignore_error=False, stream=False):
         """ List contents of directory
             Args:
             path(str)         : Full path to start the recursive listing
@@ -641,6 +1209,9 @@ class Webhdfs(object):
                                 based on pattern_type .
             pattern_type(str) : "glob" or "regex". Default glob.
             ext_status(bool)  : True means get extended statistics. Default False
+            stream(bool)      : Parse the listing incrementally instead of loading
+                                the whole json response. The matching names are
+                                still returned as one list. Default False.
 
             Returns:
                 List of files/directories names under path.
@@ -657,11 +1228,13 @@ class Webhdfs(object):
         return self._list_dir_info(path=path, otype=otype,
                                    key=WhdfsSearchKeys.PATH_KEY,
                                    ignore_error=ignore_error,
-                                   search_exp_list=search_exp_list)
+                                   search_exp_list=search_exp_list,
+                                   stream=stream)
 
     def long_list_dir(self, path=None, otype="all", pattern=None,
                       pattern_type="glob", ignore_error=False,
-                      ext_status=False):
+                      ext_status=False, stream=False, as_columns=False,
+                      columns=None):
         """ List contents of directory
 
         Args:
@@ -676,6 +1249,14 @@ class Webhdfs(object):
             ignore_error(bool) : Ignore any errors during search such as access issues.
             ext_status(bool)   : Produces extra status information namely content
                                  summary for directories.
+            stream(bool)       : Parse the listing incrementally instead of loading
+                                 the whole json response. The matching entries
+                                 are still returned as one list. Default False.
+            as_columns(bool)   : Return a StatusColumns instead of a list.
+                                 With stream the statuses are added to the
+                                 columns as they are parsed. Default False.
+            columns(tuple)     : (name, kind) of the columns when as_columns
+                                 is set. Default columns.DEFAULT_COLUMNS.
 
         Returns:
         List of dictionaries containing file/directory status information as
@@ -696,10 +1277,125 @@ class Webhdfs(object):
                                            pattern_type,
                                            pattern))
 
+        if as_columns:
+            if stream and not ext_status:
+                statuses = self._iter_dir_info(path=path, otype=otype, key="all",
+                                               ignore_error=ignore_error,
+                                               search_exp_list=search_exp_list)
+            else:
+                statuses = self._list_dir_info(path=path, otype=otype, key="all",
+                                               ignore_error=ignore_error,
+                                               search_exp_list=search_exp_list,
+                                               ext_status=ext_status, stream=stream)
+            return StatusColumns(columns).extend(statuses or [], path)
+
         return self._list_dir_info(path=path, otype=otype, key="all",
                                    ignore_error=ignore_error,
                                    search_exp_list=search_exp_list,
-                                   ext_status=ext_status)
+                                   ext_status=ext_status, stream=stream)
+
+    def _iter_dir_info(self, path=None, otype="all", key=None,
+                       ignore_error=False, search_exp_list=None):
+        """
+        Helper generator to list directory information page by page
+        with LISTSTATUS_BATCH. Each page is filtered as it arrives.
+        Falls back to a single streamed LISTSTATUS when the webhdfs service
+        does not support batched listings (hadoop earlier than 2.8).
+        Arguments are the same as for _list_dir_info.
+        """
+        if not path:
+            raise MissingArgumentError("Path not provided")
+
+        tmap = {"file": "FILE", "dir": "DIRECTORY", "symlink": "SYMLINK"}
+        type_key = WhdfsSearchKeys.get_value(WhdfsSearchKeys.TYPE_KEY)
+        path_key = WhdfsSearchKeys.get_value(WhdfsSearchKeys.PATH_KEY)
+
+        if self._batch_listing is not False:
+            start_after = None
+            while True:
+                list_dir_op = "LISTSTATUS_BATCH"
+                if start_after is not None:
+                    list_dir_op += "&startAfter=" + url_quote(start_after.encode("utf-8"))
+                url = self._get_op_url(self._get_path_url(path), list_dir_op)
+                try:
+                    json_page = self.url_json_request(url)
+                except IOError as e:
+                    if start_after is None and self._batch_listing is None and \
+                            "Operation not supported" in str(e):
+                        self._batch_listing = False
+                        break
+                    if not ignore_error:
+                        raise
+                    return
+                self._batch_listing = True
+                listing = json_page["DirectoryListing"]
+                statuses = listing["partialListing"]["FileStatuses"]["FileStatus"]
+                for x in self._cache_listing(path, statuses):
+                    if (otype == "all" or x[type_key] == tmap[otype]) and \
+                            (not search_exp_list or search_exp_list.match(x)):
+                        yield self._list_attribute(x, key)
+                if not statuses or not listing.get("remainingEntries"):
+                    return
+                start_after = statuses[-1][path_key]
+
+        for x in self._list_dir_info(path=path, otype=otype, key=key,
+                                     ignore_error=ignore_error,
+                                     search_exp_list=search_exp_list,
+                                     stream=True) or []:
+            yield x
+
+    def iter_dir(self, path=None, otype="all", pattern=None,
+                 pattern_type="glob", ignore_error=False, search_exp_list=None):
+        """ Generator over the names in a directory fetched in pages.
+            Large directories are listed with LISTSTATUS_BATCH so that names
+            are produced as each page arrives instead of after the whole
+            directory has been listed.
+
+            Args:
+            path(str)         : Full path of the directory
+            otype(str)        : Object type
+                                otype = "all" will list all contents
+                                otype = "file" will list only files
+                                otype = "dir" will list only dirs
+            pattern(str)      : Search for files/dirs of specific pattern
+                                based on pattern_type .
+            pattern_type(str) : "glob" or "regex". Default glob.
+            ignore_error(bool): Ignore any errors such as access issues.
+            search_exp_list(WhdfsSearchExpressionList) : Search expression list.
+
+            Returns:
+                Generator of files/directories names under path.
+        """
+        if pattern and not search_exp_list:
+            search_exp_list = \
+                WhdfsSearchExpressionList(WhdfsSearchExpression
+                                          (WhdfsSearchKeys.PATH_KEY,
+                                           pattern_type,
+                                           pattern))
+        return self._iter_dir_info(path=path, otype=otype,
+                                   key=WhdfsSearchKeys.PATH_KEY,
+                                   ignore_error=ignore_error,
+                                   search_exp_list=search_exp_list)
+
+    def iter_long_list_dir(self, path=None, otype="all", pattern=None,
+                           pattern_type="glob", ignore_error=False,
+                           search_exp_list=None):
+        """ Generator over the file status of the contents of a directory
+            fetched in pages with LISTSTATUS_BATCH.
+            Arguments are the same as for iter_dir.
+
+            Returns:
+                Generator of file status dictionaries as returned by long_list_dir.
+        """
+        if pattern and not search_exp_list:
+            search_exp_list = \
+                WhdfsSearchExpressionList(WhdfsSearchExpression
+                                          (WhdfsSearchKeys.PATH_KEY,
+                                           pattern_type,
+                                           pattern))
+        return self._iter_dir_info(path=path, otype=otype, key="all",
+                                   ignore_error=ignore_error,
+                                   search_exp_list=search_exp_list)
 
     def move(self, srcpath, tgtpath, pattern, pattern_type="glob"):
         """
@@ -731,6 +1427,7 @@ class Webhdfs(object):
         """
         Concatenates source files into target file.
         The source files will no longer exists are a successful merge
+        Raises IOError if the concatenation failed.
         Args:
             tgtfile(str)       : Target file
             srcfilelist(str)   : Source file/file list
@@ -744,70 +1441,369 @@ class Webhdfs(object):
         else:
             concat_op = "CONCAT&sources=" + srcfilelist
         url = self._get_op_url(self._get_path_url(tgtfile), concat_op)
-        Request.url_request(url, method="POST")
+        try:
+            self._metadata_request(url, method="POST")
+        finally:
+            self._invalidate_status(tgtfile)
+            for srcfile in (srcfilelist if isinstance(srcfilelist, list)
+                            else srcfilelist.split(",")):
+                self._invalidate_status(srcfile)
+
+    def _scan_listing(self, fullpath, ignore_error=True, ext_status=True):
+        """
+        Helper method
+        Returns the long listing of a directory visited by scan_dir,
+        extended with the content summary of each entry if ext_status is set.
+        """
+        with Request.span("scan_dir.list", path=fullpath):
+            return self.long_list_dir(path=fullpath, otype="all",
+                                      ignore_error=ignore_error,
+                                      ext_status=ext_status)
+
+    def _scan_split(self, olist, otype, tmap, search_exp_list=None, root=None):
+        """
+        Helper method
+        Splits a directory listing into the list of sub directories to recurse
+        into and the directory and file lists that scan_dir yields.
+        Statuses get their full path under root when search_exp_list
+        searches on it.
+        Returns dlist, outdlist, outflist
+        """
+        if not olist:
+            return [], [], []
+        type_key = WhdfsSearchKeys.get_value(WhdfsSearchKeys.TYPE_KEY)
+        full_path_key = WhdfsSearchKeys.get_value(WhdfsSearchKeys.FULL_PATH_KEY)
+        if root is not None and search_exp_list and \
+                full_path_key in search_exp_list.keys():
+            for x in olist:
+                x[full_path_key] = self._scan_child_path(root, x)
+        dlist = [x for x in olist if x[type_key] == tmap["dir"]]
+        if otype == "all" or otype == "file":
+            outflist = [x for x in olist if x[type_key] == tmap["file"]]
+            if search_exp_list:
+                outflist = list(search_exp_list.filter(outflist))
+        else:
+            outflist = []
+
+        if otype == "all" or otype == "dir":
+            outdlist = list(search_exp_list.filter(dlist)) if search_exp_list else dlist[:]
+        else:
+            outdlist = []
+        return dlist, outdlist, outflist
+
+    @staticmethod
+    def _scan_child_path(fullpath, pathinfo):
+        """
+        Helper method
+        Returns the full path of a child from its parent path and status
+        """
+        path_key = WhdfsSearchKeys.get_value(WhdfsSearchKeys.PATH_KEY)
+        if fullpath == "/":
+            fullpath = ""
+        return fullpath + "/" + pathinfo[path_key]
+
+    @staticmethod
+    def _scan_skipped(path, pathinfo, skip_dir_list, prune=None):
+        """
+        Helper method
+        Returns True if the scan does not list the directory path because it
+        is in skip_dir_list or pruned.
+        """
+        return path in skip_dir_list or \
+            (prune is not None and prune(path, pathinfo))
+
+    def _scan_children(self, fullpath, dlist, skip_dir_list, prune=None):
+        """
+        Helper method
+        Returns the list of (path, status) of the sub directories in dlist
+        that the scan lists.
+        """
+        children = []
+        for x in dlist:
+            npath = self._scan_child_path(fullpath, x)
+            if not self._scan_skipped(npath, x, skip_dir_list, prune):
+                children.append((npath, x))
+        return children
+
+    def _scan_pruner(self, search_exp_list, prune=None, root=None):
+        """
+        Helper method
+        Returns a function of a directory path and status that is True when
+        the scan should not list the directory, or None if nothing is pruned.
+        A directory is pruned when nothing under it can match the full path
+        patterns every match of search_exp_list must satisfy (literal
+        prefixes of globs and of regexes anchored with ^) or when prune,
+        an expression list or a function of path and status, is True for
+        a directory other than root.
+        """
+        full_path_key = WhdfsSearchKeys.get_value(WhdfsSearchKeys.FULL_PATH_KEY)
+        prefixes = []
+        for x in (search_exp_list.required_expressions() if search_exp_list else []):
+            literal_prefix = getattr(x.oper, "literal_prefix", None)
+            if x.key == full_path_key and literal_prefix:
+                prefix = literal_prefix(x.val)
+                if prefix:
+                    prefixes.append(prefix)
+
+        if isinstance(prune, SearchExpressionList):
+            prune_match = prune.compiled()
+            if full_path_key in prune.keys():
+                def prune_func(path, pathinfo):
+                    pathinfo[full_path_key] = path
+                    return prune_match(pathinfo)
+            else:
+                prune_func = lambda path, pathinfo: prune_match(pathinfo)
+        else:
+            prune_func = prune
+        if not prefixes and prune_func is None:
+            return None
+
+        def pruner(path, pathinfo):
+            dirpath = path.rstrip("/") + "/"
+            for prefix in prefixes:
+                if not (dirpath.startswith(prefix) or prefix.startswith(dirpath)):
+                    return True
+            return prune_func is not None and path != root and \
+                bool(prune_func(path, pathinfo))
+        return pruner
 
     def _scan_dir(self, fullpath, pathinfo, otype, currlev,
                   tmap, level, pattern, pattern_type="glob",
                   ignore_error=True, search_exp_list=None,
-                  skip_dir_list=set([]), search_scan_flag=False):
+                  skip_dir_list=set([]), search_scan_flag=False,
+                  prefetcher=None, prune=None):
         """
         Helper method that generates values for the scan_dir method.
         This method is a generator and yields returns of format
         root, dirlist, filelist
+        When a prefetcher is provided listings of the directories that
+        will be visited next are fetched ahead on its thread pool.
+        Directories for which prune returns True are not listed.
         """
-        if fullpath not in skip_dir_list:
+        if not self._scan_skipped(fullpath, pathinfo, skip_dir_list, prune):
             type_key = WhdfsSearchKeys.get_value(WhdfsSearchKeys.TYPE_KEY)
-            path_key = WhdfsSearchKeys.get_value(WhdfsSearchKeys.PATH_KEY)
             if currlev <= level and \
                             pathinfo[type_key] == tmap["dir"]:
-                try:
-                    olist = self.long_list_dir(path=fullpath, otype="all",
-                                               ignore_error=ignore_error,
-                                               ext_status=True)
-                    if not olist:
-                        yield fullpath, [], []
-                    else:
-                        dlist = filter(lambda x:
-                                       x[type_key] ==
-                                       tmap["dir"], olist)
-                        if otype == "all" or otype == "file":
-                            outflist = \
-                                filter(lambda x:
-                                       x[type_key] ==
-                                       tmap["file"] and
-                                       (not search_exp_list or
-                                        search_exp_list.match(x)),
-                                       olist)
-                        else:
-                            outflist = []
-
-                        if otype == "all" or otype == "dir":
-                            outdlist = \
-                                filter(lambda x: (not search_exp_list or
-                                                  search_exp_list.match(x)),
-                                       dlist)
-                        else:
-                            outdlist = []
-
-                        yield fullpath, outdlist, outflist
-                        if fullpath == "/":
-                            fullpath = ""
-                        for npathinfo in dlist:
-                            for root, dirs, files in \
-                                    self._scan_dir(fullpath + "/" +
-                                                           npathinfo[path_key],
-                                                   npathinfo, otype, currlev + 1,
-                                                   tmap, level, pattern,
-                                                   pattern_type, ignore_error,
-                                                   search_exp_list, skip_dir_list,
-                                                   search_scan_flag):
-                                yield root, dirs, files
-                except:
-                    raise
+                if prefetcher:
+                    olist = prefetcher.get(fullpath)
+                else:
+                    olist = self._scan_listing(fullpath, ignore_error)
+                dlist, outdlist, outflist = \
+                    self._scan_split(olist, otype, tmap, search_exp_list, fullpath)
+                children = self._scan_children(fullpath, dlist, skip_dir_list, prune)
+                if prefetcher and currlev + 1 <= level:
+                    prefetcher.hint([p for p, x in children])
+                yield fullpath, outdlist, outflist
+                for npath, npathinfo in children:
+                    for root, dirs, files in \
+                            self._scan_dir(npath,
+                                           npathinfo, otype, currlev + 1,
+                                           tmap, level, pattern,
+                                           pattern_type, ignore_error,
+                                           search_exp_list, skip_dir_list,
+                                           search_scan_flag, prefetcher,
+                                           prune):
+                        yield root, dirs, files
+
+    def _scan_dir_aggregate(self, fullpath, pathinfo, otype, currlev,
+                            tmap, level, ignore_error=True,
+                            search_exp_list=None, skip_dir_list=set([]),
+                            prefetcher=None, summary=None, prune=None,
+                            complete=False):
+        """
+        Helper method
+        Bottom up scan that computes the content summary of every directory
+        from the listings of its sub directories instead of requesting it
+        from the namenode. Sub directories are yielded before their parent.
+        Directories beyond level get their summary with GETCONTENTSUMMARY
+        only when it is yielded or complete totals of fullpath are needed.
+        Directories in skip_dir_list or pruned are never summarized. Totals
+        that miss a directory have partialSummary set to True.
+        If summary is a dictionary it is updated with the content summary
+        of fullpath.
+        """
+        if self._scan_skipped(fullpath, pathinfo, skip_dir_list, prune):
+            return
+        type_key = WhdfsSearchKeys.get_value(WhdfsSearchKeys.TYPE_KEY)
+        if currlev > level or pathinfo[type_key] != tmap["dir"]:
+            return
+        size_key = WhdfsSearchKeys.get_value(WhdfsSearchKeys.SIZE_KEY)
+        replication_key = WhdfsSearchKeys.get_value(WhdfsSearchKeys.REPL_KEY)
+        total_keys = [WhdfsSearchKeys.get_value(x) for x in
+                      (WhdfsSearchKeys.DIR_COUNT_KEY,
+                       WhdfsSearchKeys.FILE_COUNT_KEY,
+                       WhdfsSearchKeys.RAW_SIZE_KEY,
+                       WhdfsSearchKeys.SIZE_KEY)]
+        full_path_key = WhdfsSearchKeys.get_value(WhdfsSearchKeys.FULL_PATH_KEY)
+        search_keys = search_exp_list.keys() if search_exp_list else set()
+
+        def yielded(npath, x):
+            # Searches on summary fields cannot tell before the summary
+            if otype not in ("all", "dir"):
+                return False
+            if not search_exp_list or set(total_keys) & search_keys:
+                return True
+            if full_path_key in search_keys:
+                x[full_path_key] = npath
+            return search_exp_list.match(x)
+
+        if prefetcher:
+            olist = prefetcher.get(fullpath)
+        else:
+            olist = self._scan_listing(fullpath, ignore_error, ext_status=False)
+        olist = olist or []
+        recurse = currlev + 1 <= level
+        children = self._scan_children(fullpath,
+                                       [x for x in olist if x[type_key] == tmap["dir"]],
+                                       skip_dir_list, prune) if recurse else []
+        if prefetcher and children:
+            prefetcher.hint([p for p, x in children])
+        children = dict(children)
+
+        # A directory counts itself like GETCONTENTSUMMARY does
+        totals = self._build_extended_info(1, 0, length=0)
+        ext_list = []
+        for x in olist:
+            if x[type_key] == tmap["dir"]:
+                npath = self._scan_child_path(fullpath, x)
+                needed = complete or yielded(npath, x)
+                if npath in children:
+                    ext_info = {}
+                    for root, dirs, files in \
+                            self._scan_dir_aggregate(npath, x, otype, currlev + 1,
+                                                     tmap, level, ignore_error,
+                                                     search_exp_list, skip_dir_list,
+                                                     prefetcher, ext_info, prune,
+                                                     needed):
+                        yield root, dirs, files
+                elif recurse or not needed:
+                    # Pruned, skipped or not needed, so not summarized
+                    ext_info = self._build_extended_info(length=0)
+                    ext_info["partialSummary"] = True
+                else:
+                    ext_info = self.get_content_summary(npath,
+                                                        ignore_error=ignore_error)
+                ext_info = ext_info or self._build_extended_info()
+                if ext_info.get("partialSummary"):
+                    totals["partialSummary"] = True
+            elif x[type_key] in (tmap["file"], tmap["symlink"]):
+                ext_info = self._build_extended_info(0, 1,
+                                                     raw_size=x[size_key] * x[replication_key],
+                                                     length=x[size_key])
+            else:
+                ext_info = self._build_extended_info(length=0)
+            for key in total_keys:
+                totals[key] += ext_info.get(key, 0)
+            ext_list.append(merge_dict(x, ext_info))
+
+        if summary is not None:
+            summary.update(totals)
+        dlist, outdlist, outflist = \
+            self._scan_split(ext_list, otype, tmap, search_exp_list, fullpath)
+        yield fullpath, outdlist, outflist
+
+    def _scan_dir_prefetched(self, fullpath, pathinfo, otype, tmap, level,
+                             ignore_error=True, search_exp_list=None,
+                             skip_dir_list=set([]), workers=2,
+                             summary="server", prune=None):
+        """
+        Helper method
+        Parallel scan that yields in the same order as the serial scan
+        while directories are listed ahead on a thread pool.
+        """
+        ext_status = summary != "aggregate"
+        prefetcher = _ScanPrefetcher(Request.propagate(
+            lambda x: self._scan_listing(x, ignore_error, ext_status)), workers)
+        try:
+            if ext_status:
+                scan = self._scan_dir(fullpath, pathinfo, otype, 1, tmap, level,
+                                      None, ignore_error=ignore_error,
+                                      search_exp_list=search_exp_list,
+                                      skip_dir_list=skip_dir_list,
+                                      prefetcher=prefetcher, prune=prune)
+            else:
+                scan = self._scan_dir_aggregate(fullpath, pathinfo, otype, 1,
+                                                tmap, level,
+                                                ignore_error=ignore_error,
+                                                search_exp_list=search_exp_list,
+                                                skip_dir_list=skip_dir_list,
+                                                prefetcher=prefetcher,
+                                                prune=prune)
+            for root, dirs, files in scan:
+                yield root, dirs, files
+        finally:
+            prefetcher.close()
+
+    def _scan_dir_unordered(self, fullpath, pathinfo, otype, tmap, level,
+                            ignore_error=True, search_exp_list=None,
+                            skip_dir_list=set([]), workers=2, prune=None):
+        """
+        Helper method
+        Parallel breadth first scan over a work queue of directories.
+        Results are yielded in the order the listings complete.
+        """
+        type_key = WhdfsSearchKeys.get_value(WhdfsSearchKeys.TYPE_KEY)
+        if self._scan_skipped(fullpath, pathinfo, skip_dir_list, prune) or \
+                pathinfo[type_key] != tmap["dir"]:
+            return
+
+        def list_task(path, currlev):
+            try:
+                return path, currlev, self._scan_listing(path, ignore_error), None
+            except Exception:
+                return path, currlev, None, sys.exc_info()
+
+        list_task = Request.propagate(list_task)
+        pool = ThreadPool(workers)
+        done = queue.Queue()
+        pending = deque([(fullpath, 1)])
+        inflight = 0
+        try:
+            while pending or inflight:
+                while pending and inflight < workers * 2:
+                    pool.apply_async(list_task, pending.popleft(),
+                                     callback=done.put)
+                    inflight += 1
+                path, currlev, olist, exc_info = done.get()
+                inflight -= 1
+                if exc_info:
+                    six.reraise(*exc_info)
+                dlist, outdlist, outflist = \
+                    self._scan_split(olist, otype, tmap, search_exp_list, path)
+                if currlev + 1 <= level:
+                    for npath, npathinfo in \
+                            self._scan_children(path, dlist, skip_dir_list, prune):
+                        pending.append((npath, currlev + 1))
+                yield path, outdlist, outflist
+        finally:
+            pool.terminate()
+
+    @staticmethod
+    def _scan_limit(scan, max_results):
+        """
+        Helper method
+        Yields from scan until max_results directories and files were yielded
+        and closes it.
+        """
+        try:
+            remaining = max_results
+            for root, dirs, files in scan:
+                if remaining <= 0:
+                    break
+                dirs = dirs[:remaining]
+                files = files[:remaining - len(dirs)]
+                remaining -= len(dirs) + len(files)
+                yield root, dirs, files
+                if remaining <= 0:
+                    break
+        finally:
+            scan.close()
 
     def scan_dir(self, path, level=None, pattern=None, pattern_type="glob",
                  otype="all", ignore_error=True, skip_dirs=[],
-                 search_exp_list=None):
+                 search_exp_list=None, workers=1, ordered=True,
+                 summary="server", quota=False, query=None,
+                 prune=None, max_results=None):
         """
         Walk through the filesystem starting from path with long listing for each
         filesystem object.
@@ -823,6 +1819,52 @@ class Webhdfs(object):
                                     a object or directory it cannot accept it will fail.
             skip_dirs           : List of directory to skip recursing into.
             search_exp_list(WhdfsSearchExpressionList) : Search expression list.
+            workers(int)        : Number of threads listing directories concurrently.
+                                    Default 1 scans serially. Set the connection
+                                    pool size (Request.configure_pool) to at least
+                                    the number of workers.
+            ordered(bool)       : Only used when workers > 1. True yields in the
+                                    same depth first order as a serial scan.
+                                    False yields directories breadth first in the
+                                    order their listings complete. Default True.
+            summary(str)        : How the content summary fields of directories
+                                    (directoryCount, fileCount, length,
+                                    spaceConsumed, quota, spaceQuota) are filled.
+                                    "server" requests GETCONTENTSUMMARY for
+                                    every directory listed. "aggregate" adds up
+                                    the listings of the scan bottom up, which
+                                    yields sub directories before their parent
+                                    and reports quota and spaceQuota as -1.
+                                    Directories beyond level are summarized
+                                    by the namenode only when their summary
+                                    is yielded. Pruned directories and those
+                                    in skip_dirs are not summarized and the
+                                    totals that miss them have partialSummary
+                                    set to True. Default "server".
+            quota(bool)         : Quota fields are needed. Switches an "aggregate"
+                                    scan to "server". This is implied when
+                                    search_exp_list searches on quota fields.
+            query(str)          : Textual search query, for example
+                                    "size > 1GB and mtime < 30d and name ~ '\\.orc$'"
+                                    (see WhdfsSearchExpressionList.query_expression).
+                                    Combined with search_exp_list or pattern
+                                    using "and". Globs and ^ anchored regexes
+                                    on path (the full path) that every match
+                                    must satisfy prune the directories that
+                                    are listed.
+            prune               : Directories below path that are not listed
+                                    nor recursed into. A query string or
+                                    WhdfsSearchExpressionList matched on the
+                                    status of the directory from the listing
+                                    of its parent, or a function of the
+                                    directory path and status returning True
+                                    to prune it. Pruned directories are still
+                                    yielded in the dirlist of their parent.
+                                    Searches on content summary fields make
+                                    an "aggregate" scan use "server".
+            max_results(int)    : Stop the scan once this many directories
+                                    and files have been yielded. The lists
+                                    yielded last are cut to the limit.
 
         Returns:
             Generator of type root, dirlist, filelist where dirlist and filelist
@@ -840,13 +1882,15 @@ class Webhdfs(object):
                 for file in files['pathSuffix']:
                     print file
         """
-
-        tmap = {"file": "FILE", "dir": "DIRECTORY"}
+        tmap = {"file": "FILE", "dir": "DIRECTORY", "symlink": "SYMLINK"}
         currlev = 1
         if level is None or level < 1:
             level = 500
         if not path:
             raise MissingArgumentError("Path not provided")
+        if summary not in ("server", "aggregate"):
+            raise IllegalArgumentError("summary should have value 'server' or " +
+                                       "'aggregate' provided value {0}".format(summary))
         try:
             pathinfo = self.get_path_status(path)
         except:
@@ -872,75 +1916,688 @@ class Webhdfs(object):
                                           pattern)
                 search_exp_list = WhdfsSearchExpressionList(path_search_exp)
 
-        return self._scan_dir(path, pathinfo, otype, currlev,
-                              tmap, level, pattern,
-                              pattern_type, ignore_error=ignore_error,
-                              search_exp_list=search_exp_list,
-                              skip_dir_list=skip_dirs,
-                              search_scan_flag=search_scan_flag)
+        if query:
+            search_exp_list = WhdfsSearchExpressionList.from_query(query,
+                                                                   search_exp_list)
+        if isinstance(prune, six.string_types):
+            prune = WhdfsSearchExpressionList.from_query(prune)
+
+        if summary == "aggregate":
+            quota_keys = set([WhdfsSearchKeys.get_value(WhdfsSearchKeys.COUNT_QUOTA_KEY),
+                              WhdfsSearchKeys.get_value(WhdfsSearchKeys.SPACE_QUOTA_KEY)])
+            # Listings of an aggregate scan have no content summary yet
+            summary_keys = quota_keys | set(WhdfsSearchKeys.get_value(x) for x in
+                                            (WhdfsSearchKeys.DIR_COUNT_KEY,
+                                             WhdfsSearchKeys.FILE_COUNT_KEY,
+                                             WhdfsSearchKeys.RAW_SIZE_KEY,
+                                             WhdfsSearchKeys.SIZE_KEY))
+            if quota or (search_exp_list and
+                         quota_keys & search_exp_list.keys()) or \
+                    (isinstance(prune, SearchExpressionList) and
+                     summary_keys & prune.keys()):
+                summary = "server"
+        prune = self._scan_pruner(search_exp_list, prune, path)
+
+        if workers and workers > 1:
+            # Bottom up aggregation needs the depth first order
+            if ordered or summary == "aggregate":
+                scan = self._scan_dir_prefetched(path, pathinfo, otype, tmap, level,
+                                                 ignore_error=ignore_error,
+                                                 search_exp_list=search_exp_list,
+                                                 skip_dir_list=skip_dirs,
+                                                 workers=workers,
+                                                 summary=summary,
+                                                 prune=prune)
+            else:
+                scan = self._scan_dir_unordered(path, pathinfo, otype, tmap, level,
+                                                ignore_error=ignore_error,
+                                                search_exp_list=search_exp_list,
+                                                skip_dir_list=skip_dirs,
+                                                workers=workers,
+                                                prune=prune)
+        elif summary == "aggregate":
+            scan = self._scan_dir_aggregate(path, pathinfo, otype, currlev,
+                                            tmap, level, ignore_error=ignore_error,
+                                            search_exp_list=search_exp_list,
+                                            skip_dir_list=skip_dirs,
+                                            prune=prune)
+        else:
+            scan = self._scan_dir(path, pathinfo, otype, currlev,
+                                  tmap, level, pattern,
+                                  pattern_type, ignore_error=ignore_error,
+                                  search_exp_list=search_exp_list,
+                                  skip_dir_list=skip_dirs,
+                                  search_scan_flag=search_scan_flag,
+                                  prune=prune)
+
+        if max_results is not None:
+            return self._scan_limit(scan, max_results)
+        return scan
+
+    def scan_to_columns(self, path, otype="file", columns=None, summary="aggregate",
+                        **kwargs):
+        """
+        Scans path like scan_dir and accumulates the statuses yielded into
+        typed columns instead of a dictionary per object.
 
-    def iter_file(self, srcfile, length=None, buffer_size=None):
-        """ Returns an read iterator over hdfs file
         Args:
-            srcfile(str)       : hdfs file to be print
-            length(int)        : length to read
-            buffer_size         : buffer size for each read
+            path(str)       : Full path to start the recursive listing
+            otype(str)      : File, dir or all. Default file. Directory
+                              lengths are the length of their content, so
+                              sums over "all" count files more than once.
+            columns(tuple)  : (name, kind) of the columns. Default
+                              columns.DEFAULT_COLUMNS, that is root,
+                              length, replication, modificationTime,
+                              accessTime, owner and type.
+            summary(str)    : As for scan_dir. Default "aggregate", which
+                              needs no request per directory beyond its
+                              listing.
+            kwargs          : Other scan_dir arguments such as level,
+                              query, prune or workers.
+
+        Returns:
+            StatusColumns
+
+        Example:
+            cols = whdfs.scan_to_columns("/apps", query="mtime > 90d")
+            print(cols.group_sum("owner", "length"))
         """
-        if not srcfile:
-            raise MissingArgumentError("Source file not provided")
-        open_op = "OPEN"
-        if length:
-            open_op += "&length=" + str(length)
-        if buffer_size:
-            open_op += "&buffer_size=" + str(buffer_size)
-        url = self._get_op_url(self._get_path_url(srcfile), open_op)
-        r = Request.url_request(url, method="get", stream=True,
-                                allow_redirects=True)
-        buffer_size = buffer_size or 4092
-        return r.iter_content(chunk_size=buffer_size)
+        out = StatusColumns(columns)
+        for root, dirs, files in self.scan_dir(path, otype=otype, summary=summary,
+                                               **kwargs):
+            out.extend(dirs, root)
+            out.extend(files, root)
+        return out
+
+    def disk_usage(self, path, depth=1, top_n=10, group_by=None,
+                   small_file_size=_SMALL_FILE_SIZE, **kwargs):
+        """
+        Disk utilization under path computed in a single aggregate scan,
+        without a GETCONTENTSUMMARY per directory. Memory is bounded by the
+        number of directories up to depth, the number of groups and top_n.
 
-    def print_file(self, srcfile, length=None, buffer_size=None):
-        """ Print contents of hdfs file
         Args:
-            srcfile(str)       : hdfs file to be print
-            length(int)        : length to read
-            buffer_size         : buffer size for read
-        """
-        import sys
-        for block in self.iter_file(srcfile=srcfile,
-                                    length=length,
-                                    buffer_size=buffer_size):
-            if block:  # filter out keep-alive new chunks
-                sys.stdout.write(block)
+            path(str)               : Full path to start the recursive listing
+            depth(int)              : Report the totals of every directory up
+                                        to this many levels below path.
+                                        Default 1.
+            top_n(int)              : Number of largest directories and files
+                                        reported. Default 10.
+            group_by(str)           : Also total the files by "owner", "depth"
+                                        below path or file "extension".
+                                        Default None.
+            small_file_size(int)    : Files smaller than this many bytes are
+                                        counted as small files. Default 128MB.
+            kwargs                  : Other scan_dir arguments such as
+                                        skip_dirs, prune or workers. The
+                                        scan always uses the aggregate
+                                        summary, summary is not accepted.
 
-    def download_file(self, srcfile, tgtpath, overwrite=True,
-                      ignore_error=False):
-        """ Downloads hdfs file to local directory
+        Returns:
+            Dictionary
+            {
+                "path": path,
+                "total": usage,
+                "levels": {1: {dirpath: usage}, ..., depth: {dirpath: usage}},
+                "groups": {group: usage},
+                "top_dirs": [(dirpath, length)] largest first,
+                "top_files": [(filepath, length)] largest first
+            }
+            where usage is a dictionary of length, spaceConsumed (raw bytes),
+            fileCount, smallFileCount and directoryCount. Unlike
+            GETCONTENTSUMMARY directoryCount does not count the directory
+            itself.
 
-        Args:
-            srcfile(str)       : hdfs file to be downloaded
-            tgtpath(str)       : The target directory
-            overwrite(bool)    : When overwrite is set to True it will replace
-                                    target file if it exists.
-            ignore_error(bool  : If set to True will ignore download and other checks.
+        Example:
+            usage = whdfs.disk_usage("/apps", depth=2, group_by="owner")
+            for dirpath, dir_usage in sorted(usage["levels"][1].items()):
+                print(dirpath, dir_usage["length"], dir_usage["smallFileCount"])
+        """
+        if group_by not in (None, "owner", "depth", "extension"):
+            raise IllegalArgumentError("group_by should be 'owner', 'depth' or " +
+                                       "'extension' provided value {0}".format(group_by))
+        if "summary" in kwargs:
+            raise IllegalArgumentError("disk_usage always scans with the aggregate " +
+                                       "summary, summary cannot be provided")
+        if not path:
+            raise MissingArgumentError("Path not provided")
+        path = posixpath.normpath(path) if path != "/" else path
+        base = path.rstrip("/")
+        path_key = WhdfsSearchKeys.get_value(WhdfsSearchKeys.PATH_KEY)
+        size_key = WhdfsSearchKeys.get_value(WhdfsSearchKeys.SIZE_KEY)
+        raw_size_key = WhdfsSearchKeys.get_value(WhdfsSearchKeys.RAW_SIZE_KEY)
+        owner_key = WhdfsSearchKeys.get_value(WhdfsSearchKeys.OWNER_KEY)
+        new_usage = lambda: dict.fromkeys(_USAGE_KEYS, 0)
+        total = new_usage()
+        levels = dict((lev, {}) for lev in range(1, (depth or 0) + 1))
+        groups = {}
+        top_dirs, top_files = [], []
+
+        def push_top(heap, length, fullpath):
+            if len(heap) < top_n:
+                heapq.heappush(heap, (length, fullpath))
+            elif top_n:
+                heapq.heappushpop(heap, (length, fullpath))
+
+        for root, dirs, files in self.scan_dir(path, otype="all", summary="aggregate",
+                                               **kwargs):
+            relpath = root[len(base):].strip("/")
+            parts = relpath.split("/") if relpath else []
+            # Usage of the directories up to depth that contain root
+            usages = [total] + [levels[lev].setdefault(base + "/" + "/".join(parts[:lev]),
+                                                       new_usage())
+                                for lev in range(1, min(depth or 0, len(parts)) + 1)]
+            for x in dirs:
+                npath = self._scan_child_path(root, x)
+                if len(parts) < (depth or 0):
+                    levels[len(parts) + 1].setdefault(npath, new_usage())
+                push_top(top_dirs, x.get(size_key, 0), npath)
+                for usage in usages:
+                    usage["directoryCount"] += 1
+            for x in files:
+                length = x.get(size_key, 0)
+                raw_size = x.get(raw_size_key, 0)
+                small = 1 if length < small_file_size else 0
+                if group_by == "owner":
+                    group = x.get(owner_key)
+                elif group_by == "depth":
+                    group = len(parts) + 1
+                elif group_by == "extension":
+                    group = posixpath.splitext(x[path_key])[1].lstrip(".").lower()
+                if group_by:
+                    group_usages = usages + [groups.setdefault(group, new_usage())]
+                else:
+                    group_usages = usages
+                for usage in group_usages:
+                    usage["length"] += length
+                    usage["spaceConsumed"] += raw_size
+                    usage["fileCount"] += 1
+                    usage["smallFileCount"] += small
+                push_top(top_files, length, self._scan_child_path(root, x))
+
+        return {"path": path,
+                "total": total,
+                "levels": levels,
+                "groups": groups,
+                "top_dirs": [(p, l) for l, p in sorted(top_dirs, reverse=True)],
+                "top_files": [(p, l) for l, p in sorted(top_files, reverse=True)]}
+
+    @staticmethod
+    def _compaction_groups(files, block_size):
+        """
+        Helper method
+        Packs (path, length) pairs first fit decreasing into groups whose
+        total length does not exceed block_size. Returns the groups of
+        more than one file, each ordered by path.
+        """
+        bins = []
+        for fullpath, length in sorted(files, key=lambda x: (-x[1], x[0])):
+            for group in bins:
+                if group[0] + length <= block_size:
+                    group[0] += length
+                    group[1].append(fullpath)
+                    break
+            else:
+                bins.append([length, [fullpath]])
+        return [(length, sorted(paths)) for length, paths in bins if len(paths) > 1]
+
+    def find_small_files(self, path, threshold=None, min_count=2, **kwargs):
+        """
+        Streams a scan of path and yields, for every directory holding at
+        least min_count small files, the distribution of its file sizes
+        relative to their block size and a compaction plan. The plan packs
+        the small files of the directory into groups of the same block size
+        and replication whose total length comes close to one block, to be
+        merged with concat_files or compact_small_files. CONCAT joins the
+        files byte for byte so the plan only suits formats that can be
+        concatenated, such as line delimited text.
+
+        Args:
+            path(str)       : Full path to start the recursive listing
+            threshold(int)  : Files smaller than this many bytes are small.
+                                Default the block size of each file.
+            min_count(int)  : Minimum number of small files in a directory
+                                to report it. Default 2.
+            kwargs          : Other scan_dir arguments such as level,
+                                skip_dirs, prune, query or workers.
+
+        Returns:
+            Generator of dictionaries
+            {
+                "path": directory,
+                "fileCount": files in the directory,
+                "smallFileCount": small files,
+                "smallFileLength": bytes in small files,
+                "distribution": {"<1%": N, "1-10%": N, "10-50%": N,
+                                 "50-100%": N, ">=100%": N},
+                "groups": [{"target": first file, "sources": [other files],
+                            "length": total bytes, "blockSize": block size}]
+            }
+            where distribution counts the files by their length as a
+            fraction of their block size.
+
+        Example:
+            for entry in whdfs.find_small_files("/data/logs", min_count=100):
+                print(entry["path"], entry["smallFileCount"], len(entry["groups"]))
+        """
+        if min_count is None or min_count < 1:
+            min_count = 1
+        path_key = WhdfsSearchKeys.get_value(WhdfsSearchKeys.PATH_KEY)
+        size_key = WhdfsSearchKeys.get_value(WhdfsSearchKeys.SIZE_KEY)
+        block_key = WhdfsSearchKeys.get_value(WhdfsSearchKeys.BLOCK_SIZE_KEY)
+        replication_key = WhdfsSearchKeys.get_value(WhdfsSearchKeys.REPL_KEY)
+        kwargs.setdefault("summary", "aggregate")
+        for root, dirs, files in self.scan_dir(path, otype="file", **kwargs):
+            distribution = dict((label, 0) for fraction, label in _SIZE_DISTRIBUTION)
+            distribution[_SIZE_DISTRIBUTION_FULL] = 0
+            small = {}
+            small_length = 0
+            for x in files:
+                length = x.get(size_key, 0)
+                block_size = x.get(block_key) or _SMALL_FILE_SIZE
+                for fraction, label in _SIZE_DISTRIBUTION:
+                    if length < block_size * fraction:
+                        distribution[label] += 1
+                        break
+                else:
+                    distribution[_SIZE_DISTRIBUTION_FULL] += 1
+                if length < (threshold if threshold is not None else block_size):
+                    small.setdefault((block_size, x.get(replication_key)), []).append(
+                        (self._scan_child_path(root, x), length))
+                    small_length += length
+            small_count = sum(len(x) for x in small.values())
+            if small_count < min_count:
+                continue
+            groups = []
+            for (block_size, replication), small_files in sorted(small.items()):
+                for length, paths in self._compaction_groups(small_files, block_size):
+                    groups.append({"target": paths[0],
+                                   "sources": paths[1:],
+                                   "length": length,
+                                   "blockSize": block_size})
+            yield {"path": root,
+                   "fileCount": len(files),
+                   "smallFileCount": small_count,
+                   "smallFileLength": small_length,
+                   "distribution": distribution,
+                   "groups": groups}
+
+    def compact_small_files(self, plan, workers=1, rate=None, ignore_error=True):
+        """
+        Runs a compaction plan of find_small_files, concatenating the
+        sources of every group into its target.
+
+        Args:
+            plan            : Iterable of find_small_files results or of
+                                their groups.
+            workers(int)    : Number of CONCAT requests run concurrently.
+                                Default 1.
+            rate(float)     : Maximum CONCAT requests started per second.
+                                Default None is not limited.
+            ignore_error(bool): Default True. Failed groups are reported
+                                and the other groups still run. If False the
+                                first failure is raised.
+
+        Returns:
+            Dictionary
+            {
+                "groups": groups concatenated,
+                "files": files removed by the concatenations,
+                "failed": [(target, error message)]
+            }
+
+        Example:
+            plan = whdfs.find_small_files("/data/logs", min_count=100)
+            print(whdfs.compact_small_files(plan, workers=4, rate=10))
+        """
+        bucket = TokenBucket(rate) if rate else None
+
+        def groups():
+            for entry in plan:
+                for group in entry.get("groups", [entry]):
+                    yield group
+
+        def concat(group):
+            if bucket:
+                bucket.acquire()
+            try:
+                self.concat_files(group["target"], group["sources"])
+                return group, None
+            except Exception as e:
+                if not ignore_error:
+                    raise
+                return group, e
+
+        result = {"groups": 0, "files": 0, "failed": []}
+        pool = ThreadPool(workers) if workers and workers > 1 else None
+        try:
+            outcomes = pool.imap_unordered(Request.propagate(concat), groups()) if pool \
+                else (concat(x) for x in groups())
+            for group, error in outcomes:
+                if error is not None:
+                    print("Concatenating into {0} failed".format(group["target"]))
+                    result["failed"].append((group["target"], str(error)))
+                else:
+                    result["groups"] += 1
+                    result["files"] += len(group["sources"])
+        finally:
+            if pool:
+                pool.terminate()
+        print("Concatenated {0} files into {1} files".format(result["files"],
+                                                             result["groups"]))
+        return result
+
+    def _changes_removed(self, state, fullpath, pathinfo):
+        """
+        Helper method
+        Yields removed events for pathinfo and, for a directory, everything
+        under it in state and drops their state.
+        """
+        type_key = WhdfsSearchKeys.get_value(WhdfsSearchKeys.TYPE_KEY)
+        if pathinfo.get(type_key) == "DIRECTORY":
+            previous = state.pop(fullpath, None)
+            for name, status in sorted((previous or {}).get("listing", {}).items()):
+                for event in self._changes_removed(state, self._scan_child_path(fullpath, status),
+                                                   status):
+                    yield event
+        yield "removed", fullpath, pathinfo
+
+    def _changes_listing(self, state, fullpath, pathinfo, ignore_error=True,
+                         status_func=None):
+        """
+        Helper method
+        Returns the listing of directory fullpath as a dictionary of name to
+        status. The listing recorded in state is reused when the modification time and number of children
+        of the directory did not change, refreshing only the statuses of its
+        sub directories with status_func.
+        """
+        path_key = WhdfsSearchKeys.get_value(WhdfsSearchKeys.PATH_KEY)
+        type_key = WhdfsSearchKeys.get_value(WhdfsSearchKeys.TYPE_KEY)
+        previous = state.get(fullpath)
+        if previous is not None and \
+                previous["modificationTime"] == pathinfo.get("modificationTime") and \
+                previous["childrenNum"] == pathinfo.get("childrenNum"):
+            listing = dict(previous["listing"])
+            names = sorted(x for x in listing if listing[x][type_key] == "DIRECTORY")
+            paths = [self._scan_child_path(fullpath, listing[x]) for x in names]
+            statuses = status_func(paths)
+            for name, status in zip(names, statuses):
+                if status is not None:
+                    status[path_key] = name
+                    listing[name] = status
+                else:
+                    del listing[name]
+            return listing
+        olist = self.long_list_dir(path=fullpath, otype="all",
+                                   ignore_error=ignore_error, ext_status=False)
+        return dict((x[path_key], x) for x in olist or [])
+
+    def scan_changes(self, path, state, skip_dirs=[], ignore_error=True, workers=1):
+        """
+        Incremental scan of path. Compares the namespace with the state
+        recorded by the previous scan_changes and yields what was added,
+        removed or modified since. Only directories whose modificationTime
+        or childrenNum changed are listed again; the listings of the other
+        directories are reused from state and only their sub directories
+        are checked with GETFILESTATUS. Files appended to in place do not
+        change the modification time of their directory and are not
+        reported until their directory changes. The statuses cached under path
+        are dropped before the scan so that it sees the current namespace.
+
+        Args:
+            path(str)           : Full path to start the recursive listing
+            state(dict)         : State of the previous scan, updated in place
+                                    as the scan proceeds. Pass an empty
+                                    dictionary for the first scan, which
+                                    reports everything as added. It maps each
+                                    directory path to its modificationTime,
+                                    childrenNum and listing, a dictionary of
+                                    name to status, and can be saved with json.
+            skip_dirs           : List of directory to skip recursing into.
+            ignore_error(bool)  : Default set to True. If set to false when it
+                                    cannot list a directory it will fail.
+            workers(int)        : Number of threads requesting the statuses of
+                                    the sub directories of reused listings.
+                                    Default 1.
+
+        Returns:
+            Generator of (event, fullpath, status) where event is "added",
+            "removed" or "modified" and status is the current status, or the
+            last known one for "removed". Modified objects differ in one of
+            length, modificationTime, owner, group, permission or replication.
+
+        Example:
+            state = json.load(open("apps.state")) if os.path.exists("apps.state") else {}
+            for event, path, status in whdfs.scan_changes("/apps", state):
+                print("{0} {1}".format(event, path))
+            json.dump(state, open("apps.state", "w"))
+        """
+        if not path:
+            raise MissingArgumentError("Path not provided")
+        if state is None:
+            raise MissingArgumentError("State not provided")
+        path = posixpath.normpath(path) if path != "/" else path
+        type_key = WhdfsSearchKeys.get_value(WhdfsSearchKeys.TYPE_KEY)
+        # Cached statuses would hide changes made since they were stored
+        self._invalidate_status(path, recursive=True)
+        pathinfo = self.get_path_status(path)
+        if pathinfo[type_key] != "DIRECTORY":
+            raise IllegalArgumentError("{0} is not a directory".format(path))
+        if isinstance(skip_dirs, str):
+            skip_dirs = [skip_dirs]
+        skip_dir_list = set(x.rstrip("/") for x in skip_dirs or [])
+        pool = ThreadPool(workers) if workers and workers > 1 else None
+        get_status = lambda x: self.get_path_status(x, ignore_error=True)
+        status_func = (lambda paths: pool.map(Request.propagate(get_status), paths)) if pool \
+            else (lambda paths: [get_status(x) for x in paths])
+
+        stack = [(path, pathinfo)]
+        try:
+            while stack:
+                fullpath, pathinfo = stack.pop()
+                previous = state.get(fullpath)
+                old_listing = previous["listing"] if previous else {}
+                listing = self._changes_listing(state, fullpath, pathinfo,
+                                                ignore_error, status_func)
+                for name in sorted(set(old_listing) | set(listing)):
+                    npath = self._scan_child_path(fullpath, listing.get(name) or
+                                                  old_listing[name])
+                    old, new = old_listing.get(name), listing.get(name)
+                    if old is not None and (new is None or old[type_key] != new[type_key]):
+                        for event in self._changes_removed(state, npath, old):
+                            yield event
+                        old = None
+                    if new is None:
+                        continue
+                    if old is None:
+                        yield "added", npath, new
+                    elif any(old.get(x) != new.get(x) for x in _CHANGE_KEYS):
+                        yield "modified", npath, new
+                state[fullpath] = {"modificationTime": pathinfo.get("modificationTime"),
+                                   "childrenNum": pathinfo.get("childrenNum"),
+                                   "listing": listing}
+                children = [(self._scan_child_path(fullpath, x), x) for name, x in
+                            sorted(listing.items()) if x[type_key] == "DIRECTORY"]
+                stack.extend(reversed([x for x in children
+                                       if x[0] not in skip_dir_list]))
+        finally:
+            if pool:
+                pool.terminate()
+
+    def _open_file(self, srcfile, length=None, buffer_size=None, offset=None):
+        """
+        Helper method
+        Submits an OPEN request and returns the streamed response.
+        Raises IOError with the remote exception message if it fails.
+        """
+        if not srcfile:
+            raise MissingArgumentError("Source file not provided")
+        open_op = "OPEN"
+        if offset:
+            open_op += "&offset=" + str(offset)
+        if length:
+            open_op += "&length=" + str(length)
+        if buffer_size:
+            open_op += "&buffer_size=" + str(buffer_size)
+        url = self._get_op_url(self._get_path_url(srcfile), open_op)
+        r = self._request(url, method="get", stream=True,
+                          allow_redirects=True,
+                          timeout=self.response_timeout)
+        if r.status_code != 200:
+            err_msg = ""
+            try:
+                err_msg = r.json()['RemoteException']['message']
+            except:
+                pass
+            r.close()
+            raise IOError("Error Reported in url request call \n{0}\n"
+                          .format(err_msg))
+        return r
+
+    def iter_file(self, srcfile, length=None, buffer_size=None, offset=None,
+                  chunk_size=None):
+        """ Returns an read iterator over hdfs file
+        Args:
+            srcfile(str)       : hdfs file to be print
+            length(int)        : length to read
+            buffer_size         : buffer size for each read
+            offset(int)        : position in the file to start reading from
+            chunk_size(int)    : size of the blocks returned by the iterator.
+                                    Default buffer_size or 1MB.
+        """
+        r = self._open_file(srcfile, length=length, buffer_size=buffer_size,
+                            offset=offset)
+        chunk_size = chunk_size or buffer_size or 1048576
+        return r.iter_content(chunk_size=chunk_size)
+
+    def read_into(self, path, buffer, offset=0, length=None, chunk_size=None):
+        """ Reads a hdfs file into a writable buffer without intermediate copies
+
+        Args:
+            path(str)          : hdfs file to read
+            buffer             : Writable buffer such as a bytearray, mmap or
+                                    memoryview. Filled from its start.
+            offset(int)        : position in the file to start reading from
+            length(int)        : bytes to read. Default len(buffer)
+            chunk_size(int)    : maximum bytes received per read. Default 8MB.
+
+        Returns:
+            Number of bytes read, less than length at the end of the file.
+        """
+        length = len(buffer) if length is None else min(length, len(buffer))
+        if not length:
+            return 0
+        r = self._open_file(path, length=length, offset=offset)
+        return Request.read_response_into(r, buffer, 0, length,
+                                          chunk_size=chunk_size or 8388608)
+
+    def print_file(self, srcfile, length=None, buffer_size=None):
+        """ Print contents of hdfs file
+        Args:
+            srcfile(str)       : hdfs file to be print
+            length(int)        : length to read
+            buffer_size         : buffer size for read
+        """
+        import sys
+        for block in self.iter_file(srcfile=srcfile,
+                                    length=length,
+                                    buffer_size=buffer_size):
+            if block:  # filter out keep-alive new chunks
+                sys.stdout.write(block)
+
+    def _download_range(self, download, index, chunk_size=8388608,
+                        checkpoint=67108864):
+        """
+        Helper method
+        Fetches the rest of one range of a download with a ranged OPEN
+        request and receives it straight into a memory map of that part
+        of the part file. Progress is saved every checkpoint bytes and
+        when the transfer stops.
+        """
+        start, end, offset = download.ranges[index]
+        # Maps start at a multiple of the allocation granularity
+        map_start = offset - offset % mmap.ALLOCATIONGRANULARITY
+        state = {"unsaved": 0}
+
+        def progress(nbytes):
+            # Mapped pages outlive the process so received data can be recorded
+            state["unsaved"] += nbytes
+            if state["unsaved"] >= checkpoint:
+                download.advance(index, state["unsaved"])
+                download.save()
+                state["unsaved"] = 0
+
+        try:
+            with open(download.part, "r+b") as f:
+                part_map = mmap.mmap(f.fileno(), end - map_start, offset=map_start)
+                try:
+                    r = self._open_file(download.srcfile, length=end - offset,
+                                        offset=offset)
+                    offset += Request.read_response_into(r, part_map, offset - map_start,
+                                                         end - map_start,
+                                                         chunk_size=chunk_size,
+                                                         progress=progress)
+                finally:
+                    part_map.close()
+        finally:
+            if state["unsaved"]:
+                download.advance(index, state["unsaved"])
+            download.save()
+        if offset != end:
+            raise IOError("Transfer of {0} ended at byte {1} instead of {2}"
+                          .format(download.srcfile, offset, end))
+
+    def _download_ranges(self, downloads, workers=1):
+        """
+        Helper method
+        Fetches the pending ranges of all downloads on a pool of workers
+        threads. A failed range marks its download as failed and the
+        remaining ranges of that download are skipped.
         """
+        tasks = [(x, i) for x in downloads for i in x.pending()]
+
+        def fetch(task):
+            download, index = task
+            if download.error:
+                return
+            try:
+                self._download_range(download, index)
+            except Exception:
+                download.error = sys.exc_info()
+
+        if workers and workers > 1 and len(tasks) > 1:
+            pool = ThreadPool(min(workers, len(tasks)))
+            try:
+                pool.map(Request.propagate(fetch), tasks, chunksize=1)
+            finally:
+                pool.terminate()
+        else:
+            for task in tasks:
+                fetch(task)
 
+    def _prepare_download(self, srcfile, tgtpath, overwrite=True,
+                          ignore_error=False, split_size=None, resume=True):
+        """
+        Helper method
+        Resolves the local target of srcfile and returns its _RangeDownload.
+        Returns True if the download is skipped and False if it failed
+        with ignore_error set.
+        """
         if not srcfile:
             raise MissingArgumentError("Source file not provided")
         if not tgtpath:
             raise MissingArgumentError("Target Path not provided")
 
-        skip = False
-        open_op = "OPEN"
         filename = os.path.basename(srcfile)
 
         if os.path.exists(tgtpath):
             target = tgtpath
             if os.path.isdir(target):
                 target = os.path.join(target, filename)
-            if os.path.isfile(target):
-                if not overwrite:
-                    skip = True
+            if os.path.isfile(target) and not overwrite:
+                print("Target file {0} present ".format(target) +
+                      "and overwrite set to False. Skipping download.")
+                return True
         else:
             tgtdir = os.path.dirname(tgtpath)
             if not os.path.isdir(tgtdir):
@@ -950,53 +2607,75 @@ class Webhdfs(object):
                     return False
             target = tgtpath
 
-        url = self._get_op_url(self._get_path_url(srcfile), open_op)
-        fileinfolist = self.long_list_dir(srcfile)
-        if not fileinfolist:
+        fileinfo = self.get_path_status(srcfile, ignore_error=True)
+        type_key = WhdfsSearchKeys.get_value(WhdfsSearchKeys.TYPE_KEY)
+        if not fileinfo or fileinfo.get(type_key) != "FILE":
             if not ignore_error:
-                raise IOError("srcfile {0} does not exist"
+                raise IOError("srcfile {0} does not exist or is not a file"
                               .format(srcfile))
             else:
                 return False
-        srcsize = int(fileinfolist[0]['length'])
-        # print url,target
-        if skip is False:
-            try:
-                start = time.time()
-                print("Downloading {0} to {1}".format(srcfile, tgtpath))
-                Request.url_file_download(url, target)
-                if not os.path.exists(target):
-                    if not ignore_error:
-                        raise IOError("Download failed")
-                    else:
-                        return False
-                end = time.time()
-                targetsize = os.path.getsize(target)
-                if targetsize != srcsize:
-                    if not ignore_error:
-                        raise IOError("source size for file {0} is {1} "
-                                      .format(srcfile, srcsize) +
-                                      "target size for file {0} is {1}\n"
-                                      .format(target, targetsize) +
-                                      "File sizes differ. Download failed.")
-                    else:
-                        return False
-                else:
-                    print("Total time taken to download {0} bytes ".format(srcsize) +
-                          "is {0} seconds ".format(str(end - start).strip()))
-            except:
-                if not ignore_error:
-                    raise
-                else:
-                    print("Download failed".format(srcfile, tgtpath))
-                    return False
-        else:
-            print("Target file {0} present ".format(target) +
-                  "and overwrite set to False. Skipping download.")
+        try:
+            return _RangeDownload(srcfile, target, fileinfo,
+                                  split_size=split_size, resume=resume)
+        except (IOError, OSError):
+            if not ignore_error:
+                raise
+            return False
+
+    def _finish_download(self, download, start, ignore_error=False):
+        """
+        Helper method
+        Checks the result of a download and moves it to its target.
+        """
+        try:
+            if download.error:
+                six.reraise(*download.error)
+            download.finish()
+        except:
+            if not ignore_error:
+                raise
+            else:
+                print("Download of {0} failed".format(download.srcfile))
+                return False
+        print("Total time taken to download {0} bytes ".format(download.length) +
+              "is {0} seconds ".format(str(time.time() - start).strip()))
         return True
 
+    def download_file(self, srcfile, tgtpath, overwrite=True,
+                      ignore_error=False, workers=1, split_size=None,
+                      resume=True):
+        """ Downloads hdfs file to local directory
+
+        The file is written to tgtpath.part and renamed once its size
+        matches the source. If the transfer fails the part file and its
+        progress file tgtpath.part.progress are kept and the next
+        download of the same unmodified file continues from where it stopped.
+
+        Args:
+            srcfile(str)       : hdfs file to be downloaded
+            tgtpath(str)       : The target directory
+            overwrite(bool)    : When overwrite is set to True it will replace
+                                    target file if it exists.
+            ignore_error(bool  : If set to True will ignore download and other checks.
+            workers(int)       : Number of ranges fetched concurrently. Default 1.
+            split_size(int)    : Fetch the file in ranges of split_size bytes.
+                                    Default None fetches the file as one range.
+            resume(bool)       : Continue a previous partial download. Default True.
+        """
+        download = self._prepare_download(srcfile, tgtpath, overwrite=overwrite,
+                                          ignore_error=ignore_error,
+                                          split_size=split_size, resume=resume)
+        if download is True or download is False:
+            return download
+        start = time.time()
+        print("Downloading {0} to {1}".format(srcfile, download.target))
+        self._download_ranges([download], workers)
+        return self._finish_download(download, start, ignore_error)
+
     def download_files(self, srcfilelist, tgtpath, overwrite=True,
-                       ignore_error=False):
+                       ignore_error=False, workers=1, split_size=None,
+                       resume=True):
         """ Downloads list of hdfs files to local directory
 
         Args:
@@ -1005,17 +2684,105 @@ class Webhdfs(object):
             overwrite(bool)        : When overwrite is set to True it will replace
                                      target file if it exists.
             ignore_error(bool)     : if set to True will ignore download and other checks.
+            workers(int)           : Number of files or ranges fetched concurrently.
+                                     Default 1.
+            split_size(int)        : Fetch files larger than split_size in ranges
+                                     of split_size bytes. Default None.
+            resume(bool)           : Continue previous partial downloads. Default True.
         """
 
         rc = True
+        downloads = []
         for srcfile in srcfilelist:
-            rc = self.download_file(srcfile, tgtpath, overwrite=overwrite,
-                                    ignore_error=ignore_error) and rc
+            download = self._prepare_download(srcfile, tgtpath, overwrite=overwrite,
+                                              ignore_error=ignore_error,
+                                              split_size=split_size, resume=resume)
+            if download is True or download is False:
+                rc = download and rc
+            else:
+                downloads.append(download)
+
+        start = time.time()
+        print("Downloading {0} files to {1}".format(len(downloads), tgtpath))
+        self._download_ranges(downloads, workers)
+        for download in downloads:
+            rc = self._finish_download(download, start, ignore_error) and rc
         return rc
 
+    def _create_url(self, target, block_size=None, replication=None,
+                    permission=None, buffer_size=None, create_parent=False,
+                    overwrite=True):
+        """
+        Helper method
+        Returns the CREATE operation url for the hdfs file target
+        """
+        url = self._get_op_url(self._get_path_url(target), "CREATE")
+
+        if create_parent is True:
+            url += "&createparent=true"
+        else:
+            url += "&createparent=false"
+
+        if block_size:
+            url += "&blocksize=" + str(block_size)
+
+        if replication:
+            url += "&replication=" + str(replication)
+
+        if permission:
+            url += "&permission=" + str(permission)
+
+        if buffer_size:
+            url += "&buffersize=" + str(buffer_size)
+
+        if overwrite is True:
+            url += "&overwrite=true"
+        else:
+            url += "&overwrite=false"
+        return url
+
+    def _redirect_location(self, url, method="put"):
+        """
+        Helper method
+        Submits the namenode step of a CREATE or APPEND and returns the
+        datanode url it redirects to.
+        Raises HTTPError with the remote exception message if there is
+        no redirect.
+        """
+        with Request.span("upload.redirect", op=url_operation(url), url=url):
+            response = self._request(url, method=method, allow_redirects=False)
+
+        if "location" in response.headers:
+            return response.headers["location"]
+        err_msg = ""
+        try:
+            response_text_json = json.loads(response.text)
+            if "RemoteException" in response_text_json:
+                err_msg = response_text_json['RemoteException']['message']
+        except:
+            pass
+        raise HTTPError(err_msg)
+
+    @staticmethod
+    def _check_transfer(response):
+        """
+        Helper method
+        Raises HTTPError if the datanode step of an upload failed
+        """
+        if response.status_code != 200 and response.status_code != 201:
+            try:
+                response_text_json = json.loads(response.text)
+                err_msg = ""
+                if "RemoteException" in response_text_json:
+                    err_msg = response_text_json['RemoteException']['message']
+            except:
+                err_msg = ""
+            raise HTTPError(err_msg)
+
     def upload_file(self, srcfile, tgtpath, block_size=None, replication=None,
                     permission=None, buffer_size=None, create_parent=False,
-                    overwrite=True, ignore_error=False):
+                    overwrite=True, ignore_error=False, chunk_size=None,
+                    use_mmap=True):
         """ Uploads local files to hdfs directory
 
         Args:
@@ -1030,6 +2797,10 @@ class Webhdfs(object):
                                     and not raise exception.
             create_parent(bool): Creates parent folder before upload
                                     if set to True. Default is  False
+            chunk_size(int)    : Size of the blocks written to the datanode
+                                    connection. Default 4MB.
+            use_mmap(bool)     : Send the file from a memory map instead of
+                                    reading it into a buffer. Default True.
         """
 
         if not srcfile:
@@ -1040,7 +2811,6 @@ class Webhdfs(object):
             raise IOError("Source file {0} does not exist".format(srcfile))
 
         skip = False
-        open_op = "CREATE"
         filename = os.path.basename(srcfile)
         if self.is_dir(tgtpath):
             target = tgtpath + "/" + filename
@@ -1050,60 +2820,24 @@ class Webhdfs(object):
             if overwrite is False:
                 skip = True
 
-        url = self._get_op_url(self._get_path_url(target), open_op)
-
-        if create_parent is True:
-            url += "&createparent=true"
-        else:
-            url += "&createparent=false"
-
-        if block_size:
-            url += "&blocksize=" + str(block_size)
-
-        if replication:
-            url += "&replication=" + str(replication)
-
-        if permission:
-            url += "&permission=" + str(permission)
-
-        if buffer_size:
-            url += "&buffersize=" + str(buffer_size)
-
-        if overwrite is True:
-            url += "&overwrite=true"
-        else:
-            url += "&overwrite=false"
+        url = self._create_url(target, block_size=block_size,
+                               replication=replication, permission=permission,
+                               buffer_size=buffer_size, create_parent=create_parent,
+                               overwrite=overwrite)
 
         if skip is False:
             try:
 
                 start = time.time()
                 print("Uploading {0} to {1}".format(srcfile, target))
-                response = Request.url_request(url, method="put", allow_redirects=False)
-
-                if "location" in response.headers:
-                    new_url = response.headers["location"]
-                else:
-                    err_msg = ""
-                    try:
-                        response_text_json = json.loads(response.text)
-                        if "RemoteException" in response_text_json:
-                            err_msg = response_text_json['RemoteException']['message']
-                    except:
-                        pass
-                    raise HTTPError(err_msg)
+                new_url = self._redirect_location(url, method="put")
 
-                response = Request.url_file_upload(new_url, srcfile)
+                with Request.span("upload.data", path=target):
+                    response = Request.url_file_upload(new_url, srcfile,
+                                                       chunk_size=chunk_size,
+                                                       use_mmap=use_mmap)
 
-                if response.status_code != 200 and \
-                                response.status_code != 201:
-                    try:
-                        response_text_json = json.loads(response.text)
-                        if "RemoteException" in response_text_json:
-                            err_msg = response_text_json['RemoteException']['message']
-                    except:
-                        err_msg = ""
-                    raise HTTPError(err_msg)
+                self._check_transfer(response)
 
             except HTTPError as e:
                 raise IOError("File upload failed \n{0}\n"
@@ -1114,6 +2848,8 @@ class Webhdfs(object):
                 else:
                     print("Upload failed".format(srcfile, target))
                     return False
+            finally:
+                self._invalidate_status(target)
 
             end = time.time()
             srcsize = os.path.getsize(srcfile)
@@ -1129,7 +2865,8 @@ class Webhdfs(object):
                     return False
             else:
                 print("Total time taken to upload {0} bytes ".format(srcsize) +
-                      "is {0} seconds ".format(str(end - start).strip()))
+                      "is {0} seconds ".format(str(end - start).strip()) +
+                      "({0:.2f} MB/s)".format(response.upload_rate / 1048576.0))
                 return True
 
         else:
@@ -1163,12 +2900,28 @@ class Webhdfs(object):
                                   create_parent=create_parent, ignore_error=ignore_error) and rc
         return rc
 
+    def _dir_file_sizes(self, path):
+        """
+        Helper method
+        Returns a dictionary of name and length of the entries of an hdfs
+        directory from a single listing. Empty if the directory does not exist.
+        """
+        path_key = WhdfsSearchKeys.get_value(WhdfsSearchKeys.PATH_KEY)
+        size_key = WhdfsSearchKeys.get_value(WhdfsSearchKeys.SIZE_KEY)
+        return dict((x[path_key], x[size_key]) for x in
+                    self.long_list_dir(path, otype="all", ignore_error=True) or [])
+
     def upload_dir(self, srcpath, tgtpath, block_size=None, replication=None,
                    permission=None, buffer_size=None, create_parent=False,
-                   overwrite=True, ignore_error=False):
+                   overwrite=True, ignore_error=False, workers=1):
         """
-        Uploads all files in  local directory to HFDS.
-        Note that the current implementation is not recursive and will skip directories.
+        Uploads a local directory and all its sub directories to HDFS
+        under tgtpath.
+        The target tree is created with one MKDIRS per leaf directory and
+        the files are uploaded on a pool of workers threads without metadata
+        calls per file. Each target directory is listed once to check the
+        uploaded sizes and, when overwrite is False, once before the upload
+        to skip files that exist.
         Args:
             srcpath          : local directory to be uploaded.
             tgtpath         : The target hdfs directory.
@@ -1181,27 +2934,119 @@ class Webhdfs(object):
             overwrite       : True will overwrite the file if exists. Default True.
             ignore_error    : If set to True will ignore failures
                                     and not raise exception.
+            workers         : Number of files uploaded concurrently. Default 1.
 
         Returns:
             status of the transfer - True or False
         """
+        if not os.path.isdir(srcpath):
+            print("Specified Source Path {0} is not a directory.".format(srcpath))
+            return False
+
+        srcpath = srcpath.rstrip(os.sep) or os.sep
+        tgtroot = tgtpath.rstrip("/") + "/" + os.path.basename(srcpath)
+        tgtfiles = {}
+        leaf_dirs = []
+        for root, dirs, files in os.walk(srcpath):
+            relpath = os.path.relpath(root, srcpath)
+            tgtdir = tgtroot
+            if relpath != os.curdir:
+                tgtdir += "/" + "/".join(relpath.split(os.sep))
+            tgtfiles[tgtdir] = [os.path.join(root, f) for f in sorted(files)
+                                if os.path.isfile(os.path.join(root, f))]
+            # Symbolic links to directories are not walked
+            if not [d for d in dirs if not os.path.islink(os.path.join(root, d))]:
+                leaf_dirs.append(tgtdir)
+
         rc = True
-        if os.path.isdir(srcpath):
-            target_dir = os.path.basename(srcpath)
-            tgtpath = tgtpath.rstrip("/") + "/" + target_dir
-            if create_parent:
-                self.make_dir(tgtpath, permission=permission)
-            else:
-                self.make_dirs(tgtpath, permission=permission)
-
-            for srcfile in [f for f in os.listdir(srcpath) if os.isfile(os.path.join(srcpath, f))]:
-                rc = self.upload_file(os.path.join(srcpath, srcfile), tgtpath, overwrite=overwrite,
-                                      block_size=block_size, replication=replication,
-                                      permission=permission, buffer_size=buffer_size,
-                                      create_parent=create_parent, ignore_error=ignore_error) and rc
-            return rc
+        start = time.time()
+        try:
+            for tgtdir in leaf_dirs:
+                self.make_dirs(tgtdir, permission=permission)
+        except:
+            if not ignore_error:
+                raise
+            print("Creating directory tree {0} failed".format(tgtroot))
+            return False
+
+        tasks = []
+        for tgtdir, srcfiles in tgtfiles.items():
+            existing = {} if overwrite or not srcfiles else \
+                self._dir_file_sizes(tgtdir)
+            for srcfile in srcfiles:
+                filename = os.path.basename(srcfile)
+                if filename in existing:
+                    print("Target file {0} present ".format(tgtdir + "/" + filename) +
+                          "and overwrite set to False. Skipping upload.")
+                else:
+                    tasks.append((srcfile, tgtdir))
+
+        def upload(task):
+            srcfile, tgtdir = task
+            try:
+                target = tgtdir + "/" + os.path.basename(srcfile)
+                url = self._create_url(target,
+                                       block_size=block_size,
+                                       replication=replication,
+                                       permission=permission,
+                                       buffer_size=buffer_size,
+                                       create_parent=create_parent,
+                                       overwrite=overwrite)
+                new_url = self._redirect_location(url, method="put")
+                with Request.span("upload.data", path=target):
+                    self._check_transfer(Request.url_file_upload(new_url, srcfile))
+                return task, None
+            except Exception:
+                return task, sys.exc_info()
+
+        if workers and workers > 1 and len(tasks) > 1:
+            pool = ThreadPool(min(workers, len(tasks)))
+            results = pool.imap_unordered(Request.propagate(upload), tasks)
         else:
-            print("Specified Source Path {0} is not a directory.".format(srcpath))
+            pool = None
+            results = (upload(x) for x in tasks)
+        uploaded = {}
+        try:
+            for (srcfile, tgtdir), exc_info in results:
+                if exc_info is None:
+                    uploaded.setdefault(tgtdir, []).append(srcfile)
+                elif not ignore_error:
+                    if isinstance(exc_info[1], HTTPError):
+                        raise IOError("File upload of {0} failed \n{1}\n"
+                                      .format(srcfile, exc_info[1]))
+                    six.reraise(*exc_info)
+                else:
+                    print("Upload of {0} failed".format(srcfile))
+                    rc = False
+        finally:
+            if pool:
+                pool.terminate()
+            self._invalidate_status(tgtroot, recursive=True)
+
+        total_size = 0
+        for tgtdir, srcfiles in uploaded.items():
+            tgtsizes = self._dir_file_sizes(tgtdir)
+            for srcfile in srcfiles:
+                srcsize = os.path.getsize(srcfile)
+                targetsize = tgtsizes.get(os.path.basename(srcfile))
+                if targetsize != srcsize:
+                    if not ignore_error:
+                        raise IOError("source size for file {0} is {1} "
+                                      .format(srcfile, srcsize) +
+                                      "target size for file {0} is {1}\n"
+                                      .format(tgtdir + "/" + os.path.basename(srcfile),
+                                              targetsize) +
+                                      "File sizes differ. Upload failed.")
+                    rc = False
+                else:
+                    total_size += srcsize
+
+        elapsed = time.time() - start
+        print("Total time taken to upload {0} bytes ".format(total_size) +
+              "in {0} files is {1} seconds ".format(sum(len(x) for x in uploaded.values()),
+                                                   str(elapsed).strip()) +
+              "({0:.2f} MB/s)".format(total_size / 1048576.0 / max(elapsed, 1e-6)))
+        return rc
 
     def upload_data_iter(self, data_iter, tgtfile, block_size=None, replication=None,
                          permission=None, buffer_size=None, create_parent=False,
@@ -1227,66 +3072,27 @@ class Webhdfs(object):
         if not tgtfile:
             raise MissingArgumentError("Target Path not provided")
         skip = False
-        open_op = "CREATE"
         target = tgtfile
         if self.is_file(target):
             if overwrite is False:
                 skip = True
 
-        url = self._get_op_url(self._get_path_url(target), open_op)
-
-        if create_parent is True:
-            url += "&createparent=true"
-        else:
-            url += "&createparent=false"
-
-        if block_size:
-            url += "&blocksize=" + str(block_size)
-
-        if replication:
-            url += "&replication=" + str(replication)
-
-        if permission:
-            url += "&permission=" + str(permission)
-
-        if buffer_size:
-            url += "&buffersize=" + str(buffer_size)
-
-        if overwrite is True:
-            url += "&overwrite=true"
-        else:
-            url += "&overwrite=false"
+        url = self._create_url(target, block_size=block_size,
+                               replication=replication, permission=permission,
+                               buffer_size=buffer_size, create_parent=create_parent,
+                               overwrite=overwrite)
 
         if skip is False:
             try:
 
                 start = time.time()
                 print("Uploading to {0}".format(target))
-                response = Request.url_request(url, method="put", allow_redirects=False)
-
-                if "location" in response.headers:
-                    new_url = response.headers["location"]
-                else:
-                    err_msg = ""
-                    try:
-                        response_text_json = json.loads(response.text)
-                        if "RemoteException" in response_text_json:
-                            err_msg = response_text_json['RemoteException']['message']
-                    except:
-                        pass
-                    raise HTTPError(err_msg)
+                new_url = self._redirect_location(url, method="put")
 
-                response = Request.url_iter_upload(new_url, data_iter)
+                with Request.span("upload.data", path=target):
+                    response = Request.url_iter_upload(new_url, data_iter)
 
-                if response.status_code != 200 and \
-                                response.status_code != 201:
-                    try:
-                        response_text_json = json.loads(response.text)
-                        if "RemoteException" in response_text_json:
-                            err_msg = response_text_json['RemoteException']['message']
-                    except:
-                        err_msg = ""
-                    raise HTTPError(err_msg)
+                self._check_transfer(response)
 
             except HTTPError as e:
                 raise IOError("File upload failed \n{0}\n"
@@ -1297,6 +3103,8 @@ class Webhdfs(object):
                 else:
                     print("Upload failed")
                     return False
+            finally:
+                self._invalidate_status(target)
 
             end = time.time()
             targetsize = self.get_path_status(target)["length"]
@@ -1307,7 +3115,8 @@ class Webhdfs(object):
             print("Target file {0} present ".format(target) +
                   "and overwrite set to False. Skipping upload.")
 
-    def append_file(self, srcfile, tgtfile, buffer_size=None, ignore_error=False):
+    def append_file(self, srcfile, tgtfile, buffer_size=None, ignore_error=False,
+                    chunk_size=None, use_mmap=True):
         """ Appends local file to hdfs file
 
         Args:
@@ -1317,6 +3126,10 @@ class Webhdfs(object):
 
             ignore_error(bool) : If set to True will ignore failures
                                     and not raise exception.
+            chunk_size(int)    : Size of the blocks written to the datanode
+                                    connection. Default 4MB.
+            use_mmap(bool)     : Send the file from a memory map instead of
+                                    reading it into a buffer. Default True.
         """
         if not srcfile:
             raise MissingArgumentError("Source file not provided")
@@ -1336,30 +3149,14 @@ class Webhdfs(object):
             tgtfilesize = self.get_path_status(tgtfile)["length"]
             start = time.time()
             print("Appending {0} to {1}".format(srcfile, tgtfile))
-            response = Request.url_request(url, method="post", allow_redirects=False)
+            new_url = self._redirect_location(url, method="post")
 
-            if "location" in response.headers:
-                new_url = response.headers["location"]
-            else:
-                err_msg = ""
-                try:
-                    response_text_json = json.loads(response.text)
-                    if "RemoteException" in response_text_json:
-                        err_msg = response_text_json['RemoteException']['message']
-                except:
-                    pass
-                raise HTTPError(err_msg)
-
-            response = Request.url_file_upload(new_url, srcfile, mode="append")
+            with Request.span("upload.data", path=tgtfile):
+                response = Request.url_file_upload(new_url, srcfile, mode="append",
+                                                   chunk_size=chunk_size,
+                                                   use_mmap=use_mmap)
 
-            if response.status_code != 200 and response.status_code != 201:
-                try:
-                    response_text_json = json.loads(response.text)
-                    if "RemoteException" in response_text_json:
-                        err_msg = response_text_json['RemoteException']['message']
-                except:
-                    err_msg = ""
-                raise HTTPError(err_msg)
+            self._check_transfer(response)
 
         except HTTPError as e:
             raise IOError("File append failed \n{0}\n"
@@ -1370,6 +3167,8 @@ class Webhdfs(object):
             else:
                 print("Upload failed".format(srcfile, tgtfile))
                 return False
+        finally:
+            self._invalidate_status(tgtfile)
 
         end = time.time()
         srcsize = os.path.getsize(srcfile)
@@ -1388,7 +3187,8 @@ class Webhdfs(object):
                 return False
         else:
             print("Total time taken to append {0} bytes ".format(srcsize) +
-                  "is {0} seconds ".format(str(end - start).strip()))
+                  "is {0} seconds ".format(str(end - start).strip()) +
+                  "({0:.2f} MB/s)".format(response.upload_rate / 1048576.0))
             return True
 
     def append_data_iter(self, data_iter, tgtfile, buffer_size=None, ignore_error=False):
@@ -1418,30 +3218,12 @@ class Webhdfs(object):
             tgtfilesize = self.get_path_status(tgtfile)["length"]
             start = time.time()
             print("Appending {0}".format(tgtfile))
-            response = Request.url_request(url, method="post", allow_redirects=False)
+            new_url = self._redirect_location(url, method="post")
 
-            if "location" in response.headers:
-                new_url = response.headers["location"]
-            else:
-                err_msg = ""
-                try:
-                    response_text_json = json.loads(response.text)
-                    if "RemoteException" in response_text_json:
-                        err_msg = response_text_json['RemoteException']['message']
-                except:
-                    pass
-                raise HTTPError(err_msg)
+            with Request.span("upload.data", path=tgtfile):
+                response = Request.url_iter_upload(new_url, data_iter, mode="append")
 
-            response = Request.url_iter_upload(new_url, data_iter, mode="append")
-
-            if response.status_code != 200 and response.status_code != 201:
-                try:
-                    response_text_json = json.loads(response.text)
-                    if "RemoteException" in response_text_json:
-                        err_msg = response_text_json['RemoteException']['message']
-                except:
-                    err_msg = ""
-                raise HTTPError(err_msg)
+            self._check_transfer(response)
 
         except HTTPError as e:
             raise IOError("File append failed \n{0}\n"
@@ -1452,6 +3234,8 @@ class Webhdfs(object):
             else:
                 print("Upload failed")
                 return False
+        finally:
+            self._invalidate_status(tgtfile)
 
         end = time.time()
         print("Total time taken to append" +
@@ -12,12 +12,18 @@ def main():
     web_hdfs_port = tconfig.webhdfs["port"] or 50070
     path = "/dwh/data/dwcore/dwhstatsevent/statisticsevent"
     whdfs = Webhdfs(host=web_hdfs_host, port=web_hdfs_port, user="hdfs")
-    for root, dirs, files in whdfs.scan_dir(path):
-        dir_util = whdfs.get_content_summary(root)['length']
-        print("{0} has size {1} and object count {2}"
+    # One scan adds up the listings instead of a content summary per directory
+    usage = whdfs.disk_usage(path, depth=1, top_n=10, group_by="owner")
+    for root, dir_usage in sorted(usage["levels"][1].items()):
+        print("{0} has size {1} and object count {2} ({3} small files)"
                .format(root,
-                       dir_util,
-                       len(dirs)+len(files)))
+                       dir_usage["length"],
+                       dir_usage["fileCount"] + dir_usage["directoryCount"],
+                       dir_usage["smallFileCount"]))
+    for owner, owner_usage in sorted(usage["groups"].items()):
+        print("{0} owns {1} bytes".format(owner, owner_usage["length"]))
+    for filepath, length in usage["top_files"]:
+        print("{0} {1}".format(filepath, length))
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,28 @@
+import sys
+import os
+# use PYTHONPATH to setup path
+sys.path.append(os.path.dirname(os.path.realpath(__file__)) + "/../core")
+from webhdfs import Webhdfs
+from snapshot import Snapshot, build_snapshot
+from util import timer
+import config as tconfig
+
+@timer
+def main():
+    web_hdfs_host = tconfig.webhdfs["host"] or "localhost"
+    web_hdfs_port = tconfig.webhdfs["port"] or 50070
+    path = "/apps"
+    snapshot_file = "/var/tmp/apps.snap"
+    whdfs = Webhdfs(host=web_hdfs_host, port=web_hdfs_port)
+    # The first run lists everything, later runs only list changed directories
+    if os.path.exists(snapshot_file):
+        snap = Snapshot(snapshot_file).refresh(whdfs, workers=8)
+    else:
+        snap = build_snapshot(whdfs, path, snapshot_file)
+    with snap:
+        for status in snap.query("size > 1GB and mtime > 90d", otype="file"):
+            print("{0} {1} {2}".format(status["fullPath"], status["owner"],
+                                       status["length"]))
+
+if __name__ == "__main__":
+    main()